@@ -0,0 +1,52 @@
+"""
+Connection setup cost with a per-connection LLMQueryCreator stack (before) and the shared LLMServices (after).
+
+Secrets and AWS calls are replaced by local stand-ins, so the "before" figures leave out the network
+round trips it used to make and are a lower bound.
+
+    python -m benchmarks.connectionStorm
+"""
+import time
+import tracemalloc
+import objects.OpenAIConnector as openAIConnectorModule
+from objects.OpenAIConnector import OpenAIConnector
+from objects.LLMServices import LLMServices
+from objects.LLMQueryCreator import LLMQueryCreator
+from objects.MessageFilter import MessageFilter
+from objects.Performer import Performer
+from util.Dynamo.connections import getDynamoDbConnection
+
+CONNECTIONS = 200
+
+
+def perConnectionStack():
+    # What every connection used to build: its own OpenAI client and DynamoDB resource.
+    return OpenAIConnector(), getDynamoDbConnection(), LLMQueryCreator(LLMServices.shared())
+
+
+def sharedConnection(rooms, lobbyQuery):
+    return MessageFilter(Performer(websocket=None), rooms, lobbyQuery)
+
+
+def measure(name, connect):
+    keep = []
+    tracemalloc.start()
+    startTime = time.perf_counter()
+    for _ in range(CONNECTIONS):
+        keep.append(connect())
+    elapsed = time.perf_counter() - startTime
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>8}: {elapsed / CONNECTIONS * 1e6:10.1f} us/connection {memory / CONNECTIONS / 1024:8.1f} KiB/connection")
+
+
+def main():
+    openAIConnectorModule.getAISecret = lambda: ('bench-key', 'bench-project', 'bench-model')
+    lobbyQuery = LLMQueryCreator()
+    rooms = {}
+    measure('before', perConnectionStack)
+    measure('after', lambda: sharedConnection(rooms, lobbyQuery))
+
+
+if __name__ == '__main__':
+    main()
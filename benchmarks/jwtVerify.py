@@ -0,0 +1,59 @@
+"""
+Cost of verifying the same token repeatedly: rebuilding the RSA key and decoding every time, as before,
+against the kid-indexed key store and verified-token cache. Keys are generated locally.
+
+    python -m benchmarks.jwtVerify
+"""
+import asyncio
+import json
+import time
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+import util.JWTVerify as JWTVerify
+from util.JWTVerify import CognitoKeyStore, VerifiedTokenCache
+
+ITERATIONS = 2000
+ISSUER = f'https://cognito-idp.{JWTVerify.REGION}.amazonaws.com/bench-pool'
+
+
+def main():
+    privateKey = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(privateKey.public_key()))
+    jwk.update({'kid': 'bench', 'alg': 'RS256', 'use': 'sig'})
+    token = jwt.encode({'sub': 'bench', 'iss': ISSUER, 'exp': int(time.time()) + 3600}, privateKey,
+                       algorithm='RS256', headers={'kid': 'bench'})
+
+    startTime = time.perf_counter()
+    for _ in range(ITERATIONS):
+        # The old path: scan the JWKS and rebuild the key for every message.
+        key = next(key for key in [jwk] if key['kid'] == jwt.get_unverified_header(token)['kid'])
+        publicKey = jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(key))
+        jwt.decode(token, publicKey, algorithms=['RS256'], issuer=ISSUER, leeway=10)
+    uncached = (time.perf_counter() - startTime) / ITERATIONS
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {'keys': [jwk]}
+
+    JWTVerify.requests.get = lambda url, timeout=None: Response()
+    JWTVerify.cognitoSecret = lambda: ('bench-pool', 'bench-client')
+    JWTVerify.cognito_keys = CognitoKeyStore()
+    JWTVerify.verified_tokens = VerifiedTokenCache()
+
+    async def verifyRepeatedly():
+        await JWTVerify.verify_jwt(token)
+        startTime = time.perf_counter()
+        for _ in range(ITERATIONS):
+            await JWTVerify.verify_jwt(token)
+        return (time.perf_counter() - startTime) / ITERATIONS
+
+    cached = asyncio.run(verifyRepeatedly())
+    print(f"uncached: {uncached * 1e6:8.1f} us/verification")
+    print(f"  cached: {cached * 1e6:8.1f} us/verification ({uncached / cached:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
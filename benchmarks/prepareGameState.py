@@ -0,0 +1,60 @@
+"""
+Cost of preparing a room's game state over a two-hour song, with the prompt dicts rebuilt from every
+prompt on each call (before) and the projection kept up to date as prompts are added (after). Each
+minute adds a group prompt and two performer prompts per player.
+
+    python -m benchmarks.prepareGameState
+"""
+import time
+from objects.Performer import Performer
+from objects.Prompt import Prompt
+from objects.Room import Room
+
+PERFORMERS = 4
+SONG_MINUTES = (1, 15, 30, 60, 90, 120)
+CALLS = 200
+
+
+def promptGroup(minute):
+    return {
+        'groupPrompt': Prompt('groupPrompt', f"Group prompt {minute}", 60),
+        'timestamp': minute * 60,
+        'performerPrompts': [{'userId': f'user-{i}', 'timestamp': minute * 60 + half * 30,
+                              'performerPrompt': Prompt('performerPrompt', f"Prompt {minute}.{half} for user-{i}", 30)}
+                             for half in range(2) for i in range(PERFORMERS)],
+    }
+
+
+def rebuiltPromptsDict(prompts):
+    # promptsDict as it used to walk the whole song.
+    promptsDict = []
+    for prompt in prompts:
+        promptToAdd = {'groupPrompt': prompt.get('groupPrompt').toDict(), 'performerPrompts': []}
+        for pr in prompt.get('performerPrompts'):
+            promptToAdd['performerPrompts'].append(pr.get('performerPrompt').toDict(pr.get('userId')))
+        promptsDict.append(promptToAdd)
+    return promptsDict
+
+
+def timePerCall(call):
+    startTime = time.perf_counter()
+    for _ in range(CALLS):
+        call()
+    return (time.perf_counter() - startTime) / CALLS * 1e6
+
+
+def main():
+    room = Room(roomName='bench')
+    for i in range(PERFORMERS):
+        room.performers.append(Performer(websocket=None, userId=f'user-{i}', screenName=f'Performer {i}', instrument='piano'))
+    improvisation = room.currentImprovisation
+    print(f"{'minutes':>7} {'before us':>10} {'after us':>9}")
+    for minutes in SONG_MINUTES:
+        improvisation.prompts = [promptGroup(minute) for minute in range(minutes)]
+        before = timePerCall(lambda: (room.prepareGameStateResponse('newGameState'), rebuiltPromptsDict(improvisation.prompts)))
+        after = timePerCall(lambda: room.prepareGameStateResponse('newGameState'))
+        print(f"{minutes:>7} {before:>10.1f} {after:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Prompt history context size and build time against song length, with the full-history string the LLM
+used to receive (before) and the bounded, cached PromptContext (after). Each minute adds a group prompt
+and one performer prompt per player.
+
+    python -m benchmarks.promptContext
+"""
+import time
+from objects.Prompt import Prompt
+from objects.PromptContext import PromptContext
+
+PERFORMERS = 4
+SONG_MINUTES = (5, 10, 20, 40, 80, 120)
+PROMPT_TEXT = "Shift the groove towards a sparse, half-time feel and let the bass carry the melody for a while"
+
+
+def promptGroup(minute):
+    return {
+        'groupPrompt': Prompt('groupPrompt', f"{minute}: {PROMPT_TEXT}", 60),
+        'timestamp': f"{minute}:00",
+        'performerPrompts': [{'userId': f'user-{i}', 'timestamp': f"{minute}:00",
+                              'performerPrompt': Prompt('performerPrompt', f"{i}: {PROMPT_TEXT}", 60)}
+                             for i in range(PERFORMERS)],
+    }
+
+
+def fullHistory(prompts):
+    # The context as currentPromptContext used to build it.
+    context = "Here are the prompts so far in the performance. "
+    promptCount = 1
+    for prompt in prompts:
+        context += f"{promptCount}. Time: {prompt.get('timestamp')}. Prompt: {prompt.get('groupPrompt').prompt} ."
+        promptCount += 1
+        pPromptCount = 1
+        for pPrompt in prompt.get('performerPrompts'):
+            context += f"{pPromptCount}. Time: {pPrompt.get('timestamp')}. UserId: {pPrompt.get('userId')}. Prompt: {pPrompt.get('performerPrompt').prompt}"
+            pPromptCount += 1
+    return context
+
+
+def timePerCall(build, calls):
+    startTime = time.perf_counter()
+    for _ in range(calls):
+        context = build()
+    return (time.perf_counter() - startTime) / calls * 1e6, len(context)
+
+
+def timeAfterNewGroup(prompts, calls):
+    # A song in progress: the context is current up to the previous group, then a new group arrives.
+    elapsed = 0
+    for _ in range(calls):
+        promptContext = PromptContext()
+        promptContext.build(prompts[:-1])
+        startTime = time.perf_counter()
+        context = promptContext.build(prompts)
+        elapsed += time.perf_counter() - startTime
+    return elapsed / calls * 1e6, len(context)
+
+
+def main():
+    print(f"{'minutes':>7} {'before chars':>13} {'before us':>10} {'after chars':>12} {'after us':>9} {'cached us':>10}")
+    for minutes in SONG_MINUTES:
+        prompts = [promptGroup(minute) for minute in range(minutes)]
+        beforeTime, beforeSize = timePerCall(lambda: fullHistory(prompts), 200)
+        afterTime, afterSize = timeAfterNewGroup(prompts, 200)
+        promptContext = PromptContext()
+        promptContext.build(prompts)
+        cachedTime, _ = timePerCall(lambda: promptContext.build(prompts), 2000)
+        print(f"{minutes:>7} {beforeSize:>13} {beforeTime:>10.1f} {afterSize:>12} {afterTime:>9.1f} {cachedTime:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
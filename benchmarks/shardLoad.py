@@ -0,0 +1,123 @@
+"""
+Multi-client load test of the single-process server against 2 and 4 shard workers behind the gateway.
+
+Client processes hold many connections, each asking its lobby for a full game state resync in a loop,
+and count the replies. Throughput should grow with the worker count up to the number of cores, less the
+gateway's relaying. Secrets and AWS calls are replaced by local stand-ins.
+
+    python -m benchmarks.shardLoad
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+import websockets
+import improvDirector
+import objects.OpenAIConnector as openAIConnectorModule
+import objects.ShardGateway as shardGatewayModule
+import objects.WebSocketServer as webSocketServerModule
+from objects.ShardGateway import ShardGateway
+from objects.WebSocketServer import WebSocketServer
+
+ORIGIN = 'http://localhost:3000'
+CLIENT_PROCESSES = 4
+CONNECTIONS_PER_PROCESS = 16
+DURATION = 5
+WORKER_COUNTS = (2, 4)
+SERVER_PORT = 8865
+WORKER_BASE_PORT = 9100
+
+
+def useLocalStandIns():
+    origins = lambda: {ORIGIN}
+    webSocketServerModule.origins = origins
+    shardGatewayModule.origins = origins
+    openAIConnectorModule.getAISecret = lambda: ('bench-key', 'bench-project', 'bench-model')
+
+
+def quietly(target, *args):
+    # The servers log every message; keep that out of the benchmark.
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    target(*args)
+
+
+def runServer(port):
+    asyncio.run(improvDirector.serveUntilSignalled(WebSocketServer(host="127.0.0.1", port=port)))
+
+
+def runGateway(workerPorts, port):
+    asyncio.run(improvDirector.serveUntilSignalled(ShardGateway(workerPorts, host="127.0.0.1", port=port)))
+
+
+async def resyncLoop(uri, deadline):
+    replies = 0
+    async with websockets.connect(uri, origin=ORIGIN) as websocket:
+        message = json.dumps({'action': 'resyncGameState', 'roomName': 'lobby'})
+        while time.monotonic() < deadline:
+            await websocket.send(message)
+            await websocket.recv()
+            replies += 1
+    return replies
+
+
+def runClients(uri, startAt, results):
+    async def main():
+        await asyncio.sleep(max(0, startAt - time.time()))
+        deadline = time.monotonic() + DURATION
+        counts = await asyncio.gather(*(resyncLoop(uri, deadline) for _ in range(CONNECTIONS_PER_PROCESS)))
+        results.put(sum(counts))
+
+    asyncio.run(main())
+
+
+async def waitForPort(port):
+    for _ in range(100):
+        try:
+            async with websockets.connect(f"ws://127.0.0.1:{port}", origin=ORIGIN):
+                return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+def measure(name, context, servers, port, workerPorts=()):
+    for server in servers:
+        server.start()
+    try:
+        # The gateway connects upstream for each client, so the workers must be listening first.
+        for listeningPort in (*workerPorts, port):
+            asyncio.run(waitForPort(listeningPort))
+        results = context.Queue()
+        startAt = time.time() + 1
+        clients = [context.Process(target=runClients, args=(f"ws://127.0.0.1:{port}", startAt, results))
+                   for _ in range(CLIENT_PROCESSES)]
+        for client in clients:
+            client.start()
+        replies = sum(results.get() for _ in clients)
+        for client in clients:
+            client.join()
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.join()
+    print(f"{name:>10}: {replies / DURATION:10.0f} replies/s")
+
+
+def main():
+    useLocalStandIns()
+    context = multiprocessing.get_context('fork')
+    print(f"{os.cpu_count()} cores, {CLIENT_PROCESSES * CONNECTIONS_PER_PROCESS} client connections")
+    measure('single', context, [context.Process(target=quietly, args=(runServer, SERVER_PORT))], SERVER_PORT)
+    for workerCount in WORKER_COUNTS:
+        workerPorts = [WORKER_BASE_PORT + i for i in range(workerCount)]
+        servers = [context.Process(target=quietly, args=(improvDirector.runWorker, i, workerCount, port))
+                   for i, port in enumerate(workerPorts)]
+        servers.append(context.Process(target=quietly, args=(runGateway, workerPorts, SERVER_PORT)))
+        measure(f"{workerCount} workers", context, servers, SERVER_PORT, workerPorts)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+# Prompts served when the LLM cannot provide one in time, grouped by personality attribute.
+# 'low' prompts suit a score below 5 and 'high' prompts a score of 5 or more.
+
+groupPrompts = {
+    "Energy": {
+        "low": [
+            "Bring the volume down to a whisper and let the silences between phrases grow.",
+            "Settle into a slow, steady pulse and let every note ring out.",
+            "Drift together into a calm, spacious texture.",
+        ],
+        "high": [
+            "Build the intensity together until the whole band is driving hard.",
+            "Lock into a fast, relentless groove and push the dynamics up.",
+            "Trade short, explosive bursts around the band.",
+        ],
+    },
+    "Complexity": {
+        "low": [
+            "Strip the music back to a single repeated idea everyone can share.",
+            "Play only the simplest version of what you hear around you.",
+            "Find one shared chord and stay there together.",
+        ],
+        "high": [
+            "Layer independent rhythms on top of each other without losing the pulse.",
+            "Move through a chain of unexpected key changes together.",
+            "Weave dense, interlocking lines across the band.",
+        ],
+    },
+    "Abstractness": {
+        "low": [
+            "Play a medium tempo blues in Bb.",
+            "Play a slow ballad in D minor in 3/4.",
+            "Play a funk groove in E at 100 bpm.",
+        ],
+        "high": [
+            "Play the sound of a city waking up.",
+            "Play the colour of the sky just before a storm.",
+            "Play as if the room is slowly filling with water.",
+        ],
+    },
+    "Traditionality": {
+        "low": [
+            "Abandon the form and follow whatever sound surprises you.",
+            "Use extended techniques to make sounds your instrument was not built for.",
+            "Break the groove apart and rebuild it from fragments.",
+        ],
+        "high": [
+            "Play a familiar standard form and trade choruses.",
+            "Settle into a classic swing feel and play the changes.",
+            "Honour the style you started in and deepen it.",
+        ],
+    },
+    "Rhythmic Freedom": {
+        "low": [
+            "Lock tightly to a shared pulse, nobody drifts from the beat.",
+            "Play only on the downbeats for the next few bars.",
+            "Find a steady groove and keep it rock solid.",
+        ],
+        "high": [
+            "Let go of the pulse and breathe together instead.",
+            "Stretch and compress time freely, rubato throughout.",
+            "Play in overlapping tempos and let them drift apart.",
+        ],
+    },
+    "Tonal Preference": {
+        "low": [
+            "Lean into dissonance and let clashing notes sit unresolved.",
+            "Leave the key behind and explore clusters and noise.",
+            "Build tension with chromatic lines that never resolve.",
+        ],
+        "high": [
+            "Find a warm, consonant harmony and sustain it together.",
+            "Resolve every phrase back home to the tonic.",
+            "Play a simple, singable melody over stable chords.",
+        ],
+    },
+    "Interaction": {
+        "low": [
+            "Each performer follows their own path, ignore each other for a while.",
+            "Play independent layers that never quite meet.",
+            "Take turns playing alone, one performer at a time.",
+        ],
+        "high": [
+            "Listen closely and echo each other's phrases.",
+            "Play call and response around the band.",
+            "Follow whoever plays loudest and shape the music around them.",
+        ],
+    },
+    "Creativity": {
+        "low": [
+            "Return to an idea you played earlier and develop it.",
+            "Repeat the last phrase you heard and make it your own.",
+            "Keep the current direction, just refine it.",
+        ],
+        "high": [
+            "Take a sudden left turn into something nobody expects.",
+            "Combine two styles that should not go together.",
+            "Invent a new sound and build the music around it.",
+        ],
+    },
+}
+
+performerPrompts = {
+    "Energy": {
+        "low": [
+            "Play softly and sparsely, leave space for others.",
+            "Hold long, quiet notes underneath the band.",
+        ],
+        "high": [
+            "Push forward with a bold, energetic phrase.",
+            "Drive the band with strong, accented rhythms.",
+        ],
+    },
+    "Complexity": {
+        "low": [
+            "Play one simple motif and repeat it.",
+            "Stick to a few notes and let them breathe.",
+        ],
+        "high": [
+            "Play a fast, intricate line that weaves through the band.",
+            "Try an odd grouping of notes against the pulse.",
+        ],
+    },
+    "Interaction": {
+        "low": [
+            "Follow your own idea without reacting to others.",
+            "Play a solo line that stands apart from the band.",
+        ],
+        "high": [
+            "Answer the last phrase another performer played.",
+            "Match the rhythm of the performer next to you.",
+        ],
+    },
+    "Traditionality": {
+        "low": [
+            "Use an unusual technique on your instrument.",
+            "Turn your instrument into a percussion instrument.",
+        ],
+        "high": [
+            "Play a melody in the style of a classic standard.",
+            "Support the band with a traditional accompaniment pattern.",
+        ],
+    },
+    "Rhythmic Freedom": {
+        "low": [
+            "Lock in tightly with the groove.",
+            "Keep strict time for everyone else.",
+        ],
+        "high": [
+            "Float over the beat, ignoring the bar lines.",
+            "Play slightly behind the beat and stretch your phrases.",
+        ],
+    },
+    "Tonal Preference": {
+        "low": [
+            "Add a dissonant note and let it hang.",
+            "Play outside the key for a few bars.",
+        ],
+        "high": [
+            "Play a sweet, consonant melody.",
+            "Outline the chords clearly.",
+        ],
+    },
+    "Creativity": {
+        "low": [
+            "Develop the phrase you just played.",
+            "Repeat your favourite idea from earlier.",
+        ],
+        "high": [
+            "Surprise the band with something new.",
+            "Imitate a sound from nature on your instrument.",
+        ],
+    },
+}
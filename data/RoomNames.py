@@ -0,0 +1,19 @@
+roomNames = [
+    "amber", "anthem", "arpeggio", "aurora", "avalanche", "ballad", "banjo", "basalt", "bayou", "beacon",
+    "bebop", "bellows", "birch", "blossom", "bolero", "boogie", "bramble", "breeze", "brook", "cadence",
+    "calypso", "canyon", "canopy", "cascade", "cello", "chime", "chorale", "cinder", "clarion", "clover",
+    "comet", "coral", "cosmos", "crescendo", "cricket", "cymbal", "dahlia", "delta", "dune", "dusk",
+    "echo", "eclipse", "ember", "etude", "falcon", "fable", "fern", "fiddle", "firefly", "fjord",
+    "flute", "foxglove", "fugue", "galaxy", "gale", "glacier", "glimmer", "gong", "granite", "groove",
+    "harbor", "harmonica", "harp", "hazel", "heron", "horizon", "hymn", "indigo", "iris", "ivory",
+    "jasmine", "jubilee", "juniper", "kestrel", "kettle", "lagoon", "lantern", "larkspur", "lilac", "lullaby",
+    "lute", "lyric", "magnolia", "mambo", "maple", "marimba", "meadow", "melody", "meteor", "minuet",
+    "mistral", "monsoon", "moonbeam", "mosaic", "motif", "nebula", "nocturne", "nova", "oasis", "oboe",
+    "obsidian", "ocarina", "octave", "onyx", "opal", "orbit", "orchid", "overture", "paisley", "pebble",
+    "piccolo", "pinecone", "prairie", "prelude", "prism", "quartz", "quasar", "quill", "ragtime", "rainfall",
+    "raven", "reed", "reverie", "rhapsody", "riff", "ripple", "rondo", "saffron", "sage", "samba",
+    "scherzo", "sequoia", "serenade", "sierra", "sitar", "solstice", "sonata", "sparrow", "starling", "stardust",
+    "sycamore", "syncopation", "tabla", "tambourine", "tempest", "thicket", "thistle", "thunder", "timbre", "toccata",
+    "topaz", "tremolo", "tundra", "twilight", "ukulele", "umber", "valley", "velvet", "vesper", "vibrato",
+    "violet", "vireo", "waltz", "willow", "wisteria", "xylophone", "yarrow", "zephyr", "zinnia", "zither",
+]
@@ -1,14 +1,63 @@
 from objects.WebSocketServer import WebSocketServer, runHealthCheckServer
+from objects.ShardGateway import ShardGateway
+import multiprocessing
+import signal
 import threading
 import asyncio
+import os
+
+# Seconds a worker gets to flush its queued writes after being signalled to stop.
+WORKER_SHUTDOWN_TIMEOUT = 30
+
+def runWorker(shardIndex, shardCount, port):
+    server = WebSocketServer(host="127.0.0.1", port=port, shardIndex=shardIndex, shardCount=shardCount)
+    asyncio.run(serveUntilSignalled(server))
+
+async def serveUntilSignalled(server):
+    # SIGTERM or SIGINT cancels the server, so its shutdown runs and flushes the write-behind queue.
+    # A second signal, such as a Ctrl-C followed by the gateway's terminate(), must not interrupt that flush.
+    serverTask = asyncio.create_task(server.main())
+
+    def stop():
+        if not serverTask.cancelling():
+            serverTask.cancel()
+
+    loop = asyncio.get_running_loop()
+    for signalNumber in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signalNumber, stop)
+    try:
+        await serverTask
+    except asyncio.CancelledError:
+        pass
 
 def main():
     healthCheckThread = threading.Thread(target=runHealthCheckServer)
     healthCheckThread.daemon = True
     healthCheckThread.start()
 
-    server = WebSocketServer()
-    asyncio.run(server.main())
+    # IMPROV_WORKERS > 1 shards rooms over that many worker processes behind a routing gateway.
+    workerCount = int(os.environ.get("IMPROV_WORKERS", "1"))
+    if workerCount <= 1:
+        server = WebSocketServer()
+        asyncio.run(server.main())
+        return
+
+    basePort = int(os.environ.get("IMPROV_WORKER_BASE_PORT", "9000"))
+    workerPorts = [basePort + i for i in range(workerCount)]
+    workers = [multiprocessing.Process(target=runWorker, args=(i, workerCount, port), daemon=True)
+               for i, port in enumerate(workerPorts)]
+    for worker in workers:
+        worker.start()
+    try:
+        asyncio.run(ShardGateway(workerPorts).main())
+    finally:
+        # terminate() sends SIGTERM, which the workers handle by shutting down cleanly.
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join(WORKER_SHUTDOWN_TIMEOUT)
+            if worker.is_alive():
+                worker.kill()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
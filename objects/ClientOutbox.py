@@ -0,0 +1,78 @@
+import asyncio
+import time
+import websockets
+from util.latencyTracker import LatencyTracker
+
+class ClientOutbox:
+    DROP_OLDEST = 'dropOldest'
+    DISCONNECT = 'disconnect'
+
+    def __init__(self, websocket, maxSize=64, overflowPolicy=DROP_OLDEST):
+        """
+        Bounded queue of encoded frames for one client, drained by its own sender task.
+
+        Sending never waits on the socket. When a slow client lets the queue fill up, either the
+        oldest queued frame is dropped or the client is disconnected, depending on overflowPolicy.
+        """
+        self.__websocket = websocket
+        self.__maxSize = maxSize
+        self.__overflowPolicy = overflowPolicy
+        self.__queue = None
+        self.__senderTask = None
+        self.__dropped = 0
+        self.__closed = False
+        self.__deliveryLatency = LatencyTracker(defaultLatency=0)
+
+    @property
+    def overflowPolicy(self):
+        return self.__overflowPolicy
+
+    @overflowPolicy.setter
+    def overflowPolicy(self, overflowPolicy):
+        self.__overflowPolicy = overflowPolicy
+
+    @property
+    def dropped(self):
+        return self.__dropped
+
+    @property
+    def deliveryLatency(self):
+        """Seconds from a frame being queued to the socket accepting it."""
+        return self.__deliveryLatency
+
+    @property
+    def queueDepth(self):
+        return self.__queue.qsize() if self.__queue else 0
+
+    def send(self, frame):
+        if self.__closed:
+            return
+        if self.__senderTask is None:
+            self.__queue = asyncio.Queue(self.__maxSize)
+            self.__senderTask = asyncio.create_task(self.__drain())
+        if self.__queue.full():
+            if self.__overflowPolicy == self.DISCONNECT:
+                print(f"Disconnecting slow client {self.__websocket.id}.")
+                self.close()
+                asyncio.create_task(self.__websocket.close(code=1013, reason="Client too slow"))
+                return
+            self.__queue.get_nowait()
+            self.__dropped += 1
+        self.__queue.put_nowait((frame, time.monotonic()))
+
+    def close(self):
+        self.__closed = True
+        if self.__senderTask and not self.__senderTask.done():
+            self.__senderTask.cancel()
+
+    async def __drain(self):
+        while True:
+            frame, queuedAt = await self.__queue.get()
+            try:
+                await self.__websocket.send(frame)
+                self.__deliveryLatency.record(time.monotonic() - queuedAt)
+            except websockets.ConnectionClosed:
+                self.__closed = True
+                return
+            except Exception as e:
+                print(f"Error sending to client {self.__websocket.id}: {e}")
@@ -0,0 +1,48 @@
+import random
+from data.FallbackPrompts import groupPrompts, performerPrompts
+
+class FallbackPromptBank:
+    GROUP_PROMPT_INTERVAL = 60
+    PERFORMER_PROMPT_INTERVAL = 30
+
+    def __init__(self, groupLibrary=None, performerLibrary=None):
+        """
+        Local prompts served when the LLM fails or misses its deadline, chosen to suit a personality.
+
+        Each library maps a personality attribute to 'low' and 'high' prompt lists. An attribute is
+        picked with a weight growing with its distance from the neutral score of 5, so the prompts
+        lean towards what stands out most in the personality.
+        """
+        self.__groupLibrary = groupLibrary or groupPrompts
+        self.__performerLibrary = performerLibrary or performerPrompts
+        self.__served = 0
+
+    @property
+    def served(self):
+        return self.__served
+
+    @staticmethod
+    def choosePrompt(library, personality):
+        attributes = personality.attributes if personality else {}
+        names = list(library)
+        weights = [abs(float(attributes.get(name, 5)) - 5) + 1 for name in names]
+        name = random.choices(names, weights)[0]
+        level = 'high' if float(attributes.get(name, 5)) >= 5 else 'low'
+        return random.choice(library[name][level])
+
+    def groupPrompts(self, directorPersonality, performers):
+        """Returns prompts shaped like an LLM createPrompts response."""
+        self.__served += 1
+        return {
+            'groupPrompt': self.choosePrompt(self.__groupLibrary, directorPersonality),
+            'groupPromptInterval': self.GROUP_PROMPT_INTERVAL,
+            'performerPrompts': [self.performerPrompt(performer) for performer in performers],
+        }
+
+    def performerPrompt(self, performer):
+        self.__served += 1
+        return {
+            'userId': performer.userId,
+            'performerPrompt': self.choosePrompt(self.__performerLibrary, performer.personality),
+            'promptInterval': self.PERFORMER_PROMPT_INTERVAL,
+        }
@@ -0,0 +1,69 @@
+class GameStateTracker:
+    def __init__(self, maxUnackedVersions=20):
+        """
+        Versions a room's broadcast game states and computes the delta from one version to the next.
+
+        A delta holds the prompt groups from the first one that changed, the performers that changed
+        or left, any changed top-level fields and the names of removed ones. Clients that acknowledge versions receive deltas;
+        clients that never acknowledged, or are too far behind, receive the full game state.
+        """
+        self.__version = 0
+        self.__lastGameState = None
+        self.__maxUnackedVersions = maxUnackedVersions
+
+    @property
+    def version(self):
+        return self.__version
+
+    def canSendDelta(self, ackedVersion):
+        return ackedVersion is not None and self.__version - ackedVersion <= self.__maxUnackedVersions
+
+    def update(self, gameState):
+        """
+        Records gameState as the next version and returns (version, delta). delta is None when the
+        previous state is unknown.
+        """
+        delta = self.diff(self.__lastGameState, gameState) if self.__lastGameState else None
+        self.__version += 1
+        self.__lastGameState = gameState
+        if delta is not None:
+            delta['baseVersion'] = self.__version - 1
+            delta['version'] = self.__version
+        return self.__version, delta
+
+    @staticmethod
+    def diff(oldState, newState):
+        delta = {}
+        for key, value in newState.items():
+            if key in ('prompts', 'performers'):
+                continue
+            if oldState.get(key) != value:
+                delta[key] = value
+        removedKeys = [key for key in oldState if key not in newState and key not in ('prompts', 'performers')]
+        if removedKeys:
+            delta['removedKeys'] = removedKeys
+
+        oldPrompts = oldState.get('prompts', [])
+        newPrompts = newState.get('prompts', [])
+        if len(newPrompts) < len(oldPrompts) or (oldPrompts and newPrompts and oldPrompts[0] != newPrompts[0]):
+            # A new improvisation started, resend every prompt.
+            fromIndex = 0
+        else:
+            # Prompt groups are only appended to, and only the last group grows.
+            fromIndex = max(0, len(oldPrompts) - 1)
+            while fromIndex < len(newPrompts) and fromIndex < len(oldPrompts) and oldPrompts[fromIndex] == newPrompts[fromIndex]:
+                fromIndex += 1
+        if fromIndex < len(newPrompts) or len(newPrompts) != len(oldPrompts):
+            delta['prompts'] = {'fromIndex': fromIndex, 'groups': newPrompts[fromIndex:]}
+
+        oldPerformers = {performer.get('userId'): performer for performer in oldState.get('performers', [])}
+        newPerformers = {performer.get('userId'): performer for performer in newState.get('performers', [])}
+        changedPerformers = [performer for userId, performer in newPerformers.items() if oldPerformers.get(userId) != performer]
+        removedPerformers = [userId for userId in oldPerformers if userId not in newPerformers]
+        if changedPerformers:
+            delta['performers'] = changedPerformers
+        if removedPerformers:
+            delta['removedPerformers'] = removedPerformers
+        if list(oldPerformers) != list(newPerformers):
+            delta['performerOrder'] = list(newPerformers)
+        return delta
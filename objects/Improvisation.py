@@ -1,10 +1,26 @@
 from util.timeStamp import timeStamp
 from objects.Prompt import Prompt
+from objects.PromptContext import PromptContext
+from objects.PromptBatcher import PromptBatcher
+from objects.TimerScheduler import TimerScheduler
+from objects.OpenAIConnector import LLMCallCounter, currentCallCounter
 from datetime import datetime
 import asyncio
 import random
+import time
 
 class Improvisation:
+    # Start generating the next prompt ahead of its interval expiring, using the observed p95 LLM latency.
+    PREFETCH_PROMPTS = True
+    PREFETCH_LEAD_MARGIN = 1.2
+    PREFETCH_MIN_LEAD = 1
+    PREFETCH_MAX_LEAD = 30
+    # Serve performer prompt timers that fire within this many seconds of each other with one LLM call.
+    BATCH_PERFORMER_PROMPTS = True
+    PERFORMER_PROMPT_BATCH_WINDOW = 3
+    # Seconds a due prompt may wait on the LLM before a prompt from the fallback bank is served instead.
+    PROMPT_DEADLINE = 5
+
     def __init__(self, performers, LLMQueryCreator, room = None, centralTheme=None, startTime=None):
         self.__performers = performers
         self.__LLMQueryCreator = LLMQueryCreator
@@ -14,8 +30,17 @@ class Improvisation:
         self.__summary = None
         self.__startTime = startTime
         self.__prompts = []
+        # Dict form of self.__prompts for game state responses, and each performer's latest prompt
+        # in the current group, both kept up to date as prompts are added.
+        self.__promptsProjection = []
+        self.__currentPerformerPrompts = {}
         self.__centralTheme = centralTheme
         self.__finalPrompt = False
+        self.__contextVersion = 0
+        self.__promptContext = PromptContext()
+        self.__performerPromptBatcher = PromptBatcher(self.generateBatchedPerformerPrompts, self.PERFORMER_PROMPT_BATCH_WINDOW, room)
+        # When the pending group prompt update will be published, replacing every performer prompt with it.
+        self.__groupPublishAt = None
 
     @property
     def performers(self):
@@ -80,20 +105,16 @@ class Improvisation:
     @prompts.setter
     def prompts(self, groupPrompt):
         self.__prompts = groupPrompt
+        self.__promptsProjection = [self.projectPromptGroup(prompt) for prompt in groupPrompt]
+        lastPerformerPrompts = groupPrompt[-1].get('performerPrompts') if groupPrompt else []
+        self.__currentPerformerPrompts = {prompt.get('userId'): prompt for prompt in lastPerformerPrompts}
 
     @property
     def currentPrompts(self):
         currentPrompt = self.__prompts[-1]
-        currentGroupPrompt = currentPrompt.get('groupPrompt')
-        currentPerformerPrompts = currentPrompt.get('performerPrompts')
-        performerPrompts = []
-        for performer in self.performers:
-            currentPrompt = next(prompt for prompt in reversed(currentPerformerPrompts) if prompt.get('userId') == performer.userId)
-            if currentPrompt:
-                performerPrompts.append(currentPrompt)
         return {
-            'groupPrompt': currentGroupPrompt,
-            'performerPrompts': currentPerformerPrompts
+            'groupPrompt': currentPrompt.get('groupPrompt'),
+            'performerPrompts': currentPrompt.get('performerPrompts')
         }
 
     @property
@@ -112,31 +133,44 @@ class Improvisation:
     def centralTheme(self, centralTheme):
         self.__centralTheme = centralTheme
 
+    def invalidateSpeculativePrompts(self):
+        self.__contextVersion += 1
+
     async def setPromptReaction(self, currentClient, reaction, currentPromptTitle):
+        self.invalidateSpeculativePrompts()
         if currentPromptTitle == 'groupPrompt':
             self.currentPrompts[reaction] = [{
                 'userId': currentClient.userId,
                 'reaction': reaction
             }]
             if 'moveOn' == reaction and 'endSong' != self.gameStatus:
-                newPrompts = self.LLMQueryCreator.groupMoveOn(self.room)
+                newPrompts = await self.generateBefore(lambda: self.LLMQueryCreator.groupMoveOn(self.room))
                 await self.setCurrentPrompts(newPrompts)
             elif 'reject' == reaction and 'endSong' != self.gameStatus:
-                newPrompts = self.LLMQueryCreator.groupRejectPrompt(self.room)
+                newPrompts = await self.generateBefore(lambda: self.LLMQueryCreator.groupRejectPrompt(self.room))
                 await self.setCurrentPrompts(newPrompts)
             return
         else:
-            performerPrompt = next(prompt for prompt in self.currentPrompts.get('performerPrompts') if prompt.get('userId') == currentClient.userId )
+            performerPrompt = self.getCurrentPerformerPrompt(currentClient.userId)
             performerPrompt['reaction'] = reaction
             if 'moveOn' == reaction and 'endSong' != self.gameStatus:
-                newPrompts = self.LLMQueryCreator.performerMoveOn(self.room, currentClient)
+                newPrompts = await self.generateBefore(lambda: self.LLMQueryCreator.performerMoveOn(self.room, currentClient),
+                                                       currentClient.userId)
                 await self.addPerformerPrompts([newPrompts])
             elif 'reject' == reaction and 'endSong' != self.gameStatus:
-                newPrompts = self.LLMQueryCreator.performerRejectPrompt(self.room, currentClient)
+                newPrompts = await self.generateBefore(lambda: self.LLMQueryCreator.performerRejectPrompt(self.room, currentClient),
+                                                       currentClient.userId)
                 await self.addPerformerPrompts([newPrompts])
             return
 
     async def setCurrentPrompts(self, currentPrompts):
+        if isinstance(currentPrompts, dict) and currentPrompts.get('finalPrompt'):
+            self.finalPrompt = True
+        if not self.isUsablePrompts(currentPrompts):
+            print(f"Serving fallback prompts: {currentPrompts}")
+            currentPrompts = self.fallbackPrompts()
+        if self.finalPrompt:
+            self.room.cancelAllTasks()
         newGroupPrompt = currentPrompts.get('groupPrompt')
         interval = currentPrompts.get('groupPromptInterval')
         # interval = 100
@@ -149,7 +183,7 @@ class Improvisation:
             'performerPrompts': []
         }
         if not self.finalPrompt:
-            await self.schedulePromptUpdate(groupPrompt)
+            self.schedulePromptUpdate(groupPrompt)
         print(f"Group Prompt: {groupPrompt}")
         for prompt in performerPrompts:
             interval = prompt.get('promptInterval')
@@ -162,9 +196,11 @@ class Improvisation:
                 "performerPrompt": performerPrompt
             })
             if not self.finalPrompt:
-                await self.schedulePromptUpdate(performerPrompt, userId)
+                self.schedulePromptUpdate(performerPrompt, userId)
             print(f"{userId}: {performerPrompt}")
         self.prompts.append(currentPrompts)
+        self.__promptsProjection.append(self.projectPromptGroup(currentPrompts))
+        self.__currentPerformerPrompts = {prompt.get('userId'): prompt for prompt in currentPrompts['performerPrompts']}
 
     def getPerformerById(self, userId):
         return next(performer for performer in self.performers if performer.userId == userId)
@@ -172,15 +208,27 @@ class Improvisation:
     async def addPerformerPrompts(self, performerPrompts):
         for newPrompt in performerPrompts:
             userId = newPrompt.get('userId')
+            if not self.isUsablePrompts(newPrompt, userId):
+                print(f"Serving fallback prompt for {userId}: {newPrompt}")
+                newPrompt = self.fallbackPrompts(userId)
+                if newPrompt is None:
+                    continue
             prompt = Prompt('performerPrompt', newPrompt.get('performerPrompt'), newPrompt.get('promptInterval'))
-            self.currentPrompts['performerPrompts'].append(
-                {
-                    'userId': userId,
-                    'timeStamp': self.getCurrentPerformanceTime(),
-                    'performerPrompt': prompt
-                })
+            performerPrompt = {
+                'userId': userId,
+                'timeStamp': self.getCurrentPerformanceTime(),
+                'performerPrompt': prompt
+            }
+            self.__prompts[-1]['performerPrompts'].append(performerPrompt)
+            self.__currentPerformerPrompts[userId] = performerPrompt
+            # Replace rather than mutate the projected group, so earlier promptsDict results stay as they were.
+            lastGroup = self.__promptsProjection[-1]
+            self.__promptsProjection[-1] = {
+                'groupPrompt': lastGroup['groupPrompt'],
+                'performerPrompts': lastGroup['performerPrompts'] + [prompt.toDict(userId)]
+            }
             print(f"{userId}: {prompt}")
-            await self.schedulePromptUpdate(prompt, userId)
+            self.schedulePromptUpdate(prompt, userId)
         return
 
     def createGameLog(self, room):
@@ -221,32 +269,10 @@ class Improvisation:
         return context
 
     def currentPromptContext(self):
-        if not self.prompts:
-            return "The performance has not started, there are no prompts yet."
-        context = "Here are the prompts so far in the performance. "
-        promptCount = 1
-        for prompt in self.prompts:
-            time = prompt.get('timestamp')
-            gPrompt = prompt.get('groupPrompt').prompt
-            context += f'{promptCount}. Time: {time}. Prompt: {gPrompt} .'
-            promptCount += 1
-            pPromptCount = 1
-            for pPrompt in prompt.get('performerPrompts'):
-                time = pPrompt.get('timestamp')
-                prompt = pPrompt.get('performerPrompt').prompt
-                userId = pPrompt.get('userId')
-                context += f'{pPromptCount}. Time: {time}. UserId: {userId}. Prompt: {prompt}'
-                pPromptCount += 1
-        return context
+        return self.__promptContext.build(self.prompts)
 
     def getCurrentPerformerPrompt(self, userId):
-        if not self.prompts:
-            return None
-        lastPrompt = self.prompts[-1]
-        for performerPrompt in reversed(lastPrompt.get("performerPrompts", [])):
-            if performerPrompt.get("userId") == userId:
-                return performerPrompt
-        return None
+        return self.__currentPerformerPrompts.get(userId)
 
     def gameStateString(self):
         string = ""
@@ -258,12 +284,12 @@ class Improvisation:
             string += f"Here's the sequence of prompts and reactions so far. {promptString}"
         return string
 
-    def getCentralTheme(self, room):
-        self.__centralTheme = self.LLMQueryCreator.getCentralTheme(room)
+    async def getCentralTheme(self, room):
+        self.__centralTheme = await self.LLMQueryCreator.getCentralTheme(room)
         return self.__centralTheme
 
-    def getClosingTimeSummary(self, room):
-        self.__summary = self.LLMQueryCreator.closingSummary(room)
+    async def getClosingTimeSummary(self, room):
+        self.__summary = await self.LLMQueryCreator.closingSummary(room, self)
 
     def getCurrentPerformanceTime(self):
         if self.__startTime:
@@ -280,17 +306,17 @@ class Improvisation:
             performersString += performer.performerString()
         return performersString
 
-    def initializeImprovDirectorPersonality(self):
-        return self.LLMQueryCreator.createYourPersonality(self.room)
+    async def initializeImprovDirectorPersonality(self):
+        return await self.LLMQueryCreator.createYourPersonality(self.room)
 
     async def initializeGameState(self):
         self.setStartTime()
-        await self.setCurrentPrompts(self.LLMQueryCreator.initiatePerformance(self.room))
+        await self.setCurrentPrompts(await self.generateBefore(lambda: self.LLMQueryCreator.initiatePerformance(self.room)))
         self.gameStatus = "improvise"
         return
 
     async def concludePerformance(self):
-        await self.setCurrentPrompts(self.LLMQueryCreator.concludePerformance(self.room))
+        await self.setCurrentPrompts(await self.LLMQueryCreator.concludePerformance(self.room))
         self.room.cancelAllTasks()
         self.gameStatus = 'endSong'
         self.finalPrompt = True
@@ -299,8 +325,8 @@ class Improvisation:
     def logEnding(self):
         self.__gameLog['endingTimestamp'] = timeStamp()
 
-    def refineTheme(self, room):
-        newTheme = self.LLMQueryCreator.getNewTheme(room, self.centralTheme)
+    async def refineTheme(self, room):
+        newTheme = await self.LLMQueryCreator.getNewTheme(room, self.centralTheme)
         self.centralTheme = newTheme
         return self.centralTheme
 
@@ -311,56 +337,174 @@ class Improvisation:
         else:
             return 'Start time already set.'
 
-    async def schedulePromptUpdate(self, prompt, userId=None):
-        taskId = prompt.promptTitle
-        if userId:
-            taskId += userId
-        if taskId in self.room.scheduledTasks:
-            existingTask = self.room.scheduledTasks[taskId]
-            if not existingTask.done():
-                existingTask.cancel()
-            try:
-                await existingTask
-            except asyncio.CancelledError:
-                pass
-            except Exception as e:
-                print(f'Error: {e}')
-        if taskId:
-            self.room.scheduledTasks[taskId] = asyncio.create_task(self.updatePrompt(prompt, userId))
-
-    def summarizePerformance(self, room):
-        self.getClosingTimeSummary(room)
-        self.createGameLog(room)
-
-    async def updatePrompt(self, prompt, userId):
-        promptTitle = prompt.promptTitle
-        interval = prompt.promptInterval
+    def schedulePromptUpdate(self, prompt, userId=None):
+        """
+        Schedule the replacement of prompt when its interval expires, replacing any pending update for it.
+        With prefetching, generation starts at the lead time and the result is published at expiry.
+        A performer prompt that would expire with or after the group prompt is left to the group update.
+        """
+        scheduler = TimerScheduler.shared()
+        timerKey = (self.room, prompt.promptTitle, userId)
+        interval = int(prompt.promptInterval)
         # interval = 5
-        print(f'update {promptTitle} in {interval} seconds')
-        await asyncio.sleep(int(interval))
+        publishAt = scheduler.now() + interval
+        if not userId:
+            self.__groupPublishAt = publishAt
+        elif self.__groupPublishAt is not None and publishAt >= self.__groupPublishAt:
+            scheduler.cancel(timerKey)
+            print(f'{prompt.promptTitle} for {userId} is replaced by the next group prompt')
+            return
+        print(f'update {prompt.promptTitle} in {interval} seconds')
+        if self.PREFETCH_PROMPTS:
+            delay = max(0, interval - self.promptLeadTime(userId))
+            scheduler.schedule(delay, lambda: self.prefetchPromptUpdate(timerKey, userId, publishAt), timerKey, self.room)
+        else:
+            scheduler.schedule(interval, lambda: self.room.submit(lambda: self.updatePrompt(userId)), timerKey, self.room)
+
+    async def summarizePerformance(self, room):
+        """Adds the closing summary to the game log, which must already have been created."""
+        await self.getClosingTimeSummary(room)
+        self.__gameLog['summary'] = self.__summary
+
+    def promptLeadTime(self, userId=None):
+        latency = self.LLMQueryCreator.services.promptLatency.percentile(95)
+        leadTime = max(self.PREFETCH_MIN_LEAD, min(self.PREFETCH_MAX_LEAD, latency * self.PREFETCH_LEAD_MARGIN))
+        if userId and self.BATCH_PERFORMER_PROMPTS:
+            # Batched performer prompts also wait out the batch window.
+            leadTime += self.PERFORMER_PROMPT_BATCH_WINDOW
+        return leadTime
+
+    async def measurePromptCycle(self, generate):
+        services = self.LLMQueryCreator.services
+        startTime = time.monotonic()
+        counter = LLMCallCounter()
+        token = currentCallCounter.set(counter)
+        try:
+            newPrompts = await generate()
+        finally:
+            currentCallCounter.reset(token)
+        services.promptLatency.record(time.monotonic() - startTime)
+        services.recordPromptCycle(counter.calls)
+        return newPrompts
+
+    async def generatePromptUpdate(self, userId=None):
+        if not userId:
+            return await self.measurePromptCycle(lambda: self.LLMQueryCreator.provideNewPrompts(self.room))
+        if self.BATCH_PERFORMER_PROMPTS:
+            return await self.__performerPromptBatcher.request(userId)
+        currentPerformer = next(performer for performer in self.performers if performer.userId == userId)
+        return await self.measurePromptCycle(lambda: self.LLMQueryCreator.nextPerformerPrompt(self.room, currentPerformer))
+
+    async def generateBatchedPerformerPrompts(self, userIds):
+        performers = [performer for performer in self.performers if performer.userId in userIds]
+        if not performers:
+            return {}
+        if len(performers) == 1:
+            performer = performers[0]
+            newPrompt = await self.measurePromptCycle(lambda: self.LLMQueryCreator.nextPerformerPrompt(self.room, performer))
+            return {performer.userId: newPrompt}
+        return await self.measurePromptCycle(lambda: self.LLMQueryCreator.nextPerformerPrompts(self.room, performers))
+
+    def isUsablePrompts(self, prompts, userId=None):
+        if not isinstance(prompts, dict) or 'error' in prompts:
+            return False
+        return bool(prompts.get('performerPrompt' if userId else 'groupPrompt'))
+
+    def fallbackPrompts(self, userId=None):
+        """Prompts from the fallback bank, or None for a performer who has left."""
+        fallbackPromptBank = self.LLMQueryCreator.services.fallbackPromptBank
+        if not userId:
+            return fallbackPromptBank.groupPrompts(self.LLMQueryCreator.personality, self.performers)
+        performer = next((performer for performer in self.performers if performer.userId == userId), None)
+        if performer is None:
+            return None
+        return fallbackPromptBank.performerPrompt(performer)
+
+    async def generatePromptUpdateBefore(self, userId, deadline):
+        return await self.generateBefore(lambda: self.generatePromptUpdate(userId), userId, deadline)
+
+    async def generateBefore(self, generate, userId=None, deadline=None):
+        """
+        Generate prompts with generate(), serving fallback prompts if the LLM fails or has not answered by deadline,
+        PROMPT_DEADLINE seconds from now by default. A late LLM answer still replaces the fallback prompt if that
+        prompt is current when it arrives.
+        """
+        if deadline is None:
+            deadline = TimerScheduler.now() + self.PROMPT_DEADLINE
+        generation = asyncio.ensure_future(generate())
+        try:
+            newPrompts = await asyncio.wait_for(asyncio.shield(generation), max(0, deadline - TimerScheduler.now()))
+        except asyncio.TimeoutError:
+            fallbackPrompts = self.fallbackPrompts(userId)
+            if fallbackPrompts is not None:
+                generation.add_done_callback(lambda finished: self.replaceFallbackPrompts(finished, userId, fallbackPrompts))
+            return fallbackPrompts
+        except asyncio.CancelledError:
+            generation.cancel()
+            raise
+        except Exception as e:
+            print(f"Prompt generation failed: {e}")
+            return self.fallbackPrompts(userId)
+        return newPrompts
+
+    def replaceFallbackPrompts(self, generation, userId, fallbackPrompts):
+        if generation.cancelled() or generation.exception():
+            return
+        newPrompts = generation.result()
+        if self.isUsablePrompts(newPrompts, userId):
+            self.room.actor.post(lambda: self.publishLatePrompts(userId, fallbackPrompts, newPrompts))
+
+    async def publishLatePrompts(self, userId, fallbackPrompts, newPrompts):
+        if 'endSong' == self.gameStatus or not self.prompts:
+            return
+        if userId:
+            currentPrompt = self.getCurrentPerformerPrompt(userId)
+            stillCurrent = currentPrompt is not None and currentPrompt['performerPrompt'].prompt == fallbackPrompts['performerPrompt']
+        else:
+            stillCurrent = self.prompts[-1]['groupPrompt'].prompt == fallbackPrompts['groupPrompt']
+        if stillCurrent:
+            await self.publishPrompts(userId, newPrompts)
+
+    async def prefetchPromptUpdate(self, timerKey, userId, publishAt):
+        if 'endSong' == self.gameStatus:
+            return
+        scheduler = TimerScheduler.shared()
+        speculativeVersion = self.__contextVersion
+        speculativePrompts = await self.generatePromptUpdateBefore(userId, publishAt + self.PROMPT_DEADLINE)
+        scheduler.schedule(max(0, publishAt - scheduler.now()),
+                           lambda: self.room.submit(lambda: self.updatePrompt(userId, speculativeVersion, speculativePrompts)),
+                           timerKey, self.room)
+
+    async def updatePrompt(self, userId, speculativeVersion=None, speculativePrompts=None):
         if 'endSong' != self.gameStatus:
-            if not userId:
-                newPrompts = self.LLMQueryCreator.provideNewPrompts(self.room)
-                await self.setCurrentPrompts(newPrompts)
+            if speculativePrompts is not None and speculativeVersion == self.__contextVersion:
+                newPrompts = speculativePrompts
             else:
-                currentPerformer = next(performer for performer in self.performers if performer.userId == userId)
-                newPrompt = self.LLMQueryCreator.nextPerformerPrompt(self.room, currentPerformer)
-                await self.addPerformerPrompts([newPrompt])
-            response = self.room.prepareGameStateResponse('newGameState')
-            await self.room.handleResponse(response)
+                # A reaction or roster change made the speculative prompts stale.
+                newPrompts = await self.generatePromptUpdateBefore(userId, TimerScheduler.now() + self.PROMPT_DEADLINE)
+            if newPrompts is None:
+                # The performer has left the room.
+                return
+            await self.publishPrompts(userId, newPrompts)
+
+    async def publishPrompts(self, userId, newPrompts):
+        if not userId:
+            await self.setCurrentPrompts(newPrompts)
+        else:
+            await self.addPerformerPrompts([newPrompts])
+        response = self.room.prepareGameStateResponse('newGameState')
+        await self.room.handleResponse(response)
 
     async def adjustPrompts(self):
-        newPrompts = self.LLMQueryCreator.provideNewPrompts(self.room)
+        newPrompts = await self.generateBefore(lambda: self.LLMQueryCreator.provideNewPrompts(self.room))
         await self.setCurrentPrompts(newPrompts)
         return
 
+    @staticmethod
+    def projectPromptGroup(prompt):
+        return {'groupPrompt': prompt.get('groupPrompt').toDict(),
+                'performerPrompts': [pr.get('performerPrompt').toDict(pr.get('userId')) for pr in prompt.get('performerPrompts')]}
+
     def promptsDict(self):
-        prompts = []
-        for prompt in self.prompts:
-            promptToAdd = {'groupPrompt': prompt.get('groupPrompt').toDict(),
-                           'performerPrompts': []}
-            for pr in prompt.get('performerPrompts'):
-
-                promptToAdd['performerPrompts'].append(pr.get('performerPrompt').toDict(pr.get('userId')))
-            prompts.append(promptToAdd)
-        return prompts
\ No newline at end of file
+        # Projected groups are never mutated, so a shallow copy is a stable snapshot.
+        return list(self.__promptsProjection)
\ No newline at end of file
@@ -1,50 +1,34 @@
-from objects.OpenAIConnector import OpenAIConnector
-from util.Dynamo.promptTableClient import PromptTableClient
-from util.Dynamo.logTableClient import LogTableClient
-from util.Dynamo.connections import getDynamoDbConnection
+import asyncio
+from objects.LLMServices import LLMServices
 from objects.Personalities import LLMPersonality
+from objects.LLMScheduler import LLMScheduler, llmRequest
 from copy import deepcopy
 
 class LLMQueryCreator:
-    def __init__(self):
-        self.__dynamoDb = getDynamoDbConnection()
-        self.__table = PromptTableClient(self.__dynamoDb)
-        self.__logTable = LogTableClient(self.__dynamoDb)
-        self.__promptScripts = None
-        self.__performanceLogs = None
-        self.__currentRoomNames = None
-        self.__openAIConnector = OpenAIConnector()
+    def __init__(self, services=None):
+        self.__services = services or LLMServices.shared()
         self.__personality = LLMPersonality()
         self.__centralTheme = None
 
+    @property
+    def services(self):
+        return self.__services
+
     @property
     def promptScripts(self):
-        if self.__promptScripts is None:
-            self.__promptScripts = self.__table.getAllPromptScripts()
-        return self.__promptScripts
+        return self.__services.promptScripts
 
     @property
     def promptTitles(self):
         return self.promptScripts['promptTitles']
 
-    @property
-    def performanceLogs(self):
-        if self.__performanceLogs is None:
-            self.__performanceLogs = self.__logTable.getLogs()
-        return self.__performanceLogs
-
-    def refreshPerformanceLogs(self):
-        self.__performanceLogs = self.__logTable.getLogs()
-
     @property
     def currentRoomNames(self):
-        if self.__currentRoomNames is None:
-            self.__currentRoomNames = list(self.performanceLogs.keys()) + ['lobby']
-        return self.__currentRoomNames
+        return self.__services.roomNameIndex.names
 
     @property
     def openAIConnector(self):
-        return self.__openAIConnector
+        return self.__services.openAIConnector
 
     @property
     def personality(self):
@@ -58,9 +42,10 @@ class LLMQueryCreator:
         context = self.promptScripts['systemContext']
         return context
 
-    def gettingToKnowYou(self):
+    @llmRequest(LLMScheduler.THEME)
+    async def gettingToKnowYou(self):
         prompt = self.promptScripts['gettingToKnowYou']
-        return self.openAIConnector.userOptionFeedback(prompt)
+        return await self.openAIConnector.userOptionFeedback(prompt)
 
     def attributeChangesString(self, oldPersonality, newPersonality):
         changes = []
@@ -80,48 +65,56 @@ class LLMQueryCreator:
         )
         print(changeSummary)
 
-    def createYourPersonality(self, room):
+    @llmRequest(LLMScheduler.PERSONALITY)
+    async def createYourPersonality(self, room):
         prompt = self.promptScripts['createYourPersonality']
-        return self.fineTuneYourPersonality(room, prompt)
+        return await self.fineTuneYourPersonality(room, prompt)
 
-    def fineTuneYourPersonality(self, room, prompt):
+    @llmRequest(LLMScheduler.PERSONALITY)
+    async def fineTuneYourPersonality(self, room, prompt):
         oldPersonality = deepcopy(self.personality)
         context = self.systemContext() + room.currentImprovisation.currentPerformerContext()
-        newPersonality = self.openAIConnector.getPersonality(prompt, self.personality, 'llm', context)
+        newPersonality = await self.openAIConnector.getPersonality(prompt, self.personality, 'llm', context)
         self.printPersonalityChanges('llm', oldPersonality, self.personality)
         return newPersonality
 
-    def centralThemeFineTunePerformerPersonality(self, room, performer, response):
-        prompt = (f"The performer has responded to a suggested central theme for the improvisation. "
-                  f"Performer with userId {performer.userId} {response.get('reaction')} the theme {room.currentImprovisation.centralTheme}. ")
+    def centralThemeReactionString(self, room, performer, response):
+        feedback = (f"The performer has responded to a suggested central theme for the improvisation. "
+                    f"Performer with userId {performer.userId} {response.get('reaction')} the theme {room.currentImprovisation.centralTheme}. ")
         suggestion = response.get('suggestion')
         if suggestion:
-            prompt += f'They suggested {suggestion}. '
-        prompt += f"Based on the response given by the performer, please revise their personality description and attributes appropriately."
-        return self.fineTunePerformerPersonality(performer, prompt, room)
-
-    def promptReactionFineTunePersonalities(self, performer, response, room):
-        prompt = response + f" Based on the response given by the performer, please revise their personality description and attributes appropriately."
-        performerPersonality = self.fineTunePerformerPersonality(performer, prompt, room)
-        llmPrompt = response + f" Based on the response given by the performer, please revise the LLM's personality description and attributes appropriately."
-        llmPersonality = self.fineTuneYourPersonality(room, llmPrompt)
-        return
-
-    def fineTunePerformerPersonality(self, performer, prompt, room=None):
+            feedback += f'They suggested {suggestion}. '
+        return feedback
+
+    @llmRequest(LLMScheduler.PERSONALITY)
+    async def fineTunePerformerFromFeedback(self, performer, feedback, room):
+        prompt = " ".join(feedback)
+        prompt += f" Based on the responses given by the performer, please revise their personality description and attributes appropriately."
+        return await self.fineTunePerformerPersonality(performer, prompt, room)
+
+    @llmRequest(LLMScheduler.PERSONALITY)
+    async def fineTuneDirectorFromFeedback(self, room, feedback):
+        prompt = " ".join(feedback)
+        prompt += f" Based on the responses given by the performers, please revise the LLM's personality description and attributes appropriately."
+        return await self.fineTuneYourPersonality(room, prompt)
+
+    @llmRequest(LLMScheduler.PERSONALITY)
+    async def fineTunePerformerPersonality(self, performer, prompt, room=None):
         oldPersonality = deepcopy(performer.personality)
         context = self.systemContext()
         if room:
             context += room.currentImprovisation.currentPerformerContext()
-        newPersonality = self.openAIConnector.getPersonality(prompt, performer.personality, 'performer', context)
+        newPersonality = await self.openAIConnector.getPersonality(prompt, performer.personality, 'performer', context)
         self.printPersonalityChanges('performer', oldPersonality, self.personality)
         return newPersonality
 
-    def nextSongPersonality(self, room):
+    @llmRequest(LLMScheduler.PERSONALITY)
+    async def nextSongPersonality(self, room):
         prompt = f"Performers are ready for another improvisation. Create a new improvDirector personality to lead this improvisation." \
                  f" This personality must be unique from the following personalities. " \
                  f"{room.pastLLMPersonalities()} ." \
                  f"Include a personality description and attributes as described. "
-        return self.fineTuneYourPersonality(room, prompt)
+        return await self.fineTuneYourPersonality(room, prompt)
 
     def processPerformerFeedback(self, performer, centralTheme=None, feedback=False, themeResponse=None):
         prompt = f"{performer.performerString()} "
@@ -136,10 +129,54 @@ class LLMQueryCreator:
                 prompt += f"The performer has this suggestion for the theme. {suggestion}. "
         return prompt
 
-    def updatePerformerPersonality(self, performer, feedbackString):
+    @llmRequest(LLMScheduler.PERSONALITY)
+    async def updatePerformerPersonality(self, performer, feedbackString):
         prompt = "Provide a revised performer personality, including a description and attributes, based on the following feedback. "
         prompt += feedbackString if feedbackString else ""
-        return self.fineTunePerformerPersonality(performer, prompt)
+        return await self.fineTunePerformerPersonality(performer, prompt)
+
+    @llmRequest(LLMScheduler.PERSONALITY)
+    async def updatePerformerPersonalities(self, performers, feedbackString=None, room=None):
+        """
+        Revises every performer's personality with one call. Performers missing from the response, or whose
+        entry is invalid, fall back to their own updatePerformerPersonality call.
+        """
+        prompt = "Provide a revised personality, including a description and attributes, for each performer, based on the following feedback. "
+        prompt += feedbackString if feedbackString else ""
+        return await self.revisePerformerPersonalities(performers, prompt, room,
+                                                       lambda performer: self.updatePerformerPersonality(performer, feedbackString))
+
+    @llmRequest(LLMScheduler.PERSONALITY)
+    async def fineTunePerformersFromFeedback(self, performerFeedback, room):
+        """
+        Folds each performer's feedback into their personality with one call.
+
+        :param performerFeedback: List of (performer, list of feedback strings).
+        """
+        if len(performerFeedback) == 1:
+            performer, feedback = performerFeedback[0]
+            return {performer.userId: await self.fineTunePerformerFromFeedback(performer, feedback, room)}
+        prompt = "Performers have responded during the improvisation. "
+        for performer, feedback in performerFeedback:
+            prompt += f"Performer with userId {performer.userId}: {' '.join(feedback)} "
+        prompt += "Based on the responses given by each performer, please revise their personality description and attributes appropriately."
+        feedbackByUserId = {performer.userId: feedback for performer, feedback in performerFeedback}
+        return await self.revisePerformerPersonalities([performer for performer, _ in performerFeedback], prompt, room,
+                                                       lambda performer: self.fineTunePerformerFromFeedback(performer, feedbackByUserId[performer.userId], room))
+
+    async def revisePerformerPersonalities(self, performers, prompt, room, fallback):
+        if not performers:
+            return {}
+        context = self.systemContext()
+        if room:
+            context += room.currentImprovisation.currentPerformerContext()
+        updatedPersonalities = await self.openAIConnector.getPerformerPersonalities(prompt, performers, context)
+        updatedPersonalities.pop('error', None)
+        missing = [performer for performer in performers if performer.userId not in updatedPersonalities]
+        fallbackPersonalities = await asyncio.gather(*(fallback(performer) for performer in missing))
+        for performer, personality in zip(missing, fallbackPersonalities):
+            updatedPersonalities[performer.userId] = personality
+        return updatedPersonalities
 
     def getPerformerIds(self, improvisation):
         performerIds = f"Include performerPrompts for performers with userId: "
@@ -147,96 +184,122 @@ class LLMQueryCreator:
             performerIds += f'{performer.userId}, '
         return performerIds
 
-    def initiatePerformance(self, room):
+    @llmRequest(LLMScheduler.PROMPT)
+    async def initiatePerformance(self, room):
         improvisation = room.currentImprovisation
         context = self.systemContext() + improvisation.currentSystemContext()
         prompt = f"Create the starting prompts for this performance. {self.getPerformerIds(improvisation)}"
-        return self.openAIConnector.createPrompts(prompt, improvisation, context)
+        return await self.openAIConnector.createPrompts(prompt, improvisation, context)
 
-    def provideNewPrompts(self, room):
+    @llmRequest(LLMScheduler.PROMPT)
+    async def provideNewPrompts(self, room):
         improvisation = room.currentImprovisation
         context = self.systemContext() + improvisation.currentSystemContext()
         prompt = improvisation.currentPromptContext()
-        endPrompt = prompt + \
-                    'Is it time to end this performance? Respond with only yes or no.'
-        endSong = self.openAIConnector.getResponseFromLLM(endPrompt, context)
-        if 'yes' == endSong:
-            return self.concludePerformance(room)
-        prompt += f" What should happen next? " \
+        prompt += f" Is it time to end this performance? If not, what should happen next? " \
                   f"Create new group and performer prompts to describe how the improvisation should develop." \
                   f" {self.getPerformerIds(improvisation)}"
-        return self.openAIConnector.createPrompts(prompt, improvisation, context)
+        newPrompts = await self.openAIConnector.createPrompts(prompt, improvisation, context, allowEnd=True)
+        if newPrompts.get('endPerformance') is True:
+            return await self.concludePerformance(room)
+        return newPrompts
 
-    def concludePerformance(self, room):
+    @llmRequest(LLMScheduler.PROMPT)
+    async def concludePerformance(self, room):
         improvisation = room.currentImprovisation
         context = self.systemContext() + improvisation.currentSystemContext()
         prompt = improvisation.currentPromptContext()
         prompt += f"Create the final prompts to resolve this performance. {self.getPerformerIds(improvisation)}"
-        improvisation.finalPrompt = True
-        room.cancelAllTasks()
-        return self.openAIConnector.createPrompts(prompt, improvisation, context)
+        finalPrompts = await self.openAIConnector.createPrompts(prompt, improvisation, context)
+        # The improvisation ends only when these prompts are published, not when they are generated.
+        finalPrompts['finalPrompt'] = True
+        return finalPrompts
 
-    def groupMoveOn(self, room):
+    @llmRequest(LLMScheduler.PROMPT)
+    async def groupMoveOn(self, room):
         improvisation = room.currentImprovisation
         context = self.systemContext() + improvisation.currentSystemContext()
         prompt = improvisation.currentPromptContext()
         prompt += f"Performers have decided it is time to move on from this prompt. Create the next group and performer Prompts. "
-        return self.openAIConnector.createPrompts(prompt, improvisation, context)
+        return await self.openAIConnector.createPrompts(prompt, improvisation, context)
 
-    def groupRejectPrompt(self, room):
+    @llmRequest(LLMScheduler.PROMPT)
+    async def groupRejectPrompt(self, room):
         improvisation = room.currentImprovisation
         context = self.systemContext() + improvisation.currentSystemContext()
         prompt = improvisation.currentPromptContext()
         prompt += "Performers have rejected this groupPrompt. " \
                   "Create new, contrasting, group and performer Prompts. " \
                   "Change the direction of the music."
-        return self.openAIConnector.createPrompts(prompt, improvisation, context)
+        return await self.openAIConnector.createPrompts(prompt, improvisation, context)
 
-    def nextPerformerPrompt(self, room, performer):
+    @llmRequest(LLMScheduler.PROMPT)
+    async def nextPerformerPrompt(self, room, performer):
         improvisation = room.currentImprovisation
         context = self.systemContext() + improvisation.currentSystemContext()
         prompt = improvisation.currentPromptContext()
         prompt += f"What should performer with userId {performer.userId} do next? " \
                   f"Provide them with their next performerPrompt.  "
-        newPrompt = self.openAIConnector.createPerformerPrompt(prompt, improvisation, performer, context)
+        newPrompt = await self.openAIConnector.createPerformerPrompt(prompt, improvisation, performer, context)
         newPrompt['userId'] = performer.userId
         return newPrompt
 
-    def performerMoveOn(self, room, performer):
+    @llmRequest(LLMScheduler.PROMPT)
+    async def nextPerformerPrompts(self, room, performers):
+        """
+        Returns a dictionary of userId to next performerPrompt. Performers missing from the
+        batched response fall back to their own nextPerformerPrompt call.
+        """
+        improvisation = room.currentImprovisation
+        context = self.systemContext() + improvisation.currentSystemContext()
+        prompt = improvisation.currentPromptContext()
+        userIds = ', '.join(performer.userId for performer in performers)
+        prompt += f"What should the performers with userIds {userIds} do next? " \
+                  f"Provide each of them with their next performerPrompt.  "
+        response = await self.openAIConnector.createPerformerPrompts(prompt, improvisation, performers, context)
+        newPrompts = {newPrompt['userId']: newPrompt for newPrompt in response.get('performerPrompts', [])}
+        missing = [performer for performer in performers if performer.userId not in newPrompts]
+        fallbackPrompts = await asyncio.gather(*(self.nextPerformerPrompt(room, performer) for performer in missing))
+        for performer, newPrompt in zip(missing, fallbackPrompts):
+            newPrompts[performer.userId] = newPrompt
+        return newPrompts
+
+    @llmRequest(LLMScheduler.PROMPT)
+    async def performerMoveOn(self, room, performer):
         improvisation = room.currentImprovisation
         context = self.systemContext() + improvisation.currentSystemContext()
         prompt = improvisation.currentPromptContext()
         prompt += f"Performer with userId {performer.userId} wants to move on from their current performerPrompt. " \
                   f"Provide them with their next performerPrompt.  "
-        newPrompt =  self.openAIConnector.createPerformerPrompt(prompt, improvisation, performer, context)
+        newPrompt =  await self.openAIConnector.createPerformerPrompt(prompt, improvisation, performer, context)
         newPrompt['userId'] = performer.userId
         return newPrompt
 
-    def performerRejectPrompt(self, room, performer):
+    @llmRequest(LLMScheduler.PROMPT)
+    async def performerRejectPrompt(self, room, performer):
         improvisation = room.currentImprovisation
         context = self.systemContext() + improvisation.currentSystemContext()
         prompt = improvisation.currentPromptContext()
         prompt += f"Performers with userId {performer.userId} has rejected their performerPrompt. " \
                   "Create a new, different, performerPrompt for them. " \
                   "Change the direction of the music. "
-        newPrompt = self.openAIConnector.createPerformerPrompt(prompt, improvisation, performer, context)
+        newPrompt = await self.openAIConnector.createPerformerPrompt(prompt, improvisation, performer, context)
         newPrompt['userId'] = performer.userId
         return newPrompt
 
     def generateRoomName(self):
-        roomNames = {roomName.split('-')[0] for roomName in self.currentRoomNames}
-        currentRoomNamesStr = ', '.join(roomNames)
-        prompt = self.promptScripts['generateRoomName']
-        prompt += f'The word cannot be in {currentRoomNamesStr}. '
-        return self.openAIConnector.getResponseFromLLM(prompt)
+        return self.__services.roomNameGenerator.generateRoomName()
 
-    def closingSummary(self, room):
+    @llmRequest(LLMScheduler.SUMMARY)
+    async def closingSummary(self, room, improvisation=None):
+        improvisation = improvisation or room.currentImprovisation
         prompt = self.promptScripts['closingSummary']
-        prompt += room.currentImprovisation.currentPromptContext()
-        return self.openAIConnector.getResponseFromLLM(prompt, self.systemContext())
+        prompt += improvisation.currentPromptContext()
+        return await self.openAIConnector.getResponseFromLLM(prompt, self.systemContext())
 
-    def getWelcomeMessage(self):
-        return self.openAIConnector.getResponseFromLLM(self.promptScripts['wellHelloThere'])
+    @llmRequest(LLMScheduler.THEME)
+    async def getWelcomeMessage(self):
+        return await self.openAIConnector.getResponseFromLLM(self.promptScripts['wellHelloThere'])
 
     def getPastThemes(self, room):
         pastThemes = ""
@@ -245,27 +308,30 @@ class LLMQueryCreator:
         return (f"This performance has already explored these themes.  {pastThemes}."
                 f"The new theme must try something new.")
 
-    def getCentralTheme(self, room):
+    @llmRequest(LLMScheduler.THEME)
+    async def getCentralTheme(self, room):
         prompt = self.promptScripts['getCentralTheme']
         context = self.systemContext() + room.currentImprovisation.currentSystemContext()
         if room.songCount > 1:
             prompt += self.getPastThemes(room)
-        return self.openAIConnector.getResponseFromLLM(prompt, context)
+        return await self.openAIConnector.getResponseFromLLM(prompt, context)
 
-    def getNewTheme(self, room, centralTheme):
+    @llmRequest(LLMScheduler.THEME)
+    async def getNewTheme(self, room, centralTheme):
         themePrompt = f'Performers have responded to the suggested central theme of "{centralTheme}"'
         themePrompt += f'The performers responses: {room.themeResponseString()}'
         personalityPrompt = themePrompt + 'Revise the current LLM personality to accomodate the performers response.'
-        newPersonality = self.openAIConnector.getPersonality(personalityPrompt, self.personality, 'llm',
+        newPersonality = await self.openAIConnector.getPersonality(personalityPrompt, self.personality, 'llm',
                                                              systemContext=self.systemContext())
         if room.songCount > 1:
             themePrompt += self.getPastThemes(room)
         themePrompt += self.promptScripts['tryNewCentralTheme']
-        return self.openAIConnector.getResponseFromLLM(themePrompt, self.systemContext())
+        return await self.openAIConnector.getResponseFromLLM(themePrompt, self.systemContext())
 
     def announceStart(self, room):
         return "Just getting things ready. One Moment. "
 
-    def aboutMe(self):
+    @llmRequest(LLMScheduler.THEME)
+    async def aboutMe(self):
         prompt = self.promptScripts['aboutMe']
-        return self.openAIConnector.getResponseFromLLM(prompt)
\ No newline at end of file
+        return await self.openAIConnector.getResponseFromLLM(prompt)
\ No newline at end of file
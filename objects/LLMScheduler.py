@@ -0,0 +1,165 @@
+import asyncio
+import functools
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from openai import RateLimitError
+from util.latencyTracker import LatencyTracker
+
+class LLMScheduler:
+    """
+    Process-wide admission control for LLM calls.
+
+    At most maxConcurrency calls are in flight. Waiting calls are admitted by priority class, and within a
+    class round robin across owners (one LLMQueryCreator per room), so one busy room cannot starve the others.
+    A rate limit response pauses every call for the provider's retry-after, or an exponential backoff.
+    """
+    PROMPT = 'prompt'
+    THEME = 'theme'
+    PERSONALITY = 'personality'
+    SUMMARY = 'summary'
+    PRIORITIES = [PROMPT, THEME, PERSONALITY, SUMMARY]
+    MIN_RATE_LIMIT_BACKOFF = 1
+    MAX_RATE_LIMIT_BACKOFF = 30
+    MAX_RATE_LIMIT_RETRIES = 3
+    __shared = None
+
+    def __init__(self, maxConcurrency=8):
+        self.__maxConcurrency = maxConcurrency
+        self.__active = 0
+        self.__queues = {priorityClass: OrderedDict() for priorityClass in self.PRIORITIES}
+        self.__waitTimes = {priorityClass: LatencyTracker(defaultLatency=0) for priorityClass in self.PRIORITIES}
+        self.__pausedUntil = 0
+        self.__rateLimitBackoff = self.MIN_RATE_LIMIT_BACKOFF
+        self.__rateLimited = 0
+
+    @classmethod
+    def shared(cls):
+        if cls.__shared is None:
+            cls.__shared = cls()
+        return cls.__shared
+
+    @staticmethod
+    def now():
+        return asyncio.get_running_loop().time()
+
+    def queued(self, priorityClass):
+        return sum(len(waiters) for waiters in self.__queues[priorityClass].values())
+
+    def metrics(self):
+        return {
+            'active': self.__active,
+            'rateLimited': self.__rateLimited,
+            'queued': {priorityClass: self.queued(priorityClass) for priorityClass in self.PRIORITIES},
+            'waitP95': {priorityClass: self.__waitTimes[priorityClass].percentile(95) for priorityClass in self.PRIORITIES},
+        }
+
+    async def run(self, call, priorityClass=None, owner=None):
+        """
+        Runs call() once admitted, retrying it after rate limit responses. The priority class and owner
+        default to those set by the llmRequest decorator on the calling method.
+        """
+        if priorityClass is None:
+            priorityClass, owner = currentLLMRequest.get()
+        await self.acquire(priorityClass, owner)
+        try:
+            attempt = 0
+            while True:
+                delay = self.__pausedUntil - self.now()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    result = await call()
+                except RateLimitError as e:
+                    attempt += 1
+                    self.pauseForRateLimit(e)
+                    if attempt > self.MAX_RATE_LIMIT_RETRIES:
+                        raise
+                    continue
+                self.__rateLimitBackoff = self.MIN_RATE_LIMIT_BACKOFF
+                return result
+        finally:
+            self.release()
+
+    def pauseForRateLimit(self, error):
+        self.__rateLimited += 1
+        retryAfter = None
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                retryAfter = float(response.headers.get('retry-after'))
+            except (TypeError, ValueError):
+                pass
+        if retryAfter is None:
+            retryAfter = self.__rateLimitBackoff
+            self.__rateLimitBackoff = min(self.MAX_RATE_LIMIT_BACKOFF, self.__rateLimitBackoff * 2)
+        self.__pausedUntil = max(self.__pausedUntil, self.now() + retryAfter)
+        print(f"LLM rate limited, pausing calls for {retryAfter} seconds")
+
+    async def acquire(self, priorityClass, owner):
+        startTime = self.now()
+        if self.__active < self.__maxConcurrency and not any(self.__queues.values()):
+            self.__active += 1
+            self.__waitTimes[priorityClass].record(0)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.__queues[priorityClass].setdefault(owner, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller was cancelled, hand the slot on.
+                self.release()
+            else:
+                self.removeWaiter(priorityClass, owner, future)
+            raise
+        self.__waitTimes[priorityClass].record(self.now() - startTime)
+
+    def removeWaiter(self, priorityClass, owner, future):
+        waiters = self.__queues[priorityClass].get(owner)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(future)
+        except ValueError:
+            pass
+        if not waiters:
+            del self.__queues[priorityClass][owner]
+
+    def release(self):
+        self.__active -= 1
+        while self.__active < self.__maxConcurrency:
+            future = self.nextWaiter()
+            if future is None:
+                return
+            if not future.done():
+                self.__active += 1
+                future.set_result(None)
+
+    def nextWaiter(self):
+        for priorityClass in self.PRIORITIES:
+            queue = self.__queues[priorityClass]
+            if queue:
+                # Take the first owner's oldest call and move that owner to the back of the class.
+                owner, waiters = next(iter(queue.items()))
+                future = waiters.popleft()
+                del queue[owner]
+                if waiters:
+                    queue[owner] = waiters
+                return future
+        return None
+
+# Priority class and owner of the LLM calls made by the current task, set by llmRequest.
+currentLLMRequest = ContextVar('currentLLMRequest', default=(LLMScheduler.SUMMARY, None))
+
+def llmRequest(priorityClass):
+    """Decorates an LLMQueryCreator coroutine method so its LLM calls are scheduled in priorityClass for its room."""
+    def decorate(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            token = currentLLMRequest.set((priorityClass, self))
+            try:
+                return await method(self, *args, **kwargs)
+            finally:
+                currentLLMRequest.reset(token)
+        return wrapper
+    return decorate
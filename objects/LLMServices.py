@@ -0,0 +1,82 @@
+from objects.OpenAIConnector import OpenAIConnector
+from util.Dynamo.promptTableClient import PromptTableClient
+from util.Dynamo.logTableClient import LogTableClient
+from util.Dynamo.connections import getSharedDynamoDbConnection
+from objects.RoomNameIndex import RoomNameIndex
+from objects.RoomNameGenerator import RoomNameGenerator
+from objects.FallbackPromptBank import FallbackPromptBank
+from util.latencyTracker import LatencyTracker
+
+class LLMServices:
+    """
+    Process-wide resources shared by every room's LLMQueryCreator: one OpenAI client
+    (and its HTTP connection pool), one DynamoDB resource, the prompt script cache
+    the room name index and generator, and the fallback prompt bank.
+    """
+    __shared = None
+
+    def __init__(self):
+        self.__dynamoDb = getSharedDynamoDbConnection()
+        self.__table = PromptTableClient(self.__dynamoDb)
+        self.__logTable = LogTableClient(self.__dynamoDb)
+        self.__openAIConnector = OpenAIConnector()
+        self.__promptScripts = None
+        self.__roomNameIndex = RoomNameIndex(self.__logTable)
+        self.__roomNameGenerator = RoomNameGenerator(self.__roomNameIndex, self.__openAIConnector)
+        self.__fallbackPromptBank = FallbackPromptBank()
+        self.__promptLatency = LatencyTracker()
+        self.__promptCycles = 0
+        self.__promptCycleLLMCalls = 0
+
+    @classmethod
+    def shared(cls):
+        if cls.__shared is None:
+            cls.__shared = cls()
+        return cls.__shared
+
+    @property
+    def dynamoDb(self):
+        return self.__dynamoDb
+
+    @property
+    def openAIConnector(self):
+        return self.__openAIConnector
+
+    @property
+    def promptScripts(self):
+        if self.__promptScripts is None:
+            self.__promptScripts = self.__table.getAllPromptScripts()
+        return self.__promptScripts
+
+    @property
+    def roomNameIndex(self):
+        return self.__roomNameIndex
+
+    @property
+    def roomNameGenerator(self):
+        return self.__roomNameGenerator
+
+    @property
+    def fallbackPromptBank(self):
+        return self.__fallbackPromptBank
+
+    @property
+    def promptLatency(self):
+        return self.__promptLatency
+
+    @property
+    def promptCycles(self):
+        return self.__promptCycles
+
+    @property
+    def promptCycleLLMCalls(self):
+        return self.__promptCycleLLMCalls
+
+    def recordPromptCycle(self, llmCalls):
+        self.__promptCycles += 1
+        self.__promptCycleLLMCalls += llmCalls
+
+    def llmCallsPerPromptCycle(self):
+        if not self.__promptCycles:
+            return 0
+        return self.__promptCycleLLMCalls / self.__promptCycles
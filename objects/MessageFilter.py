@@ -1,8 +1,11 @@
 from objects.Room import Room
 from util.Dynamo.logTableClient import LogTableClient
-from util.Dynamo.connections import getDynamoDbConnection
-from util.Dynamo.userTableClient import UserTableClient
+from util.Dynamo.connections import getSharedDynamoDbConnection
+from objects.LLMQueryCreator import LLMQueryCreator
+from util.Dynamo.userTableClient import getUserProfileCache
 from util.JWTVerify import verify_jwt
+import asyncio
+import time
 import traceback
 import jwt
 
@@ -104,7 +107,7 @@ class MessageFilter:
         return self.__currentRoom.prepareGameStateResponse(action='newObserver')
 
     async def handleAboutMe(self, message):
-        aboutMe = self.__query.aboutMe()
+        aboutMe = await self.__query.aboutMe()
         return {
             'action': 'aboutMe',
             'message': aboutMe,
@@ -117,7 +120,7 @@ class MessageFilter:
             userId = currentPlayer.get('userId')
             if not self.currentClient.userId:
                 self.currentClient.userId = userId
-            playerData = self.handleGetUserData(userId)
+            playerData = await self.handleGetUserData(userId)
             updatedData = {key: playerData[key] for key in ['screenName', 'instrument', 'personality'] if
                            key in playerData}
             self.currentClient.updatePlayerProfile(updatedData)
@@ -147,7 +150,7 @@ class MessageFilter:
         }
 
     async def handleGetStarted(self, message):
-        welcomeMessage = self.__currentRoom.sayHello()
+        welcomeMessage = await self.__currentRoom.sayHello()
         return {'action': 'welcome',
                 'gameStatus': 'welcome',
                 'responseRequired': False,
@@ -155,18 +158,9 @@ class MessageFilter:
                 'message': welcomeMessage,
                 'clients': [self.__currentClient]}
 
-    def handleGetUserData(self, sub):
+    async def handleGetUserData(self, sub):
         try:
-            dynamoDb = getDynamoDbConnection()
-            table = UserTableClient(dynamoDb)
-            response = table.getItem({'sub': sub})
-            userData = response['Item']
-            personality = userData.get('personality')
-            attributes = personality.get('attributes', None)
-            if personality and attributes:
-                attributeValuesToFloat = {key: float(value) for key, value in attributes.items()}
-                userData['personality']['attributes'] = attributeValuesToFloat
-            return userData
+            return await getUserProfileCache().get(sub)
         except Exception as e:
             traceback.print_exc()
 
@@ -183,7 +177,7 @@ class MessageFilter:
 
         if registeredUser:
             self.currentClient.registeredUser = True
-            userData = self.handleGetUserData(userId)
+            userData = await self.handleGetUserData(userId)
             if userData:
                 currentPlayer['instrument'] = instrument or userData.get('instrument')
                 currentPlayer['screenName'] = screenName or userData.get('screenName')
@@ -205,10 +199,13 @@ class MessageFilter:
         roomNameToJoin = message.get('roomName')
         if currentPlayer.get('roomCreator'):
             # Create a new room
-            self.currentRoom = Room(LLMQueryCreator=self.__query, broadcastHandler=self.__broadcastHandler)
+            roomName = self.__query.generateRoomName()
+            self.__query = LLMQueryCreator(self.__query.services)
+            self.currentRoom = Room(LLMQueryCreator=self.__query, roomName=roomName, broadcastHandler=self.__broadcastHandler)
             self.currentRoomName = self.currentRoom.roomName
             self.__currentRooms[self.currentRoomName] = self.currentRoom
             self.currentClient.roomCreator = True
+            return await self.currentRoom.submit(self.openRoom)
         else:
             # Join an existing room
             if not self.currentRoomName or self.currentRoomName == 'lobby':
@@ -221,7 +218,16 @@ class MessageFilter:
                     'responseAction': 'joinRoom'
                 }
             self.currentRoom = self.__currentRooms.get(roomNameToJoin.lower())
+            return await self.currentRoom.submit(self.addClientToRoom)
 
+    async def openRoom(self):
+        """The new room's first command: starts its warm-up and adds its creator."""
+        self.currentRoom.warmUp.start()
+        # The clients still waiting in the lobby are the ones about to register for this room.
+        self.currentRoom.runInBackground(self.__currentRooms['lobby'].prefetchPerformerProfiles())
+        return await self.addClientToRoom()
+
+    async def addClientToRoom(self):
         # Add player to the room and update game state
         await self.currentRoom.addPlayerToRoom(self.__currentClient)
         self.removePlayerFromLobby()
@@ -232,9 +238,17 @@ class MessageFilter:
             self.currentRoom.currentImprovisation.gameStatus = "Theme Selection"
 
         if self.currentRoom.currentImprovisation.gameStatus == "Theme Selection":
-            self.currentRoom.currentImprovisation.initializeImprovDirectorPersonality()
-            self.currentRoom.currentImprovisation.getCentralTheme(self.currentRoom)
-            response = self.currentRoom.prepareGameStateResponse('newCentralTheme')
+            warmUp = self.currentRoom.warmUp
+            if warmUp.active:
+                # The warm-up presents its theme once generated, and refines it for the new line-up.
+                warmUp.performerJoined()
+                if warmUp.themeReady:
+                    self.currentRoom.currentImprovisation.centralTheme = await warmUp.theme()
+                    response = self.currentRoom.prepareGameStateResponse('newCentralTheme')
+            else:
+                await self.currentRoom.currentImprovisation.initializeImprovDirectorPersonality()
+                await self.currentRoom.currentImprovisation.getCentralTheme(self.currentRoom)
+                response = self.currentRoom.prepareGameStateResponse('newCentralTheme')
         return response
 
     async def handleStartPerformance(self, message=None):
@@ -242,11 +256,13 @@ class MessageFilter:
         if not self.currentRoom.themeApproved:
             improv.gameStatus = 'Theme Selection'
             if not self.currentRoom.currentImprovisation.centralTheme:
-                centralTheme = improv.getCentralTheme(self.currentRoom)
+                improv.centralTheme = await self.currentRoom.warmUp.theme()
+            if not improv.centralTheme:
+                centralTheme = await improv.getCentralTheme(self.currentRoom)
             response = self.currentRoom.prepareGameStateResponse('newCentralTheme')
             return response
         else:
-            return self.initializePerformance()
+            return await self.initializePerformance()
 
     async def handleCentralThemeResponse(self, message):
         improv = self.__currentRoom.currentImprovisation
@@ -258,10 +274,10 @@ class MessageFilter:
         feedback += f"The performer {reaction} the central Theme."
         if suggestion:
             feedback += f"The performer suggests: {suggestion}. "
-        self.currentRoom.addThemeReaction(self.currentClient, playerReaction, feedback)
+        await self.currentRoom.addThemeReaction(self.currentClient, playerReaction, feedback)
         progress = len(self.currentRoom.themeReactions)
         if len(self.currentRoom.performers) == progress:
-            newTheme = improv.refineTheme(self.__currentRoom)
+            newTheme = await improv.refineTheme(self.__currentRoom)
             if self.currentRoom.themeConsensus():
                 return await self.initializePerformance()
             self.currentRoom.clearThemeReactions()
@@ -284,11 +300,30 @@ class MessageFilter:
         return self.currentRoom.prepareGameStateResponse(action='endSong')
 
     async def handlePerformanceComplete(self, message):
-        self.currentRoom.currentImprovisation.logEnding()
-        improv = self.currentRoom.currentImprovisation
-        improv.summarizePerformance(self.currentRoom)
-        self.dumpGameLog(improv.gameLog)
-        return await self.handlePlayAgain()
+        """
+        Ends the song and moves straight on to the next theme. The closing summary and the log write only feed
+        the game log, so they run in the background. The next theme waits only for the next director personality,
+        which needs the finished song's game log.
+        """
+        startTime = time.monotonic()
+        room = self.currentRoom
+        improv = room.currentImprovisation
+        improv.logEnding()
+        # Snapshot the log before the director personality changes for the next song.
+        improv.createGameLog(room)
+        room.runInBackground(self.archivePerformance(room, improv))
+        response = await self.handlePlayAgain()
+        room.songTurnaround.record(time.monotonic() - startTime)
+        return response
+
+    async def archivePerformance(self, room, improv):
+        try:
+            await improv.summarizePerformance(room)
+        except Exception as e:
+            # The log is still worth keeping without its summary.
+            print(f"Closing summary failed for {improv.gameLog.get('roomName')}: {e}")
+            improv.gameLog['summary'] = ''
+        await self.dumpGameLog(improv.gameLog)
 
     async def handleReactToPrompt(self, message):
         prompt = message.get('prompt')
@@ -298,6 +333,18 @@ class MessageFilter:
         response = self.currentRoom.prepareGameStateResponse('newGameState')
         return response
 
+    async def handleAckGameState(self, message):
+        self.currentClient.stateVersion = message.get('version')
+        return
+
+    async def handleResyncGameState(self, message):
+        # The client missed a delta, send it the full game state and restart from that version.
+        response = self.currentRoom.prepareGameStateResponse('newGameState')
+        response['version'] = self.currentRoom.gameStateTracker.version
+        response['clients'] = [self.currentClient]
+        self.currentClient.stateVersion = None
+        return response
+
     async def handleDefault(self, message):
         return
 
@@ -319,16 +366,17 @@ class MessageFilter:
             }
         )
 
-    def dumpGameLog(self, log):
-        dynamoDb = getDynamoDbConnection()
-        table = LogTableClient(dynamoDb)
-        table.putItem(log)
+    async def dumpGameLog(self, log):
+        table = LogTableClient(getSharedDynamoDbConnection())
+        await asyncio.to_thread(table.putItem, log)
+        self.__query.services.roomNameIndex.add(log.get('roomName'))
 
     def updateRoom(self, newRoom):
-        """Update the current room and its broadcastHandler and queryConnector."""
+        """Update the current room and its broadcastHandler and use the room's queryConnector."""
         self.__currentRoom = newRoom
         self.__broadcastHandler = newRoom.broadcastMessage
-        newRoom.LLMQueryCreator = self.__query
+        if newRoom.LLMQueryCreator:
+            self.__query = newRoom.LLMQueryCreator
 
     async def verifyAuthentication(self, message):
         action = message.get('action')
@@ -344,7 +392,7 @@ class MessageFilter:
                 }
 
             try:
-                decoded_token = verify_jwt(token)
+                decoded_token = await verify_jwt(token)
 
             except jwt.ExpiredSignatureError:
             # Handle specific case of expired token
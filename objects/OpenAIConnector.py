@@ -1,13 +1,30 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from util.awsSecretRetrieval import getAISecret
+from contextvars import ContextVar
+from objects.LLMScheduler import LLMScheduler
 import json
-import time
+import asyncio
+
+class LLMCallCounter:
+    def __init__(self):
+        self.calls = 0
+
+# Counter for the LLM calls made by the current task, set around a unit of work such as a prompt cycle.
+currentCallCounter = ContextVar('currentCallCounter', default=None)
 
 class OpenAIConnector:
     def __init__(self):
         oaKey, oaProject, model = getAISecret()
-        self.client = OpenAI(api_key=oaKey)
+        self.client = AsyncOpenAI(api_key=oaKey)
         self.model = model
+        self.callCount = 0
+
+    async def createChatCompletion(self, **kwargs):
+        self.callCount += 1
+        counter = currentCallCounter.get()
+        if counter is not None:
+            counter.calls += 1
+        return await LLMScheduler.shared().run(lambda: self.client.chat.completions.create(**kwargs))
 
     def promptIntervalContext(self):
         return ("All prompts must include a promptInterval. "
@@ -18,10 +35,10 @@ class OpenAIConnector:
                 "PromptIntervals must be long enough for the player to reasonably implement the suggested prompt before it is replaced. "
                 "Encourage variety in promptIntervals where appropriate.")
 
-    def getResponseFromLLM(self, prompt, systemContext=None,):
+    async def getResponseFromLLM(self, prompt, systemContext=None,):
         systemMessage = self.getSystemMessage(systemContext)
         try:
-            chat_completion = self.client.chat.completions.create(
+            chat_completion = await self.createChatCompletion(
                 messages=[
                     {"role": "system", "content": systemMessage},
                     {"role": "user", "content": prompt}],
@@ -33,7 +50,13 @@ class OpenAIConnector:
             print(f"Error in LLM response: {e}")
             raise e
 
-    def createPrompts(self, prompt, improvisation, systemContext=None, max_retries=3, backoff_factor=2):
+    async def createPrompts(self, prompt, improvisation, systemContext=None, max_retries=3, backoff_factor=2, allowEnd=False):
+        """
+        Generate the next group prompt and performer prompts.
+
+        With allowEnd the same call also decides whether the performance should end. When the LLM
+        decides to end, the response is returned with endPerformance set and the prompts are not validated.
+        """
         attempt = 0
         systemMessage = self.getSystemMessage(systemContext) + self.promptIntervalContext()
         systemMessage += (
@@ -42,56 +65,63 @@ class OpenAIConnector:
             "'performerPrompts': [ { 'userId': 'string', 'performerPrompt': 'string', 'promptInterval': 'string' } ] }."
             )
 
+        functionSpec = {
+            "name": "get_group_and_performer_prompts",
+            "description": "Generate a group-level prompt and individual performer prompts.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "groupPrompt": {
+                        "type": "string",
+                        "description": "The overarching prompt for all performers."
+                    },
+                    "groupPromptInterval": {
+                        "type": "string",
+                        "description": "The length of time, in seconds, before this prompt should be replaced."
+                    },
+                    "performerPrompts": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "userId": {"type": "string"},
+                                "performerPrompt": {
+                                    "type": "string",
+                                    "description": "A performer-specific prompt for the performer with this userId."
+                                },
+                                "promptInterval": {
+                                    "type": "string",
+                                    "description": "The length of time, in seconds, before this prompt should be replaced."
+                                },
+
+                            },
+                            "required": ["userId", "performerPrompt"]
+                        }
+                    }
+                },
+                "required": ["groupPrompt", "groupPromptInterval", "performerPrompts"],
+                "additionalProperties": False
+            }
+        }
+        if allowEnd:
+            systemMessage += " Set endPerformance to true only if it is time to end this performance."
+            functionSpec["parameters"]["properties"]["endPerformance"] = {
+                "type": "boolean",
+                "description": "True if it is time to end this performance instead of continuing with these prompts."
+            }
+            functionSpec["parameters"]["required"].append("endPerformance")
+
         validUserIds = {performer.userId for performer in improvisation.performers}
 
         while attempt < max_retries:
             try:
-                chatCompletion = self.client.chat.completions.create(
+                chatCompletion = await self.createChatCompletion(
                     model=self.model,
                     messages=[
                         {"role": "system", "content": systemMessage},
                         {"role": "user", "content": prompt}
                     ],
-                    functions=[
-                        {
-                            "name": "get_group_and_performer_prompts",
-                            "description": "Generate a group-level prompt and individual performer prompts.",
-                            "parameters": {
-                                "type": "object",
-                                "properties": {
-                                    "groupPrompt": {
-                                        "type": "string",
-                                        "description": "The overarching prompt for all performers."
-                                    },
-                                    "groupPromptInterval": {
-                                        "type": "string",
-                                        "description": "The length of time, in seconds, before this prompt should be replaced."
-                                    },
-                                    "performerPrompts": {
-                                        "type": "array",
-                                        "items": {
-                                            "type": "object",
-                                            "properties": {
-                                                "userId": {"type": "string"},
-                                                "performerPrompt": {
-                                                    "type": "string",
-                                                    "description": "A performer-specific prompt for the performer with this userId."
-                                                },
-                                                "promptInterval": {
-                                                    "type": "string",
-                                                    "description": "The length of time, in seconds, before this prompt should be replaced."
-                                                },
-
-                                            },
-                                            "required": ["userId", "performerPrompt"]
-                                        }
-                                    }
-                                },
-                                "required": ["groupPrompt", "groupPromptInterval", "performerPrompts"],
-                                "additionalProperties": False
-                            }
-                        }
-                    ],
+                    functions=[functionSpec],
                     function_call={"name": "get_group_and_performer_prompts"}
                 )
                 choice = chatCompletion.choices[0]
@@ -100,6 +130,9 @@ class OpenAIConnector:
 
                 promptsData = json.loads(arguments)
 
+                if allowEnd and promptsData.get("endPerformance") is True:
+                    return promptsData
+
                 if "groupPrompt" not in promptsData or "performerPrompts" not in promptsData or len(promptsData['performerPrompts']) < 1 or "groupPromptInterval" not in promptsData:
                     raise KeyError("Required keys not found in LLM response.")
 
@@ -135,9 +168,9 @@ class OpenAIConnector:
             # Exponential backoff
             sleep_time = backoff_factor ** attempt
             print(f"Retrying in {sleep_time} seconds...")
-            time.sleep(sleep_time)
+            await asyncio.sleep(sleep_time)
 
-    def createPerformerPrompt(self, prompt, improvisation, performer, systemContext=None, max_retries=3, backoff_factor=2):
+    async def createPerformerPrompt(self, prompt, improvisation, performer, systemContext=None, max_retries=3, backoff_factor=2):
         """
         Generate a single performer-specific prompt as a string and update the improvisation.
 
@@ -150,7 +183,7 @@ class OpenAIConnector:
             backoff_factor (int, optional): Exponential backoff factor for retries. Defaults to 2.
 
         Returns:
-            str: The generated performer prompt.
+            dict: The generated performer prompt, or {'error': ...}.
         """
         attempt = 0
         systemMessage = self.getSystemMessage(systemContext) + self.promptIntervalContext()
@@ -168,7 +201,7 @@ class OpenAIConnector:
         while attempt < max_retries:
             try:
                 # Make a single LLM API call to generate the performer prompt
-                chatCompletion = self.client.chat.completions.create(
+                chatCompletion = await self.createChatCompletion(
                     model=self.model,
                     messages=[
                         {"role": "system", "content": systemMessage},
@@ -224,14 +257,114 @@ class OpenAIConnector:
             # Handle max retries
             if attempt >= max_retries:
                 print("Max retries reached. Exiting.")
-                return "Error: Failed to retrieve performer prompt after multiple attempts."
+                return {"error": "Failed to retrieve performer prompt after multiple attempts."}
 
             # Exponential backoff
             sleep_time = backoff_factor ** attempt
             print(f"Retrying in {sleep_time} seconds...")
-            time.sleep(sleep_time)
+            await asyncio.sleep(sleep_time)
+
+    async def createPerformerPrompts(self, prompt, improvisation, performers, systemContext=None, max_retries=3, backoff_factor=2):
+        """
+        Generate the next performer prompt for several performers in a single call.
+
+        Args:
+            prompt (str): Specific instructions for generating the performer prompts.
+            improvisation (object): An instance of the improvisation class with performers data.
+            performers (list): The performers who need a new prompt.
+            systemContext (str, optional): Additional system context to guide the LLM. Defaults to None.
+            max_retries (int, optional): Maximum number of retries in case of failure. Defaults to 3.
+            backoff_factor (int, optional): Exponential backoff factor for retries. Defaults to 2.
+
+        Returns:
+            dict: {'performerPrompts': [...]} with one prompt per requested performer, or {'error': ...}.
+        """
+        attempt = 0
+        systemMessage = self.getSystemMessage(systemContext) + self.promptIntervalContext()
+        systemMessage += (
+            " When generating a response, ensure it matches the following structure exactly: "
+            "{ 'performerPrompts': [ { 'userId': 'string', 'performerPrompt': 'string', 'promptInterval': 'string' } ] }."
+        )
+
+        validUserIds = {performer.userId for performer in improvisation.performers}
+        requestedUserIds = {performer.userId for performer in performers}
+        invalidUserIds = requestedUserIds - validUserIds
+        if invalidUserIds:
+            raise ValueError(f"Invalid userIds: {', '.join(invalidUserIds)}")
 
-    def getPersonality(self, prompt, currentPersonality, personalityType, systemContext=None, max_retries=3,
+        while attempt < max_retries:
+            try:
+                chatCompletion = await self.createChatCompletion(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": systemMessage},
+                        {"role": "user", "content": prompt}
+                    ],
+                    functions=[
+                        {
+                            "name": "get_performer_prompts",
+                            "description": "Generate the next prompt for each of several performers.",
+                            "parameters": {
+                                "type": "object",
+                                "properties": {
+                                    "performerPrompts": {
+                                        "type": "array",
+                                        "items": {
+                                            "type": "object",
+                                            "properties": {
+                                                "userId": {"type": "string"},
+                                                "performerPrompt": {
+                                                    "type": "string",
+                                                    "description": "A performer-specific prompt for the performer with this userId."
+                                                },
+                                                "promptInterval": {
+                                                    "type": "string",
+                                                    "description": "The length of time, in seconds, before this prompt should be replaced."
+                                                },
+                                            },
+                                            "required": ["userId", "performerPrompt", "promptInterval"]
+                                        }
+                                    }
+                                },
+                                "required": ["performerPrompts"],
+                                "additionalProperties": False
+                            }
+                        }
+                    ],
+                    function_call={"name": "get_performer_prompts"}
+                )
+
+                choice = chatCompletion.choices[0]
+                promptsData = json.loads(choice.message.function_call.arguments)
+
+                if "performerPrompts" not in promptsData:
+                    raise KeyError("Required keys not found in LLM response.")
+
+                # Keep only prompts for the requested performers
+                performerPrompts = [performerPrompt for performerPrompt in promptsData["performerPrompts"]
+                                    if performerPrompt.get("userId") in requestedUserIds
+                                    and "performerPrompt" in performerPrompt]
+                if not performerPrompts:
+                    raise ValueError("No prompts for the requested userIds.")
+
+                return {"performerPrompts": performerPrompts}
+
+            except (KeyError, json.JSONDecodeError, ValueError) as e:
+                print(f"Attempt {attempt + 1}/{max_retries} failed with error: {e}")
+            except Exception as e:
+                print(f"Unexpected error during attempt {attempt + 1}: {e}")
+
+            attempt += 1
+
+            if attempt >= max_retries:
+                print("Max retries reached. Exiting.")
+                return {"error": "Failed to retrieve performer prompts after multiple attempts."}
+
+            sleep_time = backoff_factor ** attempt
+            print(f"Retrying in {sleep_time} seconds...")
+            await asyncio.sleep(sleep_time)
+
+    async def getPersonality(self, prompt, currentPersonality, personalityType, systemContext=None, max_retries=3,
                        backoff_factor=2):
         attempt = 0
         personalityContext = ("A personality describes the musical tendencies of a performer or the improvDirector LLM."
@@ -286,7 +419,7 @@ class OpenAIConnector:
                 systemMessage += f" Ensure the response contains the following attributes: {', '.join(requiredAttributes)}."
 
                 # Make the LLM API call with structured response
-                chatCompletion = self.client.chat.completions.create(
+                chatCompletion = await self.createChatCompletion(
                     model=self.model,
                     messages=[
                         {"role": "system", "content": systemMessage},
@@ -333,9 +466,131 @@ class OpenAIConnector:
             # Exponential backoff
             sleep_time = backoff_factor ** attempt
             print(f"Retrying in {sleep_time} seconds...")
-            time.sleep(sleep_time)
+            await asyncio.sleep(sleep_time)
+
+    async def getPerformerPersonalities(self, prompt, performers, systemContext=None, max_retries=3, backoff_factor=2):
+        """
+        Revise the personalities of several performers in a single call.
+
+        Args:
+            prompt (str): Feedback and instructions for revising the personalities.
+            performers (list): The performers whose personalities are revised.
+            systemContext (str, optional): Additional system context to guide the LLM. Defaults to None.
+            max_retries (int, optional): Maximum number of retries in case of failure. Defaults to 3.
+            backoff_factor (int, optional): Exponential backoff factor for retries. Defaults to 2.
+
+        Returns:
+            dict: userId to updated personality, for each performer whose entry in the response was valid,
+                  or {'error': ...}.
+        """
+        attempt = 0
+        personalityContext = ("A personality describes the musical tendencies of a performer."
+                              " The personality includes a description (50 words or less) and a set of personality attribute scores.")
+        performersByUserId = {performer.userId: performer for performer in performers}
+        requiredAttributes = list(performers[0].personality.attributes.keys())
+        systemMessage = (
+            f"{self.getSystemMessage()} {personalityContext}"
+            f" These personalities are for performers. {performers[0].personality.personalityAttributesContext()}"
+            f" Return one personality for each of the performers with userId: {', '.join(performersByUserId)}."
+            f" Ensure each personality contains the following attributes: {', '.join(requiredAttributes)}."
+        )
+
+        if systemContext:
+            systemMessage = systemContext + " " + systemMessage
+
+        functionSpec = {
+            "name": "update_performer_personalities",
+            "description": "Revised personality description and attributes for each performer.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "personalities": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "userId": {
+                                    "type": "string",
+                                    "description": "The userId of the performer."
+                                },
+                                "description": {
+                                    "type": "string",
+                                    "description": "A textual description of the musical personality, about 10 words.",
+                                },
+                                "attributes": {
+                                    "type": "array",
+                                    "description": "The personality attributes and their scores.",
+                                    "items": {
+                                        "type": "object",
+                                        "properties": {
+                                            "name": {
+                                                "type": "string",
+                                                "description": "The name of the attribute."
+                                            },
+                                            "value": {
+                                                "type": "number",
+                                                "description": "Value for the attribute, ranging between -10 and 10."
+                                            }
+                                        },
+                                        "required": ["name", "value"]
+                                    }
+                                }
+                            },
+                            "required": ["userId", "description", "attributes"]
+                        }
+                    }
+                },
+                "required": ["personalities"],
+                "additionalProperties": False
+            }
+        }
+
+        while attempt < max_retries:
+            try:
+                chatCompletion = await self.createChatCompletion(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": systemMessage},
+                        {"role": "user", "content": prompt}
+                    ],
+                    functions=[functionSpec],
+                    function_call={"name": "update_performer_personalities"}
+                )
+
+                structuredOutput = json.loads(chatCompletion.choices[0].message.function_call.arguments)
+                updatedPersonalities = {}
+                # Validate each entry on its own, a bad entry only costs that performer a separate call.
+                for entry in structuredOutput['personalities']:
+                    performer = performersByUserId.get(entry.get('userId'))
+                    newDescription = entry.get('description')
+                    newAttributes = entry.get('attributes') or []
+                    if performer is None or not newDescription:
+                        continue
+                    attributes = {attr.get('name'): attr.get('value') for attr in newAttributes}
+                    missingAttributes = [attr for attr in performer.personality.attributes if attributes.get(attr) is None]
+                    if missingAttributes:
+                        print(f"⚠️ Missing attributes for {performer.userId}: {missingAttributes}.")
+                        continue
+                    performer.personality.updatePersonality({'description': newDescription, 'attributes': attributes})
+                    updatedPersonalities[performer.userId] = performer.personality
+                return updatedPersonalities
+
+            except (KeyError, TypeError, json.JSONDecodeError) as e:
+                print(f"Attempt {attempt + 1}/{max_retries} failed with error: {e}")
+            except Exception as e:
+                print(f"Unexpected error during attempt {attempt + 1}: {e}")
+
+            attempt += 1
+
+            if attempt >= max_retries:
+                print("Max retries reached. Exiting.")
+                return {"error": "Failed to retrieve performer personalities after multiple attempts."}
+
+            sleep_time = backoff_factor ** attempt
+            print(f"Retrying in {sleep_time} seconds...")
+            await asyncio.sleep(sleep_time)
 
-    def userOptionFeedback(self, prompt):
+    async def userOptionFeedback(self, prompt):
         systemMessage = (f"{self.getSystemMessage()}"
                         "The performance has not started yet."
                          "You are collecting feedback from users to fine tune your style of musical leadership."
@@ -343,7 +598,7 @@ class OpenAIConnector:
                         "{'question': 'Which prompt do you prefer?', 'options': ['prompt1', 'prompt2']} "
                          "Only respond in this JSON format without additional text.")
         try:
-            chat_completion = self.client.chat.completions.create(
+            chat_completion = await self.createChatCompletion(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": systemMessage},
@@ -393,5 +648,5 @@ class OpenAIConnector:
 
 if __name__ == "__main__":
     connector = OpenAIConnector()
-    response = connector.getResponseFromLLM("Hello, how are you?")
+    response = asyncio.run(connector.getResponseFromLLM("Hello, how are you?"))
     print(response)
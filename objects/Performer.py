@@ -1,14 +1,13 @@
-from util.Dynamo.userTableClient import UserTableClient
-from util.Dynamo.connections import getDynamoDbConnection
+from util.Dynamo.userTableClient import getUserWriteQueue, getUserProfileCache
 from objects.Personalities import PerformerPersonality
+from objects.ClientOutbox import ClientOutbox
 from datetime import datetime
 from decimal import Decimal
 
 class Performer:
     def __init__(self, websocket, userId=None, screenName=None, instrument=None):
-        self.__dynamoDb = getDynamoDbConnection()
-        self.__table = UserTableClient(self.__dynamoDb)
         self.__websocket = websocket
+        self.__outbox = ClientOutbox(websocket)
         self.__userId = userId
         self.__screenName = screenName
         self.__instrument = instrument
@@ -18,6 +17,7 @@ class Performer:
         self.__roomCreator = False
         self.__personality = PerformerPersonality()
         self.__currentRoom = None
+        self.__stateVersion = None
 
     @property
     def websocket(self):
@@ -27,6 +27,10 @@ class Performer:
     def websocket(self, websocket):
         self.__websocket = websocket
 
+    @property
+    def outbox(self):
+        return self.__outbox
+
     @property
     def userId(self):
         return self.__userId
@@ -108,6 +112,15 @@ class Performer:
         self.__personality = personality
         self.updateDynamo()
 
+    @property
+    def stateVersion(self):
+        """Last game state version this client acknowledged, None if it never has."""
+        return self.__stateVersion
+
+    @stateVersion.setter
+    def stateVersion(self, stateVersion):
+        self.__stateVersion = stateVersion
+
     @property
     def currentRoom(self):
         return self.__currentRoom
@@ -152,12 +165,14 @@ class Performer:
         # personality = self.personality.toDict()
         personality = self.personality.toDecimalDict()
         # personality["attributes"] = {k: Decimal(str(v)) for k, v in personality["attributes"].items()}
-        self.__table.putItem({
+        item = {
             'sub': self.__userId,
             'screenName': self.__screenName,
             'instrument': self.__instrument,
             'personality': personality,
-        })
+        }
+        getUserProfileCache().put(item)
+        getUserWriteQueue().put(item)
 
     def updateUserData(self, message):
         self.userId = message.get('userId', self.userId)
@@ -0,0 +1,74 @@
+import asyncio
+from objects.TimerScheduler import TimerScheduler
+
+class PersonalityTuner:
+    # Wait this many seconds after the latest reaction before tuning, but no longer than MAX_DELAY after the first.
+    DEBOUNCE = 5
+    MAX_DELAY = 20
+
+    def __init__(self, room):
+        """
+        Folds performer reactions into personality updates that run in the background.
+
+        Feedback gathered while waiting, or while an update is running, is applied in one update per
+        personality, so reacting to a prompt never waits on personality rewrites.
+        """
+        self.__room = room
+        self.__performerFeedback = {}
+        self.__directorFeedback = []
+        self.__firstFeedbackAt = None
+        self.__job = None
+        self.__runs = 0
+        self.__foldedFeedback = 0
+
+    @property
+    def runs(self):
+        return self.__runs
+
+    @property
+    def foldedFeedback(self):
+        return self.__foldedFeedback
+
+    @property
+    def pending(self):
+        return bool(self.__performerFeedback or self.__directorFeedback)
+
+    def addFeedback(self, performer, feedback, tuneDirector=False):
+        performerFeedback = self.__performerFeedback.setdefault(performer.userId, (performer, []))[1]
+        performerFeedback.append(feedback)
+        if tuneDirector:
+            self.__directorFeedback.append(feedback)
+        self.__foldedFeedback += 1
+        now = TimerScheduler.now()
+        if self.__firstFeedbackAt is None:
+            self.__firstFeedbackAt = now
+        delay = max(0, min(self.DEBOUNCE, self.__firstFeedbackAt + self.MAX_DELAY - now))
+        self.__room.scheduleTask('tunePersonalities', self.start, delay)
+
+    async def start(self):
+        self.flush()
+
+    def flush(self):
+        """
+        Starts updating from the pending feedback now. The update runs detached from the timer, so neither
+        rescheduling the timer for new feedback nor cancelling the room's timers cancels it.
+        """
+        if self.pending and (self.__job is None or self.__job.done()):
+            self.__job = asyncio.create_task(self.run())
+
+    async def run(self):
+        while self.pending:
+            performerFeedback, self.__performerFeedback = self.__performerFeedback, {}
+            directorFeedback, self.__directorFeedback = self.__directorFeedback, []
+            self.__firstFeedbackAt = None
+            self.__runs += 1
+            query = self.__room.LLMQueryCreator
+            updates = [query.fineTunePerformersFromFeedback(list(performerFeedback.values()), self.__room)]
+            if directorFeedback:
+                updates.append(query.fineTuneDirectorFromFeedback(self.__room, directorFeedback))
+            results = await asyncio.gather(*updates, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"Personality tuning failed: {result}")
+            for performer, _ in performerFeedback.values():
+                performer.updateDynamo()
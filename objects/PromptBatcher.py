@@ -0,0 +1,74 @@
+import asyncio
+import itertools
+from objects.TimerScheduler import TimerScheduler
+
+class PromptBatcher:
+    def __init__(self, generateBatch, window=3, owner=None):
+        """
+        Gathers prompt requests made within window seconds of each other and serves them with one call.
+
+        Each window's flush is a TimerScheduler timer under owner, so cancelling the owner's timers also
+        drops a batch that has not been generated yet.
+
+        :param generateBatch: Coroutine function taking a list of userIds and returning a dictionary
+                              of userId to new prompt.
+        """
+        self.__generateBatch = generateBatch
+        self.__window = window
+        self.__owner = owner
+        self.__pending = {}
+        self.__flushTimer = None
+        self.__windows = itertools.count()
+        self.__batches = 0
+        self.__requests = 0
+
+    @property
+    def batches(self):
+        return self.__batches
+
+    @property
+    def requests(self):
+        return self.__requests
+
+    async def request(self, userId):
+        if self.__flushTimer is None or self.__flushTimer.cancelled:
+            if self.__flushTimer is not None:
+                # The owner's timers were cancelled along with the requests waiting on that window.
+                self.dropPending()
+            # Keyed per window, so scheduling the next window does not cancel a batch still being generated.
+            key = (self, next(self.__windows))
+            self.__flushTimer = TimerScheduler.shared().schedule(self.__window, self.flush, key, self.__owner)
+        future = self.__pending.get(userId)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.__pending[userId] = future
+            self.__requests += 1
+        # Shield the shared future so a cancelled timer does not cancel the batch for everyone else.
+        return await asyncio.shield(future)
+
+    def dropPending(self):
+        pending, self.__pending = self.__pending, {}
+        for future in pending.values():
+            future.cancel()
+
+    async def flush(self):
+        batch, self.__pending = self.__pending, {}
+        # Requests arriving while this batch is generated start the next window.
+        self.__flushTimer = None
+        if not batch:
+            return
+        self.__batches += 1
+        try:
+            newPrompts = await self.__generateBatch(list(batch.keys()))
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for userId, future in batch.items():
+            if not future.done():
+                future.set_result(newPrompts.get(userId))
@@ -0,0 +1,59 @@
+from collections import deque
+
+class PromptContext:
+    def __init__(self, recentGroups=4, summaryEntries=12, summaryWords=15):
+        """
+        Builds the prompt history sent to the LLM with a bounded size.
+
+        The last recentGroups prompt groups are included verbatim. Older groups are folded, once,
+        into a compact summary of their shortened group prompts, keeping at most summaryEntries of them.
+        The result is cached until the prompts change.
+        """
+        self.__recentGroups = recentGroups
+        self.__summaryWords = summaryWords
+        self.__summaryLines = deque(maxlen=summaryEntries)
+        self.__summarizedGroups = 0
+        self.__cacheKey = None
+        self.__context = None
+
+    def build(self, prompts):
+        if not prompts:
+            return "The performance has not started, there are no prompts yet."
+        cacheKey = (len(prompts), len(prompts[-1].get('performerPrompts')))
+        if cacheKey == self.__cacheKey:
+            return self.__context
+
+        firstRecent = max(0, len(prompts) - self.__recentGroups)
+        while self.__summarizedGroups < firstRecent:
+            self.__summaryLines.append(self.summarizeGroup(prompts[self.__summarizedGroups], self.__summarizedGroups + 1))
+            self.__summarizedGroups += 1
+
+        parts = ["Here are the prompts so far in the performance. "]
+        if self.__summarizedGroups:
+            omitted = self.__summarizedGroups - len(self.__summaryLines)
+            parts.append("Summary of earlier prompts: ")
+            if omitted:
+                parts.append(f"{omitted} earliest prompts omitted. ")
+            parts.extend(self.__summaryLines)
+            parts.append("Most recent prompts: ")
+        for promptCount in range(firstRecent, len(prompts)):
+            parts.append(self.describeGroup(prompts[promptCount], promptCount + 1))
+
+        self.__cacheKey = cacheKey
+        self.__context = "".join(parts)
+        return self.__context
+
+    def summarizeGroup(self, promptGroup, promptCount):
+        words = promptGroup.get('groupPrompt').prompt.split()
+        gPrompt = " ".join(words[:self.__summaryWords])
+        if len(words) > self.__summaryWords:
+            gPrompt += "..."
+        performerPromptCount = len(promptGroup.get('performerPrompts'))
+        return f"{promptCount}. Time: {promptGroup.get('timestamp')}. Prompt: {gPrompt} ({performerPromptCount} performer prompts). "
+
+    def describeGroup(self, promptGroup, promptCount):
+        parts = [f"{promptCount}. Time: {promptGroup.get('timestamp')}. Prompt: {promptGroup.get('groupPrompt').prompt} ."]
+        for pPromptCount, pPrompt in enumerate(promptGroup.get('performerPrompts'), start=1):
+            prompt = pPrompt.get('performerPrompt').prompt
+            parts.append(f"{pPromptCount}. Time: {pPrompt.get('timestamp')}. UserId: {pPrompt.get('userId')}. Prompt: {prompt}")
+        return "".join(parts)
@@ -1,17 +1,44 @@
 import asyncio
 import json
 from objects.Improvisation import Improvisation
+from util.Dynamo.userTableClient import getUserProfileCache
+from objects.TimerScheduler import TimerScheduler
+from objects.RoomActor import RoomActor
+from objects.ClientOutbox import ClientOutbox
+from objects.GameStateTracker import GameStateTracker
+from objects.PersonalityTuner import PersonalityTuner
+from objects.RoomWarmUp import RoomWarmUp
+from util.latencyTracker import LatencyTracker
+import time
 
 class Room:
+    # Slow audience sockets are disconnected, performers lose their oldest queued frames instead.
+    AUDIENCE_OVERFLOW_POLICY = ClientOutbox.DISCONNECT
+    # Broadcast actions that clients acknowledging game state versions receive as deltas.
+    DELTA_ACTIONS = {'newGameState'}
+    # newGameState broadcasts within this many seconds of each other go out as one frame with the latest state.
+    COALESCED_ACTIONS = {'newGameState'}
+    BROADCAST_COALESCE_WINDOW = 0.005
+    # Close a room this many seconds after its last performer and audience member leave, unless someone rejoins.
+    CLOSE_EMPTY_AFTER = 60
+
     def __init__(self, LLMQueryCreator=None, roomName=None, broadcastHandler=None):
         self.__LLMQueryCreator = LLMQueryCreator
-        if roomName is None:
-            self.__roomName = self.__LLMQueryCreator.generateRoomName()
-        else:
-            self.__roomName = roomName
+        self.__roomName = roomName
+        self.__actor = RoomActor(roomName)
+        # Seconds to encode a broadcast and queue it for every client, not including delivery.
+        self.__enqueueLatency = LatencyTracker(defaultLatency=0)
+        # Seconds from a song ending to the next theme being sent.
+        self.__songTurnaround = LatencyTracker(defaultLatency=0)
+        self.__backgroundTasks = set()
+        self.__gameStateTracker = GameStateTracker()
+        self.__personalityTuner = PersonalityTuner(self)
+        self.__warmUp = RoomWarmUp(self)
+        self.__pendingBroadcast = None
+        self.__sentBroadcasts = 0
+        self.__coalescedBroadcasts = 0
         self.__performers = []
         self.__audience = []
-        self.__scheduledTasks = {}
         self.__broadcastHandler = broadcastHandler
         self.__songCount = 0
         # self.__performanceMode = False
@@ -31,6 +58,40 @@ class Room:
     def roomName(self):
         return self.__roomName
 
+    @property
+    def actor(self):
+        return self.__actor
+
+    @property
+    def gameStateTracker(self):
+        return self.__gameStateTracker
+
+    @property
+    def songTurnaround(self):
+        return self.__songTurnaround
+
+    @property
+    def warmUp(self):
+        return self.__warmUp
+
+    @property
+    def personalityTuner(self):
+        return self.__personalityTuner
+
+    @property
+    def enqueueLatency(self):
+        return self.__enqueueLatency
+
+    def broadcastMetrics(self):
+        clients = self.__performers + self.__audience
+        return {
+            'sentBroadcasts': self.__sentBroadcasts,
+            'coalescedBroadcasts': self.__coalescedBroadcasts,
+            'enqueueP95': self.__enqueueLatency.percentile(95),
+            # The slowest client's p95 from queueing a frame to its socket accepting it.
+            'deliveryP95': max((client.outbox.deliveryLatency.percentile(95) for client in clients), default=0),
+        }
+
     @property
     def performers(self):
         return self.__performers
@@ -40,8 +101,8 @@ class Room:
         return self.__audience
 
     @property
-    def scheduledTasks(self):
-        return self.__scheduledTasks
+    def isEmpty(self):
+        return not self.__performers and not self.__audience
 
     @property
     def broadcastHandler(self):
@@ -88,6 +149,7 @@ class Room:
     async def addPlayerToRoom(self, performer):
         self.__performers.append(performer)
         performer.currentRoom = self
+        self.currentImprovisation.invalidateSpeculativePrompts()
         if self.currentImprovisation is not None and self.currentImprovisation.gameStatus == "improvise" and len(
                 self.performers) > 0:
             # groupPrompt = await self.LLMQueryCreator.getUpdatedPrompts(self, 'groupPrompt')
@@ -99,48 +161,134 @@ class Room:
         newClient.currentRoom = self
         if newClient not in self.performers:
             self.performers.append(newClient)
+            self.currentImprovisation.invalidateSpeculativePrompts()
         userId = newClient.userId
         currentPrompt = self.currentImprovisation.getCurrentPerformerPrompt(userId).get('performerPrompt')
         currentGroupPrompt = self.currentImprovisation.currentPrompts.get('groupPrompt')
-        await self.currentImprovisation.schedulePromptUpdate(currentPrompt, userId)
-        await self.currentImprovisation.schedulePromptUpdate(currentGroupPrompt)
+        self.currentImprovisation.schedulePromptUpdate(currentPrompt, userId)
+        self.currentImprovisation.schedulePromptUpdate(currentGroupPrompt)
         return
 
+    async def prefetchPerformerProfiles(self):
+        await getUserProfileCache().prefetch([performer.userId for performer in self.__performers])
+
     def addAudienceToRoom(self, client):
         client.currentRoom = self
+        client.outbox.overflowPolicy = self.AUDIENCE_OVERFLOW_POLICY
         self.__audience.append(client)
 
     async def broadcastMessage(self, message):
-        if self.__performers:
-           await asyncio.gather(*[performer.websocket.send(json.dumps(message)) for performer in self.__performers])
-        if self.__audience:
-            await asyncio.gather(*[audienceMember.websocket.send(json.dumps(message)) for audienceMember in self.__audience])
+        """
+        Broadcast message to the room. Game state refreshes are held for BROADCAST_COALESCE_WINDOW so a burst
+        of them is sent once with the latest state. Any other broadcast is sent right away, after a held refresh
+        so the room's frames stay in order.
+        """
+        if message.get('gameState') is None or message.get('action') not in self.COALESCED_ACTIONS:
+            if self.__pendingBroadcast is not None:
+                TimerScheduler.shared().cancel((self, 'flushBroadcast'))
+                self.sendPendingBroadcast()
+            self.sendBroadcast(message)
+            return
+        if self.__pendingBroadcast is None:
+            self.scheduleTask('flushBroadcast', self.flushBroadcast, self.BROADCAST_COALESCE_WINDOW)
+        else:
+            self.__coalescedBroadcasts += 1
+        self.__pendingBroadcast = message
+
+    async def flushBroadcast(self):
+        self.sendPendingBroadcast()
+
+    def sendPendingBroadcast(self):
+        message = self.__pendingBroadcast
+        self.__pendingBroadcast = None
+        if message is not None:
+            self.sendBroadcast(message)
+
+    def sendBroadcast(self, message):
+        startTime = time.monotonic()
+        self.__sentBroadcasts += 1
+        deltaFrame = None
+        gameState = message.get('gameState')
+        if gameState is not None:
+            version, delta = self.__gameStateTracker.update(gameState)
+            message = {**message, 'version': version}
+            if delta is not None and message.get('action') in self.DELTA_ACTIONS:
+                deltaFrame = json.dumps({'action': 'gameStateDelta',
+                                         'sourceAction': message.get('action'),
+                                         'roomName': self.__roomName,
+                                         'delta': delta})
+        # Encode once and hand the frame to each client's outbox, so a slow socket holds up nobody else.
+        frame = json.dumps(message)
+        for client in self.__performers + self.__audience:
+            if deltaFrame and self.__gameStateTracker.canSendDelta(client.stateVersion):
+                client.outbox.send(deltaFrame)
+            else:
+                client.outbox.send(frame)
+        self.__enqueueLatency.record(time.monotonic() - startTime)
         if message.get('action') != 'heartbeat':
             print(f"Broadcast {message.get('action')} to room {self.__roomName}")
-        return
 
     async def concludePerformance(self):
         await self.currentImprovisation.concludePerformance()
         return
 
-    def sayHello(self):
-        return self.__LLMQueryCreator.getWelcomeMessage()
+    async def sayHello(self):
+        return await self.__LLMQueryCreator.getWelcomeMessage()
 
-    def leaveRoom(self, performer):
-        if performer in self.__performers:
-            self.__performers.remove(performer)
+    def leaveRoom(self, client):
+        if client in self.__performers:
+            self.__performers.remove(client)
+            self.currentImprovisation.invalidateSpeculativePrompts()
+        if client in self.__audience:
+            self.__audience.remove(client)
         if not self.__performers:
             self.cancelAllTasks()
 
+    def close(self):
+        """
+        Stops the room's timers and its actor, once the room has been removed from the server.
+        Background tasks, such as archiving the last song, still run to completion.
+        """
+        self.cancelAllTasks()
+        self.__actor.stop()
+
+    async def submit(self, command):
+        """
+        Run command on the room's actor. The lobby only hands clients over to rooms,
+        so its commands run inline rather than queueing every connection behind each other.
+        """
+        if self.__roomName == 'lobby':
+            return await command()
+        return await self.__actor.submit(command)
+
+    def runInBackground(self, coroutine):
+        """
+        Runs coroutine as a task that outlives the room's timers, such as archiving a finished song.
+        """
+        task = asyncio.create_task(coroutine)
+        self.__backgroundTasks.add(task)
+        task.add_done_callback(self.backgroundTaskDone)
+        return task
+
+    def backgroundTaskDone(self, task):
+        self.__backgroundTasks.discard(task)
+        if not task.cancelled() and task.exception():
+            print(f"Error in background task for room {self.__roomName}: {task.exception()}")
+
+    def scheduleTask(self, taskName, callback, delay=0):
+        TimerScheduler.shared().schedule(delay, callback, (self, taskName), self)
+
     def cancelAllTasks(self):
-        for task in self.__scheduledTasks.values():
-            task.cancel()
+        self.__pendingBroadcast = None
+        # Feedback still waiting on the tuner's timer would be lost with it.
+        self.__personalityTuner.flush()
+        TimerScheduler.shared().cancelOwner(self)
 
     async def sendMessageToUser(self, message, client):
         response = message.copy()
         response.pop('clients', None)
         if client in self.__performers:
-            await client.websocket.send(json.dumps(response))
+            client.outbox.send(json.dumps(response))
             detail = response.get('message')
             if not detail:
                 detail = response.get('action')
@@ -184,12 +332,12 @@ class Room:
         }
         return response
 
-    def determineLLMPersonality(self):
-        self.LLMQueryCreator.initializeImprovDirectorPersonality(self)
+    async def determineLLMPersonality(self):
+        await self.LLMQueryCreator.createYourPersonality(self)
 
-    def updatePerformerPersonalities(self, feedback=None):
+    async def updatePerformerPersonalities(self, feedback=None):
+        await self.LLMQueryCreator.updatePerformerPersonalities(self.__performers, feedback, self)
         for performer in self.__performers:
-            self.LLMQueryCreator.updatePerformerPersonality(performer, feedback)
             performer.updateDynamo()
 
     def themeConsensus(self):
@@ -208,10 +356,9 @@ class Room:
             response += f"Performer {i+1}: {reply.get('reaction')}; {reply.get('suggestion')} "
         return response
 
-    def addThemeReaction(self, performer, reaction, feedback=None):
+    async def addThemeReaction(self, performer, reaction, feedback=None):
         self.__themeReactions.append(reaction)
-        self.LLMQueryCreator.centralThemeFineTunePerformerPersonality(self, performer, reaction)
-        performer.updateDynamo()
+        self.__personalityTuner.addFeedback(performer, self.LLMQueryCreator.centralThemeReactionString(self, performer, reaction))
 
     def clearThemeReactions(self):
         self.themeReactions = []
@@ -220,7 +367,7 @@ class Room:
         feedbackString = f"Performer {currentClient.userId} has reacted to this prompt. " \
                          f"{currentPromptTitle}: {currentPrompt}. " \
                          f"Their reaction is {reaction}"
-        performerPersonality = self.LLMQueryCreator.promptReactionFineTunePersonalities(currentClient, feedbackString, self)
+        self.__personalityTuner.addFeedback(currentClient, feedbackString, tuneDirector=True)
         await self.currentImprovisation.setPromptReaction(currentClient, reaction, currentPromptTitle)
         return
 
@@ -234,13 +381,12 @@ class Room:
                 }
 
     async def startNewImprovisation(self):
-        self.LLMQueryCreator.nextSongPersonality(self)
+        await self.LLMQueryCreator.nextSongPersonality(self)
         for performer in self.__performers:
             performer.resetPerformer()
         self.addImprovisation()
         self.__themeReactions = []
         self.__themeApproved = False
-        self.LLMQueryCreator.refreshPerformanceLogs()
         return
 
     def pastLLMPersonalities(self):
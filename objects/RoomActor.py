@@ -0,0 +1,78 @@
+import asyncio
+import time
+from util.latencyTracker import LatencyTracker
+
+class RoomActor:
+    def __init__(self, roomName, maxQueueSize=100):
+        """
+        Runs a room's commands one at a time, in arrival order, from a bounded inbox.
+
+        Commands are coroutine functions submitted by sockets and timers. Submitting waits while the
+        inbox is full, which pushes back on senders. A started command always runs to completion.
+        A command submitted from inside the running command is run inline, so nested submits cannot deadlock.
+        """
+        self.__roomName = roomName
+        self.__maxQueueSize = maxQueueSize
+        self.__inbox = None
+        self.__task = None
+        self.__processed = 0
+        self.__serviceTime = LatencyTracker(defaultLatency=0)
+
+    @property
+    def queueDepth(self):
+        return self.__inbox.qsize() if self.__inbox else 0
+
+    def metrics(self):
+        return {
+            'roomName': self.__roomName,
+            'queueDepth': self.queueDepth,
+            'processed': self.__processed,
+            'serviceTimeP95': self.__serviceTime.percentile(95),
+        }
+
+    async def submit(self, command):
+        if self.__task is not None and asyncio.current_task() is self.__task:
+            return await command()
+        if self.__task is None or self.__task.done():
+            self.__inbox = asyncio.Queue(self.__maxQueueSize)
+            self.__task = asyncio.create_task(self.__run())
+        future = asyncio.get_running_loop().create_future()
+        await self.__inbox.put((command, future))
+        return await future
+
+    def post(self, command):
+        """
+        Submits a command without waiting for it, for callers that are not coroutines.
+        """
+        return asyncio.create_task(self.submit(command))
+
+    def stop(self):
+        """
+        Stops the actor, cancelling the commands still waiting in the inbox so their submitters do not wait forever.
+        """
+        if self.__task and not self.__task.done():
+            self.__task.cancel()
+        while self.__inbox and not self.__inbox.empty():
+            command, future = self.__inbox.get_nowait()
+            future.cancel()
+
+    async def __run(self):
+        while True:
+            command, future = await self.__inbox.get()
+            # Skip commands whose submitter gave up, such as a replaced timer, before they start.
+            if future.cancelled():
+                continue
+            startTime = time.monotonic()
+            try:
+                result = await command()
+                if not future.done():
+                    future.set_result(result)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.__processed += 1
+                self.__serviceTime.record(time.monotonic() - startTime)
@@ -0,0 +1,86 @@
+import asyncio
+import random
+import re
+from data.RoomNames import roomNames
+
+class RoomNameGenerator:
+    def __init__(self, roomNameIndex, openAIConnector=None, minPoolSize=10, refillSize=20):
+        """
+        Generates unique room names locally from a curated word list.
+
+        When an openAIConnector is given, a pool of LLM suggested names is kept topped up in the
+        background and used first. Uniqueness is checked against the room name index.
+        """
+        self.__roomNameIndex = roomNameIndex
+        self.__openAIConnector = openAIConnector
+        self.__minPoolSize = minPoolSize
+        self.__refillSize = refillSize
+        self.__pool = []
+        self.__refillTask = None
+        self.__acceptRoomName = None
+
+    @property
+    def poolSize(self):
+        return len(self.__pool)
+
+    @property
+    def acceptRoomName(self):
+        return self.__acceptRoomName
+
+    @acceptRoomName.setter
+    def acceptRoomName(self, acceptRoomName):
+        """
+        Optional predicate a generated name must also satisfy, e.g. hashing to this worker's shard.
+        """
+        self.__acceptRoomName = acceptRoomName
+
+    def isAvailable(self, roomName):
+        if roomName in self.__roomNameIndex:
+            return False
+        return self.__acceptRoomName is None or self.__acceptRoomName(roomName)
+
+    def generateRoomName(self):
+        self.refillInBackground()
+        roomName = self.__nameFromPool() or self.__nameFromWordList()
+        self.__roomNameIndex.add(roomName)
+        return roomName
+
+    def refillInBackground(self):
+        if self.__openAIConnector is None or len(self.__pool) >= self.__minPoolSize:
+            return
+        if self.__refillTask and not self.__refillTask.done():
+            return
+        try:
+            self.__refillTask = asyncio.create_task(self.refillPool())
+        except RuntimeError:
+            # No running event loop, fall back to the word list only.
+            pass
+
+    async def refillPool(self):
+        prompt = (f"Suggest {self.__refillSize} evocative single words that could name a musical improvisation room. "
+                  f"Use lowercase letters only. Respond with only the words, separated by commas.")
+        try:
+            response = await self.__openAIConnector.getResponseFromLLM(prompt)
+        except Exception as e:
+            print(f"Failed to refill room name pool: {e}")
+            return
+        for word in response.split(','):
+            word = re.sub(r'[^a-z]', '', word.strip().lower())
+            if word and word not in self.__roomNameIndex and word not in self.__pool:
+                self.__pool.append(word)
+
+    def __nameFromPool(self):
+        self.__pool = [roomName for roomName in self.__pool if roomName not in self.__roomNameIndex]
+        for i, roomName in enumerate(self.__pool):
+            if self.isAvailable(roomName):
+                return self.__pool.pop(i)
+        return None
+
+    def __nameFromWordList(self):
+        available = [word for word in roomNames if self.isAvailable(word)]
+        if available:
+            return random.choice(available)
+        while True:
+            roomName = f"{random.choice(roomNames)}{random.randint(10, 9999)}"
+            if self.isAvailable(roomName):
+                return roomName
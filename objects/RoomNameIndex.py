@@ -0,0 +1,55 @@
+import asyncio
+
+class RoomNameIndex:
+    def __init__(self, logTable):
+        """
+        Set of room names already used, loaded once from the performance logs and kept up to date locally.
+
+        Logged room names carry a song suffix (roomName-songCount), only the base name is kept. The scan is
+        slow on a large log table, so servers warm the index with refresh() before accepting connections.
+        """
+        self.__logTable = logTable
+        self.__names = None
+
+    @staticmethod
+    def baseName(roomName):
+        return roomName.split('-')[0]
+
+    @property
+    def loaded(self):
+        return self.__names is not None
+
+    @property
+    def names(self):
+        if self.__names is None:
+            self.load()
+        return self.__names
+
+    def scanNames(self):
+        names = {'lobby'}
+        for roomName in self.__logTable.getRoomNames():
+            names.add(self.baseName(roomName))
+        return names
+
+    def load(self):
+        self.__names = self.scanNames()
+
+    async def refresh(self):
+        """
+        Reloads the names on a worker thread, keeping any names added while the scan ran.
+        """
+        try:
+            names = await asyncio.to_thread(self.scanNames)
+        except Exception as e:
+            print(f"Failed to refresh room names: {e}")
+            return
+        if self.__names:
+            names |= self.__names
+        self.__names = names
+
+    def add(self, roomName):
+        if roomName:
+            self.names.add(self.baseName(roomName))
+
+    def __contains__(self, roomName):
+        return self.baseName(roomName) in self.names
@@ -0,0 +1,99 @@
+import asyncio
+
+class RoomWarmUp:
+    # Wait this many seconds after the latest performer joins before refining the warmed-up theme.
+    REFINE_DEBOUNCE = 2
+
+    def __init__(self, room):
+        """
+        Generates a new room's director personality and candidate central theme in the background.
+
+        When performers join after the candidate was generated, a debounced refinement retunes the personality
+        and theme for the new line-up, and presents the new theme while nobody has reacted yet.
+        """
+        self.__room = room
+        self.__improvisation = None
+        self.__firstTheme = None
+        self.__refinement = None
+        self.__theme = None
+        # userIds of the performers the current personality and theme were generated for.
+        self.__roster = None
+        self.__refinements = 0
+
+    @property
+    def refinements(self):
+        return self.__refinements
+
+    @property
+    def active(self):
+        """True while the room is still on the improvisation the warm-up was started for."""
+        return self.__improvisation is not None and self.__improvisation is self.__room.currentImprovisation
+
+    @property
+    def themeReady(self):
+        return self.active and self.__theme is not None
+
+    def start(self):
+        self.__improvisation = self.__room.currentImprovisation
+        self.__firstTheme = asyncio.get_running_loop().create_future()
+        self.__room.runInBackground(self.generate())
+
+    def roster(self):
+        return frozenset(performer.userId for performer in self.__room.performers)
+
+    def choosingTheme(self):
+        return self.active and self.__improvisation.gameStatus in ('registration', 'Theme Selection') \
+            and not self.__room.themeReactions
+
+    async def generate(self):
+        self.__roster = self.roster()
+        try:
+            # The theme is written in the director's voice, so the personality comes first.
+            await self.__improvisation.initializeImprovDirectorPersonality()
+            self.__theme = await self.__room.LLMQueryCreator.getCentralTheme(self.__room)
+        finally:
+            self.__firstTheme.set_result(self.__theme)
+        # Posted rather than submitted: an actor command may be waiting on theme().
+        self.__room.actor.post(self.presentTheme)
+        return self.__theme
+
+    async def theme(self):
+        """
+        The warmed-up theme, waiting for the first one if it is still being generated. None if unavailable.
+        Waits only for the theme itself, never on the room's actor, so actor commands can call it.
+        """
+        if not self.active:
+            return None
+        if self.__theme is None:
+            await asyncio.shield(self.__firstTheme)
+        return self.__theme
+
+    def performerJoined(self):
+        # A generation that has not started yet will include the new performer anyway.
+        if not self.choosingTheme() or self.__roster is None or self.roster() == self.__roster:
+            return
+        self.__room.scheduleTask('refineWarmUp', self.startRefinement, self.REFINE_DEBOUNCE)
+
+    async def startRefinement(self):
+        # Run detached from the timer, so a newer join rescheduling it does not cancel a running refinement.
+        if self.__refinement is None or self.__refinement.done():
+            self.__refinement = self.__room.runInBackground(self.refine())
+
+    async def refine(self):
+        await asyncio.shield(self.__firstTheme)
+        query = self.__room.LLMQueryCreator
+        while self.choosingTheme() and self.roster() != self.__roster:
+            self.__roster = self.roster()
+            prompt = f"{self.__improvisation.currentPerformerContext()} " \
+                     f"Revise the improvDirector personality to suit the performers who have joined."
+            await query.fineTuneYourPersonality(self.__room, prompt)
+            self.__theme = await query.getCentralTheme(self.__room)
+            self.__refinements += 1
+        self.__room.actor.post(self.presentTheme)
+
+    async def presentTheme(self):
+        if not self.choosingTheme() or not self.__theme or self.__improvisation.centralTheme == self.__theme:
+            return
+        self.__improvisation.centralTheme = self.__theme
+        if self.__room.performers and self.__improvisation.gameStatus == 'Theme Selection':
+            await self.__room.handleResponse(self.__room.prepareGameStateResponse('newCentralTheme'))
@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import json
+import websockets
+from collections import OrderedDict
+from objects.ShardRing import ShardRing
+from util.awsSecretRetrieval import origins
+
+class ShardGateway:
+    # Lobby messages that build a client's profile on its worker. The latest of each is replayed when the
+    # client moves to another shard, marked with REPLAY_KEY, which the worker copies to its reply so the
+    # reply is not passed on.
+    PROFILE_ACTIONS = ('getCurrentPlayer', 'updateProfile')
+    REPLAY_KEY = 'gatewayReplay'
+    # Remember the last room of this many users, to route their rejoins.
+    MAX_REMEMBERED_USERS = 10000
+
+    def __init__(self, workerPorts, host="0.0.0.0", port=8765):
+        """
+        Front process that relays websocket frames to the worker owning the room in each message.
+
+        New connections are spread over the workers' lobbies. A message naming a room is sent to the
+        shard that owns the room, moving the client's upstream connection when the shard changes.
+        """
+        self.__workerUris = [f"ws://127.0.0.1:{workerPort}" for workerPort in workerPorts]
+        self.__ring = ShardRing(len(workerPorts))
+        self.__host = host
+        self.__port = port
+        self.__lobbyShards = itertools.cycle(range(len(workerPorts)))
+        self.__lastRooms = OrderedDict()
+
+    @staticmethod
+    def parseMessage(message):
+        try:
+            parsed = json.loads(message)
+        except ValueError:
+            return {}
+        return parsed if isinstance(parsed, dict) else {}
+
+    @staticmethod
+    def userIdOf(message):
+        currentPlayer = message.get('currentPlayer')
+        return currentPlayer.get('userId') if isinstance(currentPlayer, dict) else None
+
+    def rememberRoom(self, message):
+        """Records the room a user last sent a message for, whose worker keeps the user's session."""
+        roomName = message.get('roomName')
+        userId = self.userIdOf(message)
+        if not userId or not roomName or roomName == 'lobby':
+            return
+        self.__lastRooms.pop(userId, None)
+        self.__lastRooms[userId] = roomName
+        while len(self.__lastRooms) > self.MAX_REMEMBERED_USERS:
+            self.__lastRooms.popitem(last=False)
+
+    def routeMessage(self, message, currentShard):
+        roomName = message.get('roomName')
+        if not roomName and message.get('action') == 'rejoinRoom':
+            # Only the worker that owned the previous room knows the session to rejoin.
+            roomName = self.__lastRooms.get(self.userIdOf(message))
+        if not roomName or roomName == 'lobby':
+            return currentShard
+        return self.__ring.shardFor(roomName)
+
+    async def relay(self, upstream, websocket, replays=0):
+        try:
+            async for message in upstream:
+                # Only parse while replies to replayed messages are outstanding.
+                if replays and self.REPLAY_KEY in message and self.parseMessage(message).get(self.REPLAY_KEY):
+                    replays -= 1
+                    continue
+                await websocket.send(message)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def connectUpstream(self, shard, origin, websocket, profileMessages):
+        """Opens a connection to shard's worker, replaying the client's profile messages to it first."""
+        upstream = await websockets.connect(self.__workerUris[shard], origin=origin)
+        for message in profileMessages.values():
+            await upstream.send(json.dumps({**message, self.REPLAY_KEY: True}))
+        relayTask = asyncio.create_task(self.relay(upstream, websocket, len(profileMessages)))
+        return upstream, relayTask
+
+    async def handleConnection(self, websocket, path):
+        origin = websocket.request_headers.get("Origin")
+        if origin not in origins():
+            await websocket.close(code=4000, reason="Origin not allowed")
+            return
+        profileMessages = {}
+        currentShard = next(self.__lobbyShards)
+        upstream, relayTask = await self.connectUpstream(currentShard, origin, websocket, profileMessages)
+        try:
+            async for message in websocket:
+                parsedMessage = self.parseMessage(message)
+                self.rememberRoom(parsedMessage)
+                shard = self.routeMessage(parsedMessage, currentShard)
+                if shard != currentShard:
+                    # Closing the old upstream lets the old worker run its normal disconnection handling.
+                    relayTask.cancel()
+                    await upstream.close()
+                    currentShard = shard
+                    upstream, relayTask = await self.connectUpstream(currentShard, origin, websocket, profileMessages)
+                action = parsedMessage.get('action')
+                if action in self.PROFILE_ACTIONS:
+                    profileMessages.pop(action, None)
+                    profileMessages[action] = parsedMessage
+                await upstream.send(message)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            relayTask.cancel()
+            await upstream.close()
+
+    async def main(self):
+        origins()
+        async with websockets.serve(self.handleConnection, self.__host, self.__port):
+            print(f"Shard gateway started for {len(self.__workerUris)} workers.")
+            await asyncio.Future()
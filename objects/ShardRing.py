@@ -0,0 +1,29 @@
+import bisect
+import hashlib
+
+class ShardRing:
+    def __init__(self, shardCount, virtualNodes=64):
+        """
+        Consistent hash ring mapping room names to shard indexes.
+
+        Every process that builds a ring with the same shardCount maps a room name to the same shard.
+        """
+        self.__shardCount = shardCount
+        self.__ring = sorted(
+            (self.hash(f"shard-{shard}-{node}"), shard)
+            for shard in range(shardCount)
+            for node in range(virtualNodes)
+        )
+        self.__hashes = [point for point, shard in self.__ring]
+
+    @property
+    def shardCount(self):
+        return self.__shardCount
+
+    @staticmethod
+    def hash(key):
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+    def shardFor(self, roomName):
+        index = bisect.bisect(self.__hashes, self.hash(roomName.lower())) % len(self.__ring)
+        return self.__ring[index][1]
@@ -0,0 +1,154 @@
+import asyncio
+import heapq
+import itertools
+from util.latencyTracker import LatencyTracker
+
+class TimerHandle:
+    __slots__ = ('when', 'sequence', 'callback', 'key', 'owner', 'cancelled')
+
+    def __init__(self, when, sequence, callback, key, owner):
+        self.when = when
+        self.sequence = sequence
+        self.callback = callback
+        self.key = key
+        self.owner = owner
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.when, self.sequence) < (other.when, other.sequence)
+
+class TimerScheduler:
+    """
+    Process-wide heap of timers driven by a single task.
+
+    Timers are keyed, so scheduling an existing key replaces it, and grouped by owner (a room) so they
+    can all be cancelled together. Callbacks are coroutine functions run as tasks that are tracked under
+    the same key and owner, and are cancelled along with the timers.
+    """
+    __shared = None
+
+    def __init__(self):
+        self.__heap = []
+        self.__cancelledInHeap = 0
+        self.__sequence = itertools.count()
+        self.__timers = {}
+        self.__runningTasks = {}
+        self.__owners = {}
+        self.__wakeup = None
+        self.__driverTask = None
+        self.__firedTimers = 0
+        self.__lateness = LatencyTracker(defaultLatency=0)
+
+    @classmethod
+    def shared(cls):
+        if cls.__shared is None:
+            cls.__shared = cls()
+        return cls.__shared
+
+    @staticmethod
+    def now():
+        return asyncio.get_running_loop().time()
+
+    @property
+    def pendingTimers(self):
+        return len(self.__timers)
+
+    @property
+    def runningTasks(self):
+        return len(self.__runningTasks)
+
+    def metrics(self):
+        return {
+            'pendingTimers': self.pendingTimers,
+            'runningTasks': self.runningTasks,
+            'heapSize': len(self.__heap),
+            'firedTimers': self.__firedTimers,
+            'latenessP95': self.__lateness.percentile(95),
+            'latenessMax': self.__lateness.percentile(100),
+        }
+
+    def schedule(self, delay, callback, key, owner=None):
+        """
+        Runs callback() as a task after delay seconds, replacing any timer or running task with the same key.
+        """
+        self.cancel(key)
+        handle = TimerHandle(self.now() + delay, next(self.__sequence), callback, key, owner)
+        self.__timers[key] = handle
+        self.__owners.setdefault(owner, set()).add(key)
+        heapq.heappush(self.__heap, handle)
+        self.__ensureDriver()
+        if self.__heap[0] is handle:
+            self.__wakeup.set()
+        return handle
+
+    def cancel(self, key):
+        handle = self.__timers.pop(key, None)
+        if handle:
+            # Lazily removed from the heap when it reaches the top, or when too many have piled up.
+            handle.cancelled = True
+            self.__cancelledInHeap += 1
+            if self.__cancelledInHeap > 64 and self.__cancelledInHeap * 2 > len(self.__heap):
+                self.__heap = [timer for timer in self.__heap if not timer.cancelled]
+                heapq.heapify(self.__heap)
+                self.__cancelledInHeap = 0
+        task = self.__runningTasks.get(key)
+        if task and task is not asyncio.current_task():
+            task.cancel()
+        if handle and key not in self.__runningTasks:
+            self.__forgetKey(handle.owner, key)
+
+    def cancelOwner(self, owner):
+        for key in list(self.__owners.get(owner, ())):
+            self.cancel(key)
+        if not self.__owners.get(owner):
+            self.__owners.pop(owner, None)
+
+    def __forgetKey(self, owner, key):
+        keys = self.__owners.get(owner)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.__owners[owner]
+
+    def __ensureDriver(self):
+        if self.__driverTask is None or self.__driverTask.done():
+            self.__wakeup = asyncio.Event()
+            self.__driverTask = asyncio.create_task(self.__drive())
+
+    async def __drive(self):
+        while True:
+            while self.__heap and self.__heap[0].cancelled:
+                heapq.heappop(self.__heap)
+                self.__cancelledInHeap = max(0, self.__cancelledInHeap - 1)
+            self.__wakeup.clear()
+            if not self.__heap:
+                await self.__wakeup.wait()
+                continue
+            delay = self.__heap[0].when - self.now()
+            if delay > 0:
+                # Not wait_for, which swallows a cancellation that arrives as the wakeup is set
+                # and so keeps the driver running through shutdown.
+                timeout = asyncio.get_running_loop().call_later(delay, self.__wakeup.set)
+                try:
+                    await self.__wakeup.wait()
+                finally:
+                    timeout.cancel()
+                continue
+            handle = heapq.heappop(self.__heap)
+            self.__fire(handle)
+
+    def __fire(self, handle):
+        del self.__timers[handle.key]
+        self.__firedTimers += 1
+        self.__lateness.record(self.now() - handle.when)
+        task = asyncio.create_task(handle.callback())
+        self.__runningTasks[handle.key] = task
+        task.add_done_callback(lambda finished: self.__taskDone(handle, finished))
+
+    def __taskDone(self, handle, task):
+        if self.__runningTasks.get(handle.key) is task:
+            del self.__runningTasks[handle.key]
+            if handle.key not in self.__timers:
+                self.__forgetKey(handle.owner, handle.key)
+        if not task.cancelled() and task.exception():
+            print(f"Error in scheduled task {handle.key}: {task.exception()}")
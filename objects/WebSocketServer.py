@@ -10,9 +10,17 @@ import http.server
 import socketserver
 import threading
 from util.awsSecretRetrieval import origins
+from util.Dynamo.userTableClient import getUserWriteQueue, getUserProfileCache
+from objects.LLMServices import LLMServices
+from objects.ShardRing import ShardRing
+from objects.ShardGateway import ShardGateway
 
 class WebSocketServer:
-    def __init__(self):
+    def __init__(self, host="0.0.0.0", port=8765, shardIndex=None, shardCount=None):
+        self.host = host
+        self.port = port
+        self.shardIndex = shardIndex
+        self.shardRing = ShardRing(shardCount) if shardCount else None
         self.connectedClients = {}
         self.currentRooms = {}
         self.pingInterval = 20
@@ -28,9 +36,8 @@ class WebSocketServer:
         websocketId = str(websocket.id)
         currentClient = Performer(websocket)
 
-        queryCreator = LLMQueryCreator()
         roomName = "lobby"
-        room = self.currentRooms.get(roomName) or Room(LLMQueryCreator=queryCreator, roomName=roomName)
+        room = self.currentRooms.get(roomName) or Room(LLMQueryCreator=LLMQueryCreator(), roomName=roomName)
         await room.addPlayerToRoom(currentClient)
         self.currentRooms[roomName] = room
         print(f"🔄 New connection assigned to the lobby.")
@@ -71,18 +78,17 @@ class WebSocketServer:
 
                         if currentPlayer == 'audience':
                             print(f"Audience message received")
-                            response = await filter.handleMessage(incomingMessage, currentRoom)
-                            await currentRoom.handleResponse(response)
+                            await currentRoom.submit(lambda: self.processMessage(filter, incomingMessage, currentRoom, False))
                         if action == "rejoinRoom":
                             userId = currentPlayer.get('userId', None)
                             previousRoomName = self.previousSessions.get(userId)
                             print(f"Rejoin Room: {currentPlayer.get('screenName', 'AUDIENCE')}")
                             if previousRoomName and previousRoomName in self.currentRooms:
                                 room = self.currentRooms[previousRoomName]
-                                await room.playerRejoinRoom(currentClient, currentPlayer)
+                                # Warms the cache for later profile reads; the rejoin itself uses the message's profile.
+                                room.runInBackground(self.prefetchSessionProfiles(previousRoomName))
+                                await room.submit(lambda: self.rejoinRoom(room, currentClient, currentPlayer))
                                 print(f"✅ Reconnected to room: {previousRoomName}")
-                                response = room.prepareGameStateResponse("rejoinRoom")
-                                await room.handleResponse(response)
                         else:
                             screenName = currentPlayer.get('screenName') if currentPlayer else websocketId
                             print(f"{screenName}. MESSAGE: {incomingMessage}")
@@ -91,13 +97,7 @@ class WebSocketServer:
                                 if userId:
                                     currentClient.userId = userId
                             if currentRoom:
-                                response = await filter.handleMessage(incomingMessage, currentRoom)
-                                currentGameState = response.get('gameState')
-                                if currentGameState:
-                                    newRoomName = currentGameState.get('roomName')
-                                    if newRoomName:
-                                        currentRoom = self.currentRooms.get(newRoomName)
-                                await currentRoom.handleResponse(response)
+                                await currentRoom.submit(lambda: self.processMessage(filter, incomingMessage, currentRoom))
                             else:
                                 await currentRoom.handleResponse({
                                     'action': 'error',
@@ -121,6 +121,31 @@ class WebSocketServer:
             if currentClient:
                 self.handleDisconnection(currentClient)
 
+    async def processMessage(self, filter, message, room, followRoomChange=True):
+        response = await filter.handleMessage(message, room)
+        if not response:
+            return
+        if message.get(ShardGateway.REPLAY_KEY):
+            # Lets the gateway hold back the reply to a message it replayed on the client's behalf.
+            response[ShardGateway.REPLAY_KEY] = True
+        if followRoomChange:
+            currentGameState = response.get('gameState')
+            if currentGameState:
+                newRoomName = currentGameState.get('roomName')
+                if newRoomName:
+                    room = self.currentRooms.get(newRoomName)
+        await room.handleResponse(response)
+
+    async def prefetchSessionProfiles(self, roomName):
+        """Loads the profiles of everyone who was in the room in one batched read, ahead of their rejoins."""
+        userIds = [userId for userId, previousRoomName in self.previousSessions.items() if previousRoomName == roomName]
+        await getUserProfileCache().prefetch(userIds)
+
+    async def rejoinRoom(self, room, client, currentPlayer):
+        await room.playerRejoinRoom(client, currentPlayer)
+        response = room.prepareGameStateResponse("rejoinRoom")
+        await room.handleResponse(response)
+
     # async def sendPeriodicGameState(self, client):
     #     try:
     #         while True:
@@ -133,22 +158,54 @@ class WebSocketServer:
     #         print(f"WebSocket {client.websocket.id} closed during periodic gameState updates.")
 
     def handleDisconnection(self, client):
+        client.outbox.close()
+        lobby = self.currentRooms.get('lobby')
+        if lobby and client in lobby.performers:
+            lobby.performers.remove(client)
         for room in self.currentRooms.values():
             if room.roomName != "lobby":
                 userId = client.userId
                 if client in room.performers:
                     # ✅ Store user's last known room before removing them
                     self.previousSessions[userId] = room.roomName
-                    room.leaveRoom(client)
+                    room.actor.post(lambda room=room: self.leaveRoom(room, client))
+                elif client in room.audience:
+                    room.actor.post(lambda room=room: self.leaveRoom(room, client))
 
         websocketId = str(client.websocket.id)
         if websocketId in self.connectedClients:
             del self.connectedClients[websocketId]
 
+    async def leaveRoom(self, room, client):
+        room.leaveRoom(client)
+        if room.isEmpty:
+            # Kept open for a while, so a performer who dropped out can still rejoin.
+            room.scheduleTask('closeIfEmpty', lambda: self.closeRoomIfEmpty(room), room.CLOSE_EMPTY_AFTER)
+
+    async def closeRoomIfEmpty(self, room):
+        if not room.isEmpty or self.currentRooms.get(room.roomName) is not room:
+            return
+        del self.currentRooms[room.roomName]
+        self.previousSessions = {userId: roomName for userId, roomName in self.previousSessions.items()
+                                 if roomName != room.roomName}
+        room.close()
+        print(f"Closed empty room {room.roomName}")
+
     async def main(self):
-        async with websockets.serve(self.handleConnection, "0.0.0.0", 8765):
-            print("WebSocket server started.")
-            await asyncio.Future()
+        # Warm the secret cache so handshakes never wait on Secrets Manager.
+        origins()
+        # Scan the used room names off the event loop, so the first room created does not block every connection.
+        await LLMServices.shared().roomNameIndex.refresh()
+        if self.shardRing:
+            # Only create rooms whose names hash to this worker, so the gateway routes them here.
+            LLMServices.shared().roomNameGenerator.acceptRoomName = \
+                lambda roomName: self.shardRing.shardFor(roomName) == self.shardIndex
+        try:
+            async with websockets.serve(self.handleConnection, self.host, self.port):
+                print(f"WebSocket server started on port {self.port}.")
+                await asyncio.Future()
+        finally:
+            await getUserWriteQueue().close()
 
 
 class HealthCheckHandler(http.server.SimpleHTTPRequestHandler):
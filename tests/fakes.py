@@ -0,0 +1,202 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+
+def completion(content=None, arguments=None):
+    """A chat completion shaped like the OpenAI client's response."""
+    functionCall = SimpleNamespace(arguments=json.dumps(arguments)) if arguments is not None else None
+    message = SimpleNamespace(content=content, function_call=functionCall)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class SlowChatClient:
+    """Stands in for AsyncOpenAI, answering every completion after delay seconds."""
+
+    def __init__(self, delay=0.2, content="ok", arguments=None):
+        self.delay = delay
+        self.content = content
+        self.arguments = arguments
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return completion(self.content, self.arguments)
+
+
+class MemoryTable:
+    """In-memory stand-in for a boto3 DynamoDB Table, counting the calls made to it."""
+
+    def __init__(self, keyName='sub', failures=0):
+        self.keyName = keyName
+        self.items = {}
+        self.failures = failures
+        self.putCalls = 0
+        self.getCalls = 0
+        self.batchWrites = 0
+        self.scanCalls = 0
+        self.scanPageSize = 100
+
+    def put_item(self, Item):
+        self.putCalls += 1
+        self.items[Item[self.keyName]] = Item
+
+    def get_item(self, Key):
+        self.getCalls += 1
+        item = self.items.get(Key[self.keyName])
+        return {'Item': item} if item else {}
+
+    def scan(self, ExclusiveStartKey=None, **kwargs):
+        self.scanCalls += 1
+        keys = sorted(self.items)
+        start = keys.index(ExclusiveStartKey[self.keyName]) + 1 if ExclusiveStartKey else 0
+        page = keys[start:start + self.scanPageSize]
+        response = {'Items': [self.items[key] for key in page]}
+        if start + self.scanPageSize < len(keys):
+            response['LastEvaluatedKey'] = {self.keyName: page[-1]}
+        return response
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        table = self
+
+        class BatchWriter:
+            def __enter__(self):
+                if table.failures:
+                    table.failures -= 1
+                    raise RuntimeError("Throttled")
+                table.batchWrites += 1
+                return self
+
+            def __exit__(self, *args):
+                return False
+
+            def put_item(self, Item):
+                table.items[Item[table.keyName]] = Item
+
+        return BatchWriter()
+
+
+class MemoryDynamo:
+    """In-memory stand-in for a boto3 DynamoDB resource, handing out MemoryTables."""
+
+    def __init__(self, keyName='sub', failures=0):
+        self.keyName = keyName
+        self.failures = failures
+        self.tables = {}
+        self.batchGets = 0
+
+    def Table(self, tableName):
+        if tableName not in self.tables:
+            self.tables[tableName] = MemoryTable(self.keyName, self.failures)
+        return self.tables[tableName]
+
+    def batch_get_item(self, RequestItems):
+        self.batchGets += 1
+        responses = {}
+        for tableName, request in RequestItems.items():
+            table = self.Table(tableName)
+            responses[tableName] = [table.items[key[self.keyName]] for key in request['Keys']
+                                    if key[self.keyName] in table.items]
+        return {'Responses': responses}
+
+
+class ScriptedConnector:
+    """
+    Stands in for OpenAIConnector one level above the HTTP client, answering each request after delay seconds.
+
+    Set failing to return error responses, and endPerformance to have the director decide the song is over.
+    """
+
+    def __init__(self, delay=0, interval=60):
+        self.delay = delay
+        self.interval = interval
+        self.failing = False
+        self.endPerformance = False
+        self.calls = []
+
+    async def answer(self, name):
+        self.calls.append(name)
+        await asyncio.sleep(self.delay)
+        if self.failing:
+            return {"error": f"{name} failed"}
+        return None
+
+    def performerPrompt(self, performer):
+        return {'userId': performer.userId, 'performerPrompt': f"Prompt for {performer.userId}",
+                'promptInterval': self.interval}
+
+    async def createPrompts(self, prompt, improvisation, systemContext=None, allowEnd=False, **kwargs):
+        error = await self.answer('createPrompts')
+        if error:
+            return error
+        prompts = {'groupPrompt': f"Group prompt {len(self.calls)}", 'groupPromptInterval': self.interval,
+                   'performerPrompts': [self.performerPrompt(performer) for performer in improvisation.performers]}
+        if allowEnd:
+            prompts['endPerformance'] = self.endPerformance
+        return prompts
+
+    async def createPerformerPrompt(self, prompt, improvisation, performer, systemContext=None, **kwargs):
+        return await self.answer('createPerformerPrompt') or self.performerPrompt(performer)
+
+    async def createPerformerPrompts(self, prompt, improvisation, performers, systemContext=None, **kwargs):
+        error = await self.answer('createPerformerPrompts')
+        return error or {'performerPrompts': [self.performerPrompt(performer) for performer in performers]}
+
+    async def getResponseFromLLM(self, prompt, systemContext=None):
+        error = await self.answer('getResponseFromLLM')
+        return None if error else f"Response {len(self.calls)}"
+
+    async def getPersonality(self, prompt, currentPersonality, personalityType, systemContext=None, **kwargs):
+        return await self.answer('getPersonality') or currentPersonality
+
+    async def getPerformerPersonalities(self, prompt, performers, systemContext=None, **kwargs):
+        error = await self.answer('getPerformerPersonalities')
+        return error or {performer.userId: performer.personality for performer in performers}
+
+
+class RecordingWebSocket:
+    """A client socket that keeps the frames sent to it."""
+
+    def __init__(self, id):
+        self.id = id
+        self.frames = []
+
+    async def send(self, frame):
+        self.frames.append(json.loads(frame))
+
+    async def close(self, code=1000, reason=''):
+        pass
+
+
+class ScriptedServices:
+    """The parts of LLMServices a room uses, around a ScriptedConnector."""
+
+    def __init__(self, connector=None):
+        from objects.FallbackPromptBank import FallbackPromptBank
+        from util.latencyTracker import LatencyTracker
+        self.openAIConnector = connector or ScriptedConnector()
+        self.promptScripts = {key: f"{key}. " for key in
+                              ('systemContext', 'createYourPersonality', 'closingSummary', 'getCentralTheme',
+                               'tryNewCentralTheme', 'wellHelloThere', 'aboutMe')}
+        self.fallbackPromptBank = FallbackPromptBank()
+        self.promptLatency = LatencyTracker()
+        # LLM calls made by each prompt cycle.
+        self.promptCycleCalls = []
+
+    def recordPromptCycle(self, llmCalls):
+        self.promptCycleCalls.append(llmCalls)
+
+
+def makeRoom(connector=None, performerCount=2, roomName='test-room'):
+    """A room of performers on recording sockets, whose director talks to a ScriptedConnector."""
+    from objects.LLMQueryCreator import LLMQueryCreator
+    from objects.Performer import Performer
+    from objects.Room import Room
+    room = Room(LLMQueryCreator=LLMQueryCreator(ScriptedServices(connector)), roomName=roomName)
+    for i in range(performerCount):
+        performer = Performer(websocket=RecordingWebSocket(f'socket-{i}'), userId=f'user-{i}', screenName=f'Performer {i}', instrument='piano')
+        room.performers.append(performer)
+        performer.currentRoom = room
+    return room
@@ -0,0 +1,18 @@
+import util.awsSecretRetrieval as awsSecretRetrieval
+from util.secretCache import SecretCache
+
+
+def test_origins_is_a_cached_frozenset(monkeypatch):
+    calls = []
+
+    def fetchSecret(secretName):
+        calls.append(secretName)
+        return {'origins': 'https://a.example, https://b.example'}
+
+    monkeypatch.setattr(awsSecretRetrieval, 'secretCache', SecretCache(fetchSecret))
+    monkeypatch.setattr(awsSecretRetrieval, '_originsCache', (None, frozenset()))
+    first = awsSecretRetrieval.origins()
+    for _ in range(100):
+        assert awsSecretRetrieval.origins() is first
+    assert first == frozenset({'https://a.example', 'https://b.example'})
+    assert calls == ['improv_director/origins']
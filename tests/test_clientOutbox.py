@@ -0,0 +1,86 @@
+import asyncio
+import json
+import pytest
+import objects.Room as roomModule
+from objects.ClientOutbox import ClientOutbox
+from objects.TimerScheduler import TimerScheduler
+from fakes import makeRoom
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(TimerScheduler, '_TimerScheduler__shared', None)
+
+
+class StalledWebSocket:
+    """A client socket whose sends wait until it is released."""
+
+    def __init__(self, id='stalled'):
+        self.id = id
+        self.frames = []
+        self.released = asyncio.Event()
+        self.closeCode = None
+
+    async def send(self, frame):
+        await self.released.wait()
+        self.frames.append(frame)
+
+    async def close(self, code=1000, reason=''):
+        self.closeCode = code
+
+
+def test_full_outbox_drops_the_oldest_frames():
+    async def main():
+        websocket = StalledWebSocket()
+        outbox = ClientOutbox(websocket, maxSize=3)
+        for i in range(8):
+            outbox.send(f"frame-{i}")
+            # Let the sender take the first frame and stall on it.
+            await asyncio.sleep(0)
+        websocket.released.set()
+        await asyncio.sleep(0.01)
+        return websocket, outbox
+
+    websocket, outbox = asyncio.run(main())
+    assert websocket.frames == ['frame-0', 'frame-5', 'frame-6', 'frame-7']
+    assert outbox.dropped == 4
+    assert outbox.deliveryLatency.sampleCount == 4
+
+
+def test_full_outbox_disconnects_when_configured():
+    async def main():
+        websocket = StalledWebSocket()
+        outbox = ClientOutbox(websocket, maxSize=2, overflowPolicy=ClientOutbox.DISCONNECT)
+        for i in range(5):
+            outbox.send(f"frame-{i}")
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        outbox.send("after-close")
+        return websocket, outbox
+
+    websocket, outbox = asyncio.run(main())
+    assert websocket.closeCode == 1013
+    assert outbox.dropped == 0
+    assert outbox.queueDepth == 2
+
+
+def test_broadcast_is_encoded_once_for_every_client(monkeypatch):
+    room = makeRoom(performerCount=5)
+    encodings = []
+    encode = json.dumps
+
+    def dumps(message, **kwargs):
+        encodings.append(message.get('action'))
+        return encode(message, **kwargs)
+
+    monkeypatch.setattr(roomModule.json, 'dumps', dumps)
+
+    async def main():
+        room.sendBroadcast(room.prepareGameStateResponse('newPlayer'))
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert encodings == ['newPlayer']
+    frames = [performer.websocket.frames for performer in room.performers]
+    assert all(len(clientFrames) == 1 and clientFrames == frames[0] for clientFrames in frames)
+    assert room.broadcastMetrics()['sentBroadcasts'] == 1
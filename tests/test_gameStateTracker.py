@@ -0,0 +1,115 @@
+import copy
+from objects.GameStateTracker import GameStateTracker
+
+
+class DeltaClient:
+    """Rebuilds the game state from broadcasts the way a client does, resyncing when it misses a version."""
+
+    def __init__(self):
+        self.state = None
+        self.version = None
+        self.resyncs = 0
+
+    def receiveFull(self, version, gameState):
+        self.state = copy.deepcopy(gameState)
+        self.version = version
+
+    def receiveDelta(self, delta, fullState):
+        if self.version != delta['baseVersion']:
+            # A missed delta; the client asks for, and is sent, the full state.
+            self.resyncs += 1
+            self.receiveFull(delta['version'], fullState)
+            return
+        state = self.state
+        for key, value in delta.items():
+            if key not in ('prompts', 'performers', 'removedPerformers', 'performerOrder', 'removedKeys',
+                           'baseVersion', 'version'):
+                state[key] = copy.deepcopy(value)
+        for key in delta.get('removedKeys', []):
+            state.pop(key, None)
+        if 'prompts' in delta:
+            prompts = delta['prompts']
+            state['prompts'] = state.get('prompts', [])[:prompts['fromIndex']] + copy.deepcopy(prompts['groups'])
+        performers = {performer['userId']: performer for performer in state.get('performers', [])}
+        for performer in delta.get('performers', []):
+            performers[performer['userId']] = copy.deepcopy(performer)
+        for userId in delta.get('removedPerformers', []):
+            performers.pop(userId, None)
+        order = delta.get('performerOrder', list(performers))
+        state['performers'] = [performers[userId] for userId in order]
+        self.version = delta['version']
+
+
+def group(name, performerPrompts=()):
+    return {'groupPrompt': {'prompt': name}, 'performerPrompts': [{'prompt': prompt} for prompt in performerPrompts]}
+
+
+def performer(userId, screenName=None):
+    return {'userId': userId, 'screenName': screenName or userId}
+
+
+STATES = [
+    {'roomName': 'aurora', 'gameStatus': 'Theme Selection', 'centralTheme': 'rain', 'prompts': [],
+     'performers': [performer('user-0')]},
+    {'roomName': 'aurora', 'gameStatus': 'improvise', 'centralTheme': 'rain', 'prompts': [group('one')],
+     'performers': [performer('user-0'), performer('user-1')]},
+    {'roomName': 'aurora', 'gameStatus': 'improvise', 'centralTheme': 'rain', 'prompts': [group('one', ['a'])],
+     'performers': [performer('user-1'), performer('user-0', 'renamed')]},
+    {'roomName': 'aurora', 'gameStatus': 'improvise', 'centralTheme': 'rain', 'finalPrompt': True,
+     'prompts': [group('one', ['a']), group('two')], 'performers': [performer('user-1')]},
+    # The next song starts: the final prompt flag and the old prompts are gone.
+    {'roomName': 'aurora', 'gameStatus': 'Theme Selection', 'prompts': [group('three')],
+     'performers': [performer('user-1'), performer('user-2')]},
+    {'roomName': 'aurora', 'gameStatus': 'improvise', 'centralTheme': 'wind', 'prompts': [group('three', ['b'])],
+     'performers': [performer('user-2')]},
+]
+
+
+def test_removed_top_level_fields_are_reported():
+    delta = GameStateTracker.diff(STATES[3], STATES[4])
+    assert delta['removedKeys'] == ['centralTheme', 'finalPrompt']
+    assert 'removedKeys' not in GameStateTracker.diff(STATES[4], STATES[5])
+
+
+def test_client_rebuilds_every_state_from_deltas():
+    tracker = GameStateTracker()
+    client = DeltaClient()
+    for gameState in STATES:
+        version, delta = tracker.update(copy.deepcopy(gameState))
+        if delta is None:
+            client.receiveFull(version, gameState)
+        else:
+            client.receiveDelta(delta, gameState)
+        assert client.state == gameState
+        assert client.version == version
+    assert client.resyncs == 0
+
+
+def replayWithMissedVersions(missedIndexes, maxUnackedVersions=2):
+    tracker = GameStateTracker(maxUnackedVersions=maxUnackedVersions)
+    client = DeltaClient()
+    fullStates = 0
+    for index, gameState in enumerate(STATES):
+        version, delta = tracker.update(copy.deepcopy(gameState))
+        if index in missedIndexes:
+            continue
+        if delta is None or not tracker.canSendDelta(client.version):
+            fullStates += 1
+            client.receiveFull(version, gameState)
+        else:
+            client.receiveDelta(delta, gameState)
+        assert client.state == gameState
+        assert client.version == version
+    return client, fullStates
+
+
+def test_client_that_misses_a_delta_resyncs_and_continues_from_deltas():
+    client, fullStates = replayWithMissedVersions({2})
+    assert client.resyncs == 1
+    assert fullStates == 1
+
+
+def test_client_too_far_behind_is_sent_the_full_state():
+    client, fullStates = replayWithMissedVersions({1, 2, 3})
+    assert client.resyncs == 0
+    assert fullStates == 2
@@ -0,0 +1,175 @@
+import asyncio
+import time
+import pytest
+import objects.OpenAIConnector as openAIConnectorModule
+from objects.Improvisation import Improvisation
+from objects.LLMScheduler import LLMScheduler
+from objects.OpenAIConnector import OpenAIConnector
+from objects.TimerScheduler import TimerScheduler
+from fakes import ScriptedConnector, SlowChatClient, makeRoom
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(TimerScheduler, '_TimerScheduler__shared', None)
+
+
+def test_end_decision_is_applied_only_when_published():
+    connector = ScriptedConnector()
+    room = makeRoom(connector)
+    improv = room.currentImprovisation
+
+    async def main():
+        await improv.initializeGameState()
+        connector.endPerformance = True
+        finalPrompts = await room.LLMQueryCreator.provideNewPrompts(room)
+        # Generated speculatively, the final prompts do not end the song yet.
+        assert finalPrompts['finalPrompt'] is True
+        assert improv.finalPrompt is False
+        await improv.setCurrentPrompts(finalPrompts)
+        assert improv.finalPrompt is True
+        assert TimerScheduler.shared().pendingTimers == 0
+
+    asyncio.run(main())
+
+
+def test_stale_speculative_ending_is_discarded():
+    connector = ScriptedConnector()
+    room = makeRoom(connector)
+    improv = room.currentImprovisation
+
+    async def main():
+        await improv.initializeGameState()
+        connector.endPerformance = True
+        speculativePrompts = await improv.generatePromptUpdate()
+        improv.invalidateSpeculativePrompts()
+        connector.endPerformance = False
+        await improv.updatePrompt(None, speculativeVersion=-1, speculativePrompts=speculativePrompts)
+        assert improv.finalPrompt is False
+        assert TimerScheduler.shared().pendingTimers > 0
+        room.cancelAllTasks()
+
+    asyncio.run(main())
+
+
+def fullProjection(improv):
+    return [{'groupPrompt': group['groupPrompt'].toDict(),
+             'performerPrompts': [prompt['performerPrompt'].toDict(prompt['userId']) for prompt in group['performerPrompts']]}
+            for group in improv.prompts]
+
+
+def test_prompt_projection_tracks_added_prompts():
+    connector = ScriptedConnector()
+    room = makeRoom(connector)
+    improv = room.currentImprovisation
+
+    async def main():
+        await improv.initializeGameState()
+        snapshot = improv.promptsDict()
+        await improv.addPerformerPrompts([{'userId': 'user-1', 'performerPrompt': "Move on", 'promptInterval': 30}])
+        assert improv.getCurrentPerformerPrompt('user-1')['performerPrompt'].prompt == "Move on"
+        assert improv.getCurrentPerformerPrompt('user-0')['performerPrompt'].prompt == "Prompt for user-0"
+        await improv.setCurrentPrompts(await connector.createPrompts(None, improv))
+        assert improv.promptsDict() == fullProjection(improv)
+        # Earlier results are snapshots, not views of the projection.
+        assert len(snapshot) == 1 and len(snapshot[0]['performerPrompts']) == 2
+        room.cancelAllTasks()
+
+    asyncio.run(main())
+
+
+def test_slow_start_serves_fallback_prompts_then_the_late_answer(monkeypatch):
+    monkeypatch.setattr(Improvisation, 'PROMPT_DEADLINE', 0.05)
+    connector = ScriptedConnector(delay=0.2)
+    room = makeRoom(connector)
+    improv = room.currentImprovisation
+
+    async def main():
+        startTime = time.monotonic()
+        await improv.initializeGameState()
+        assert time.monotonic() - startTime < 0.15
+        assert improv.gameStatus == 'improvise'
+        assert not improv.currentPrompts['groupPrompt'].prompt.startswith("Group prompt")
+        await asyncio.sleep(0.25)
+        assert improv.currentPrompts['groupPrompt'].prompt.startswith("Group prompt")
+        room.cancelAllTasks()
+
+    asyncio.run(main())
+
+
+def test_reactions_do_not_wait_past_the_deadline(monkeypatch):
+    monkeypatch.setattr(Improvisation, 'PROMPT_DEADLINE', 0.05)
+    connector = ScriptedConnector()
+    room = makeRoom(connector)
+    improv = room.currentImprovisation
+    performer = room.performers[0]
+
+    async def main():
+        await improv.initializeGameState()
+        connector.delay = 0.5
+        startTime = time.monotonic()
+        await improv.setPromptReaction(performer, 'moveOn', 'performerPrompt')
+        assert improv.getCurrentPerformerPrompt(performer.userId)['performerPrompt'].prompt != "Prompt for user-0"
+        groupPrompt = improv.currentPrompts['groupPrompt'].prompt
+        await improv.setPromptReaction(performer, 'reject', 'groupPrompt')
+        assert improv.currentPrompts['groupPrompt'].prompt != groupPrompt
+        await improv.adjustPrompts()
+        assert len(improv.prompts) == 3
+        assert time.monotonic() - startTime < 0.4
+        room.cancelAllTasks()
+
+    asyncio.run(main())
+
+
+def test_performer_prompts_due_with_the_group_prompt_are_left_to_it(monkeypatch):
+    monkeypatch.setattr(Improvisation, 'PERFORMER_PROMPT_BATCH_WINDOW', 0.05)
+    monkeypatch.setattr(Improvisation, 'PREFETCH_MIN_LEAD', 0.1)
+    monkeypatch.setattr(Improvisation, 'PREFETCH_MAX_LEAD', 0.1)
+    # Performer prompts share the group prompt's one second interval.
+    connector = ScriptedConnector(interval=1)
+    room = makeRoom(connector)
+    improv = room.currentImprovisation
+
+    async def main():
+        startTime = time.monotonic()
+        await improv.initializeGameState()
+        publishTimes = []
+        while len(publishTimes) < 2:
+            groupCount = len(improv.prompts)
+            while len(improv.prompts) == groupCount:
+                await asyncio.sleep(0.01)
+            publishTimes.append(time.monotonic() - startTime)
+        room.cancelAllTasks()
+        return publishTimes
+
+    publishTimes = asyncio.run(main())
+    # Published when the interval expires, with the prefetched group prompt.
+    assert 0.95 < publishTimes[0] < 1.2
+    assert 1.95 < publishTimes[1] < 2.3
+    assert connector.calls.count('createPrompts') == 3
+    assert connector.calls.count('createPerformerPrompts') == 0
+    assert connector.calls.count('createPerformerPrompt') == 0
+    assert all(len(group['performerPrompts']) == 2 for group in improv.prompts)
+
+
+def test_prompt_cycles_count_their_llm_calls(monkeypatch):
+    monkeypatch.setattr(openAIConnectorModule, 'getAISecret', lambda: ('test-key', 'test-project', 'test-model'))
+    monkeypatch.setattr(LLMScheduler, '_LLMScheduler__shared', None)
+    connector = OpenAIConnector()
+    room = makeRoom(connector)
+    improv = room.currentImprovisation
+    prompts = {'groupPrompt': "Group prompt", 'groupPromptInterval': '30', 'endPerformance': False,
+               'performerPrompts': [{'userId': performer.userId, 'performerPrompt': f"Prompt for {performer.userId}",
+                                     'promptInterval': '30'} for performer in room.performers]}
+    connector.client = SlowChatClient(delay=0, arguments=prompts)
+
+    async def main():
+        await improv.generatePromptUpdate()
+        # The director decides to end the song, and the final prompts take a second call.
+        prompts['endPerformance'] = True
+        finalPrompts = await improv.generatePromptUpdate()
+        assert finalPrompts['finalPrompt'] is True
+
+    asyncio.run(main())
+    assert room.LLMQueryCreator.services.promptCycleCalls == [1, 2]
+    assert connector.client.calls == 3
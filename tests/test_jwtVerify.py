@@ -0,0 +1,120 @@
+import asyncio
+import json
+import time
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+import util.JWTVerify as JWTVerify
+from util.JWTVerify import CognitoKeyStore, VerifiedTokenCache
+
+ISSUER = f'https://cognito-idp.{JWTVerify.REGION}.amazonaws.com/test-pool'
+
+
+class FakeJwksEndpoint:
+    def __init__(self, keys, failures=0):
+        self.keys = keys
+        self.failures = failures
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("JWKS fetch failed")
+        endpoint = self
+
+        class Response:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return {'keys': endpoint.keys}
+
+        return Response()
+
+
+def makeKey(kid):
+    privateKey = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(privateKey.public_key()))
+    jwk.update({'kid': kid, 'alg': 'RS256', 'use': 'sig'})
+    return privateKey, jwk
+
+
+def makeToken(privateKey, kid, expiresIn=3600):
+    claims = {'sub': 'user-1', 'iss': ISSUER, 'exp': int(time.time()) + expiresIn}
+    return jwt.encode(claims, privateKey, algorithm='RS256', headers={'kid': kid})
+
+
+@pytest.fixture
+def keyStore(monkeypatch):
+    monkeypatch.setattr(JWTVerify, 'cognitoSecret', lambda: ('test-pool', 'test-client'))
+    store = CognitoKeyStore(min_refresh_interval=60, failure_backoff=0.05)
+    monkeypatch.setattr(JWTVerify, 'cognito_keys', store)
+    monkeypatch.setattr(JWTVerify, 'verified_tokens', VerifiedTokenCache())
+    return store
+
+
+def useEndpoint(monkeypatch, endpoint):
+    monkeypatch.setattr(JWTVerify.requests, 'get', endpoint.get)
+
+
+def test_repeat_verification_is_served_from_cache(keyStore, monkeypatch):
+    privateKey, jwk = makeKey('kid-1')
+    endpoint = FakeJwksEndpoint([jwk])
+    useEndpoint(monkeypatch, endpoint)
+    token = makeToken(privateKey, 'kid-1')
+    decodes = []
+    originalDecode = jwt.decode
+    monkeypatch.setattr(JWTVerify.jwt, 'decode', lambda *args, **kwargs: decodes.append(1) or originalDecode(*args, **kwargs))
+
+    async def main():
+        return [await JWTVerify.verify_jwt(token) for _ in range(20)]
+
+    results = asyncio.run(main())
+    assert all(result['sub'] == 'user-1' for result in results)
+    assert endpoint.calls == 1
+    assert len(decodes) == 1
+
+
+def test_unknown_kid_refreshes_once_per_interval(keyStore, monkeypatch):
+    _, jwk = makeKey('kid-1')
+    endpoint = FakeJwksEndpoint([jwk])
+    useEndpoint(monkeypatch, endpoint)
+
+    async def main():
+        assert await keyStore.get_key('kid-1') is not None
+        assert await keyStore.get_key('unknown') is None
+        assert await keyStore.get_key('unknown') is None
+
+    asyncio.run(main())
+    assert endpoint.calls == 1
+
+
+def test_failed_fetch_is_retried_after_backoff(keyStore, monkeypatch):
+    _, jwk = makeKey('kid-1')
+    endpoint = FakeJwksEndpoint([jwk], failures=1)
+    useEndpoint(monkeypatch, endpoint)
+
+    async def main():
+        assert await keyStore.get_key('kid-1') is None
+        # Within the failure backoff no new fetch is made.
+        assert await keyStore.get_key('kid-1') is None
+        await asyncio.sleep(0.06)
+        return await keyStore.get_key('kid-1')
+
+    assert asyncio.run(main()) is not None
+    assert endpoint.calls == 2
+
+
+def test_expired_tokens_are_not_served_from_cache():
+    cache = VerifiedTokenCache()
+    cache.put('token', {'sub': 'user-1', 'exp': time.time() - 1})
+    assert cache.get('token') is None
+
+
+def test_token_cache_is_bounded():
+    cache = VerifiedTokenCache(max_size=2)
+    for i in range(3):
+        cache.put(f'token-{i}', {'sub': str(i), 'exp': time.time() + 60})
+    assert cache.get('token-0') is None
+    assert cache.get('token-2')['sub'] == '2'
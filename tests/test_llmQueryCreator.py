@@ -0,0 +1,36 @@
+import asyncio
+import time
+from fakes import ScriptedConnector, makeRoom
+
+
+def test_personality_fallbacks_run_concurrently():
+    connector = ScriptedConnector(delay=0.1)
+    room = makeRoom(connector, performerCount=4)
+    connector.failing = True
+
+    async def main():
+        startTime = time.monotonic()
+        personalities = await room.LLMQueryCreator.updatePerformerPersonalities(room.performers, "They liked it.", room)
+        return personalities, time.monotonic() - startTime
+
+    personalities, elapsed = asyncio.run(main())
+    assert sorted(personalities) == ['user-0', 'user-1', 'user-2', 'user-3']
+    assert connector.calls.count('getPersonality') == 4
+    # One batched call and one round of fallbacks, rather than a fallback after another.
+    assert elapsed < 0.3
+
+
+def test_performer_prompt_fallbacks_run_concurrently():
+    connector = ScriptedConnector(delay=0.1)
+    room = makeRoom(connector, performerCount=4)
+    connector.failing = True
+
+    async def main():
+        startTime = time.monotonic()
+        newPrompts = await room.LLMQueryCreator.nextPerformerPrompts(room, room.performers)
+        return newPrompts, time.monotonic() - startTime
+
+    newPrompts, elapsed = asyncio.run(main())
+    assert sorted(newPrompts) == ['user-0', 'user-1', 'user-2', 'user-3']
+    assert connector.calls.count('createPerformerPrompt') == 4
+    assert elapsed < 0.3
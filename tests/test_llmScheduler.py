@@ -0,0 +1,106 @@
+import asyncio
+import httpx
+import time
+from openai import RateLimitError
+from objects.LLMScheduler import LLMScheduler
+
+
+class StubCalls:
+    """Coroutine functions for the scheduler to run, recording the order they start in."""
+
+    def __init__(self):
+        self.started = []
+
+    def call(self, name, delay=0):
+        async def run():
+            self.started.append(name)
+            await asyncio.sleep(delay)
+            return name
+        return run
+
+
+def rateLimitError(retryAfter):
+    request = httpx.Request('POST', 'https://api.openai.com/v1/chat/completions')
+    response = httpx.Response(429, headers={'retry-after': str(retryAfter)}, request=request)
+    return RateLimitError("Rate limited", response=response, body=None)
+
+
+async def queueBehindBlocker(scheduler, requests):
+    """Holds the only slot while requests queue up, then frees it and waits for them all."""
+    await scheduler.acquire(LLMScheduler.PROMPT, 'blocker')
+    tasks = [asyncio.ensure_future(scheduler.run(call, priorityClass, owner)) for call, priorityClass, owner in requests]
+    await asyncio.sleep(0.01)
+    scheduler.release()
+    return await asyncio.gather(*tasks)
+
+
+def test_waiting_calls_are_admitted_by_priority():
+    scheduler = LLMScheduler(maxConcurrency=1)
+    stub = StubCalls()
+    requests = [(stub.call('summary'), LLMScheduler.SUMMARY, 'room-0'),
+                (stub.call('personality'), LLMScheduler.PERSONALITY, 'room-0'),
+                (stub.call('theme'), LLMScheduler.THEME, 'room-0'),
+                (stub.call('prompt'), LLMScheduler.PROMPT, 'room-0')]
+    asyncio.run(queueBehindBlocker(scheduler, requests))
+    assert stub.started == ['prompt', 'theme', 'personality', 'summary']
+
+
+def test_rooms_take_turns_within_a_priority_class():
+    scheduler = LLMScheduler(maxConcurrency=1)
+    stub = StubCalls()
+    requests = [(stub.call(f'busy-{i}'), LLMScheduler.PROMPT, 'busy-room') for i in range(3)]
+    requests += [(stub.call(f'quiet-{i}'), LLMScheduler.PROMPT, 'quiet-room') for i in range(2)]
+    asyncio.run(queueBehindBlocker(scheduler, requests))
+    assert stub.started == ['busy-0', 'quiet-0', 'busy-1', 'quiet-1', 'busy-2']
+
+
+def test_cancelled_waiters_hand_their_slot_on():
+    scheduler = LLMScheduler(maxConcurrency=1)
+    stub = StubCalls()
+
+    async def main():
+        await scheduler.acquire(LLMScheduler.PROMPT, 'blocker')
+        waiting = [asyncio.ensure_future(scheduler.run(stub.call(f'call-{i}'), LLMScheduler.PROMPT, f'room-{i}'))
+                   for i in range(3)]
+        await asyncio.sleep(0.01)
+        # Cancelled while queued.
+        waiting[1].cancel()
+        await asyncio.sleep(0.01)
+        # Cancelled just as it is admitted.
+        scheduler.release()
+        waiting[0].cancel()
+        results = await asyncio.wait_for(asyncio.gather(*waiting, return_exceptions=True), 1)
+        return results, scheduler.metrics()
+
+    results, metrics = asyncio.run(main())
+    assert stub.started == ['call-2']
+    assert results[2] == 'call-2'
+    assert metrics['active'] == 0
+    assert all(queued == 0 for queued in metrics['queued'].values())
+
+
+def test_rate_limit_pauses_every_call():
+    scheduler = LLMScheduler(maxConcurrency=2)
+    stub = StubCalls()
+    attempts = []
+
+    async def rateLimitedOnce():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise rateLimitError(0.1)
+        return 'retried'
+
+    async def main():
+        startTime = time.monotonic()
+        limited = asyncio.ensure_future(scheduler.run(rateLimitedOnce, LLMScheduler.PROMPT, 'room-0'))
+        await asyncio.sleep(0.01)
+        other = await scheduler.run(stub.call('other'), LLMScheduler.PROMPT, 'room-1')
+        otherFinished = time.monotonic() - startTime
+        return await limited, other, otherFinished, attempts[1] - startTime, scheduler.metrics()
+
+    limited, other, otherFinished, retriedAt, metrics = asyncio.run(main())
+    assert (limited, other) == ('retried', 'other')
+    # Both the retry and the other room's call waited out the retry-after.
+    assert retriedAt >= 0.1
+    assert otherFinished >= 0.1
+    assert metrics['rateLimited'] == 1
@@ -0,0 +1,30 @@
+import objects.OpenAIConnector as openAIConnectorModule
+from objects.LLMServices import LLMServices
+from objects.LLMQueryCreator import LLMQueryCreator
+from objects.MessageFilter import MessageFilter
+from objects.Performer import Performer
+
+
+def test_connections_share_one_service(monkeypatch):
+    monkeypatch.setattr(openAIConnectorModule, 'getAISecret', lambda: ('test-key', 'test-project', 'test-model'))
+    monkeypatch.setattr(LLMServices, '_LLMServices__shared', None)
+    created = []
+    originalInit = openAIConnectorModule.OpenAIConnector.__init__
+
+    def countingInit(self):
+        created.append(self)
+        originalInit(self)
+
+    monkeypatch.setattr(openAIConnectorModule.OpenAIConnector, '__init__', countingInit)
+
+    lobbyQuery = LLMQueryCreator()
+    rooms = {}
+    for _ in range(50):
+        MessageFilter(Performer(websocket=None), rooms, lobbyQuery)
+    roomQuery = LLMQueryCreator(lobbyQuery.services)
+
+    assert len(created) == 1
+    assert roomQuery.services is lobbyQuery.services is LLMServices.shared()
+    assert roomQuery.openAIConnector is lobbyQuery.openAIConnector
+    # Director state stays per room.
+    assert roomQuery.personality is not lobbyQuery.personality
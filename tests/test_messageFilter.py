@@ -0,0 +1,60 @@
+import asyncio
+from objects.LLMQueryCreator import LLMQueryCreator
+from objects.MessageFilter import MessageFilter
+from objects.TimerScheduler import TimerScheduler
+from fakes import ScriptedConnector, makeRoom
+
+
+def archive(monkeypatch, connector):
+    room = makeRoom(connector)
+    improv = room.currentImprovisation
+    improv.createGameLog(room)
+    messageFilter = MessageFilter(room.performers[0], {room.roomName: room}, room.LLMQueryCreator)
+    dumpedLogs = []
+
+    async def dumpGameLog(self, log):
+        dumpedLogs.append(log)
+
+    monkeypatch.setattr(MessageFilter, 'dumpGameLog', dumpGameLog)
+    asyncio.run(messageFilter.archivePerformance(room, improv))
+    return dumpedLogs
+
+
+def test_archived_log_includes_the_summary(monkeypatch):
+    dumpedLogs = archive(monkeypatch, ScriptedConnector())
+    assert len(dumpedLogs) == 1
+    assert dumpedLogs[0]['summary'].startswith("Response")
+
+
+def test_log_is_archived_when_the_summary_fails(monkeypatch):
+    connector = ScriptedConnector()
+
+    async def failingSummary(prompt, systemContext=None):
+        raise ConnectionError("LLM unavailable")
+
+    connector.getResponseFromLLM = failingSummary
+    dumpedLogs = archive(monkeypatch, connector)
+    assert len(dumpedLogs) == 1
+    assert dumpedLogs[0]['summary'] == ''
+    assert dumpedLogs[0]['roomName'] == 'test-room-1'
+
+
+def test_room_creator_is_added_on_the_new_room_actor(monkeypatch):
+    monkeypatch.setattr(TimerScheduler, '_TimerScheduler__shared', None)
+    monkeypatch.setattr(LLMQueryCreator, 'generateRoomName', lambda self: 'new-room')
+    lobby = makeRoom(ScriptedConnector(), performerCount=1, roomName='lobby')
+    creator = lobby.performers[0]
+    currentRooms = {'lobby': lobby}
+    messageFilter = MessageFilter(creator, currentRooms, lobby.LLMQueryCreator)
+
+    async def main():
+        response = await messageFilter.handleRoomRegistration({'currentPlayer': {'roomCreator': True}})
+        room = currentRooms['new-room']
+        assert room.actor.metrics()['processed'] == 1
+        room.cancelAllTasks()
+        return response, room
+
+    response, room = asyncio.run(main())
+    assert room.performers == [creator]
+    assert lobby.performers == []
+    assert response['action'] == 'newPlayer'
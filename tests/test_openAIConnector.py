@@ -0,0 +1,63 @@
+import asyncio
+import time
+import objects.OpenAIConnector as openAIConnectorModule
+from objects.OpenAIConnector import OpenAIConnector
+from fakes import SlowChatClient
+
+
+def makeConnector(monkeypatch, client):
+    monkeypatch.setattr(openAIConnectorModule, 'getAISecret', lambda: ('test-key', 'test-project', 'test-model'))
+    connector = OpenAIConnector()
+    connector.client = client
+    return connector
+
+
+def test_concurrent_rooms_overlap_on_a_slow_llm(monkeypatch):
+    client = SlowChatClient(delay=0.3, content="A new theme")
+    connector = makeConnector(monkeypatch, client)
+    rooms = 5
+
+    async def room(i):
+        startTime = time.monotonic()
+        response = await connector.getResponseFromLLM(f"Theme for room {i}")
+        return response, startTime, time.monotonic()
+
+    async def main():
+        startTime = time.monotonic()
+        results = await asyncio.gather(*(room(i) for i in range(rooms)))
+        return results, time.monotonic() - startTime
+
+    results, elapsed = asyncio.run(main())
+    assert [response for response, _, _ in results] == ["A new theme"] * rooms
+    assert client.calls == rooms
+    # Serial calls would take rooms * delay; overlapping calls take about one delay.
+    assert elapsed < 2 * client.delay
+    latestStart = max(start for _, start, _ in results)
+    earliestEnd = min(end for _, _, end in results)
+    assert latestStart < earliestEnd
+
+
+def test_slow_llm_does_not_block_the_event_loop(monkeypatch):
+    connector = makeConnector(monkeypatch, SlowChatClient(delay=0.3))
+
+    async def main():
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.create_task(heartbeat())
+        await connector.getResponseFromLLM("Hello")
+        beat.cancel()
+        return ticks
+
+    assert asyncio.run(main()) > 10
+
+
+def test_calls_are_counted(monkeypatch):
+    connector = makeConnector(monkeypatch, SlowChatClient(delay=0))
+    asyncio.run(connector.getResponseFromLLM("Hello"))
+    assert connector.callCount == 1
@@ -0,0 +1,52 @@
+import asyncio
+import pytest
+from objects.Performer import Performer
+from objects.TimerScheduler import TimerScheduler
+from fakes import ScriptedConnector, makeRoom
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(TimerScheduler, '_TimerScheduler__shared', None)
+
+
+@pytest.fixture
+def savedPerformers(monkeypatch):
+    saved = []
+    monkeypatch.setattr(Performer, 'updateDynamo', lambda performer: saved.append(performer.userId))
+    return saved
+
+
+def test_feedback_is_folded_into_one_update(savedPerformers):
+    connector = ScriptedConnector()
+    room = makeRoom(connector)
+    tuner = room.personalityTuner
+    tuner.DEBOUNCE = 0.02
+
+    async def main():
+        for performer in room.performers:
+            tuner.addFeedback(performer, f"{performer.userId} liked the prompt.")
+            tuner.addFeedback(performer, f"{performer.userId} moved on.", tuneDirector=True)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert tuner.runs == 1
+    assert tuner.foldedFeedback == 4
+    assert connector.calls.count('getPerformerPersonalities') == 1
+    assert sorted(savedPerformers) == ['user-0', 'user-1']
+
+
+def test_feedback_pending_when_the_song_ends_is_applied(savedPerformers):
+    connector = ScriptedConnector()
+    room = makeRoom(connector)
+    tuner = room.personalityTuner
+
+    async def main():
+        tuner.addFeedback(room.performers[0], "user-0 rejected the final prompt.", tuneDirector=True)
+        room.cancelAllTasks()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert tuner.runs == 1
+    assert not tuner.pending
+    assert savedPerformers == ['user-0']
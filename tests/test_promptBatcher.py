@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from objects.PromptBatcher import PromptBatcher
+from objects.TimerScheduler import TimerScheduler
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(TimerScheduler, '_TimerScheduler__shared', None)
+
+
+class SlowBatchGenerator:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.batches = []
+
+    async def __call__(self, userIds):
+        self.batches.append(sorted(userIds))
+        await asyncio.sleep(self.delay)
+        return {userId: f"Prompt for {userId}" for userId in userIds}
+
+
+def test_requests_within_the_window_share_one_call():
+    generator = SlowBatchGenerator()
+    batcher = PromptBatcher(generator, window=0.02)
+
+    async def main():
+        return await asyncio.gather(*(batcher.request(f'user-{i}') for i in range(6)))
+
+    prompts = asyncio.run(main())
+    assert prompts == [f"Prompt for user-{i}" for i in range(6)]
+    assert generator.batches == [[f'user-{i}' for i in range(6)]]
+    assert batcher.batches == 1 and batcher.requests == 6
+
+
+def test_request_during_batch_generation_is_served_by_the_next_batch():
+    generator = SlowBatchGenerator(delay=0.1)
+    batcher = PromptBatcher(generator, window=0.02)
+
+    async def main():
+        first = asyncio.ensure_future(batcher.request('user-0'))
+        # Arrives after the first window closed, while its batch is still being generated.
+        await asyncio.sleep(0.05)
+        late = await asyncio.wait_for(batcher.request('user-1'), 1)
+        return await first, late
+
+    assert asyncio.run(main()) == ("Prompt for user-0", "Prompt for user-1")
+    assert generator.batches == [['user-0'], ['user-1']]
+
+
+def test_failed_batch_fails_every_request():
+    async def failing(userIds):
+        raise RuntimeError("LLM unavailable")
+
+    batcher = PromptBatcher(failing, window=0.01)
+
+    async def main():
+        return await asyncio.gather(batcher.request('user-0'), batcher.request('user-1'), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelling_the_owner_drops_the_pending_batch():
+    generator = SlowBatchGenerator()
+    owner = object()
+    batcher = PromptBatcher(generator, window=0.05, owner=owner)
+
+    async def main():
+        pending = asyncio.ensure_future(batcher.request('user-0'))
+        await asyncio.sleep(0.01)
+        TimerScheduler.shared().cancelOwner(owner)
+        await asyncio.sleep(0.1)
+        assert generator.batches == []
+        # The next song's requests start a new window.
+        assert await batcher.request('user-1') == "Prompt for user-1"
+        pending.cancel()
+
+    asyncio.run(main())
+    assert generator.batches == [['user-1']]
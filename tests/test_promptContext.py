@@ -0,0 +1,36 @@
+from objects.Prompt import Prompt
+from objects.PromptContext import PromptContext
+
+
+def promptGroup(number, performers=4):
+    return {
+        'groupPrompt': Prompt('groupPrompt', f"Group prompt {number} " + "with a long description " * 5),
+        'timestamp': number,
+        'performerPrompts': [{'userId': f'user-{i}', 'timestamp': number,
+                              'performerPrompt': Prompt('performerPrompt', f"Performer prompt {number}")}
+                             for i in range(performers)],
+    }
+
+
+def test_context_size_stops_growing_with_song_length():
+    promptContext = PromptContext(recentGroups=4, summaryEntries=12)
+    prompts = []
+    sizes = []
+    for number in range(1, 121):
+        prompts.append(promptGroup(number))
+        sizes.append(len(promptContext.build(prompts)))
+    assert max(sizes[60:]) - min(sizes[60:]) < 0.05 * sizes[-1]
+    context = promptContext.build(prompts)
+    assert "Group prompt 120" in context and "Performer prompt 117" in context
+    assert "Performer prompt 116" not in context
+    assert "104 earliest prompts omitted" in context
+
+
+def test_context_is_cached_until_prompts_change():
+    promptContext = PromptContext()
+    prompts = [promptGroup(1)]
+    context = promptContext.build(prompts)
+    assert promptContext.build(prompts) is context
+    prompts[-1]['performerPrompts'].append({'userId': 'user-9', 'timestamp': 2,
+                                            'performerPrompt': Prompt('performerPrompt', "A late prompt")})
+    assert "A late prompt" in promptContext.build(prompts)
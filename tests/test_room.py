@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from objects.Room import Room
+from objects.TimerScheduler import TimerScheduler
+from fakes import makeRoom
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(TimerScheduler, '_TimerScheduler__shared', None)
+    monkeypatch.setattr(Room, 'BROADCAST_COALESCE_WINDOW', 0.02)
+
+
+def receivedActions(room):
+    return [frame['action'] for frame in room.performers[0].websocket.frames]
+
+
+def test_burst_of_game_state_refreshes_is_sent_as_one_frame():
+    room = makeRoom()
+    improv = room.currentImprovisation
+
+    async def main():
+        for theme in ('rain', 'wind', 'fire'):
+            improv.centralTheme = theme
+            await room.broadcastMessage(room.prepareGameStateResponse('newGameState'))
+        assert receivedActions(room) == []
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    frames = room.performers[0].websocket.frames
+    assert len(frames) == 1
+    assert frames[0]['gameState']['centralTheme'] == 'fire'
+    assert room.broadcastMetrics()['sentBroadcasts'] == 1
+    assert room.broadcastMetrics()['coalescedBroadcasts'] == 2
+
+
+def test_urgent_broadcast_sends_the_held_refresh_first():
+    room = makeRoom()
+
+    async def main():
+        await room.broadcastMessage(room.prepareGameStateResponse('newGameState'))
+        await room.broadcastMessage(room.prepareGameStateResponse('newGameState'))
+        await room.broadcastMessage(room.prepareGameStateResponse('newPlayer'))
+        await asyncio.sleep(0.01)
+        assert receivedActions(room) == ['newGameState', 'newPlayer']
+        # The held refresh's timer was cancelled with it.
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert receivedActions(room) == ['newGameState', 'newPlayer']
+    assert room.broadcastMetrics()['sentBroadcasts'] == 2
+    assert room.broadcastMetrics()['coalescedBroadcasts'] == 1
+
+
+def test_broadcasts_without_game_state_keep_their_order():
+    room = makeRoom()
+
+    async def main():
+        await room.broadcastMessage(room.prepareGameStateResponse('newGameState'))
+        await room.broadcastMessage({'action': 'chat', 'message': 'hello'})
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert receivedActions(room) == ['newGameState', 'chat']
+    assert room.broadcastMetrics()['coalescedBroadcasts'] == 0
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from objects.RoomActor import RoomActor
+
+
+def test_commands_run_one_at_a_time_in_arrival_order():
+    actor = RoomActor('test-room')
+    events = []
+
+    def command(name):
+        async def run():
+            events.append(f"start {name}")
+            await asyncio.sleep(0.01)
+            events.append(f"end {name}")
+            return name
+        return run
+
+    async def main():
+        return await asyncio.gather(*(actor.submit(command(i)) for i in range(3)))
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    assert events == ['start 0', 'end 0', 'start 1', 'end 1', 'start 2', 'end 2']
+
+
+def test_nested_submit_runs_inline():
+    actor = RoomActor('test-room')
+
+    async def inner():
+        return 'inner'
+
+    async def outer():
+        return await actor.submit(inner)
+
+    async def main():
+        return await asyncio.wait_for(actor.submit(outer), 1)
+
+    assert asyncio.run(main()) == 'inner'
+
+
+def test_command_errors_reach_the_submitter_and_the_actor_keeps_running():
+    actor = RoomActor('test-room')
+
+    async def failing():
+        raise ValueError("bad message")
+
+    async def succeeding():
+        return 'ok'
+
+    async def main():
+        with pytest.raises(ValueError):
+            await actor.submit(failing)
+        return await actor.submit(succeeding)
+
+    assert asyncio.run(main()) == 'ok'
+
+
+def test_posted_commands_run_without_a_waiting_caller():
+    actor = RoomActor('test-room')
+    ran = []
+
+    async def command():
+        ran.append(1)
+
+    async def main():
+        actor.post(command)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert ran == [1]
+    assert actor.metrics()['processed'] == 1
+
+
+def test_stop_cancels_waiting_commands():
+    actor = RoomActor('test-room')
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def waiting():
+        return 'ran'
+
+    async def main():
+        running = asyncio.ensure_future(actor.submit(slow))
+        queued = asyncio.ensure_future(actor.submit(waiting))
+        await asyncio.sleep(0.01)
+        actor.stop()
+        results = await asyncio.wait_for(asyncio.gather(running, queued, return_exceptions=True), 1)
+        return [type(result) for result in results]
+
+    assert asyncio.run(main()) == [asyncio.CancelledError, asyncio.CancelledError]
@@ -0,0 +1,47 @@
+import asyncio
+import time
+import objects.RoomNameGenerator as roomNameGeneratorModule
+from objects.RoomNameGenerator import RoomNameGenerator
+from objects.RoomNameIndex import RoomNameIndex
+from util.Dynamo.logTableClient import LogTableClient
+from fakes import MemoryDynamo
+
+
+def makeGenerator(roomNames):
+    logTable = LogTableClient(MemoryDynamo(keyName='roomName'))
+    for roomName in roomNames:
+        logTable.table.items[roomName] = {'roomName': roomName}
+    index = RoomNameIndex(logTable)
+    return RoomNameGenerator(index), index, logTable.table
+
+
+def test_warmed_generator_creates_unique_names_without_scanning():
+    generator, index, table = makeGenerator(['aurora-1', 'ember-2'])
+
+    async def main():
+        await index.refresh()
+        startTime = time.monotonic()
+        roomNames = [generator.generateRoomName() for _ in range(200)]
+        return roomNames, time.monotonic() - startTime
+
+    roomNames, elapsed = asyncio.run(main())
+    assert len(set(roomNames)) == 200
+    assert not {'aurora', 'ember', 'lobby'} & set(roomNames)
+    assert table.scanCalls == 1
+    assert elapsed < 0.5
+
+
+def test_used_word_list_falls_back_to_numbered_names(monkeypatch):
+    monkeypatch.setattr(roomNameGeneratorModule, 'roomNames', ['aurora', 'ember'])
+    generator, index, table = makeGenerator(['aurora-1'])
+    roomNames = [generator.generateRoomName() for _ in range(5)]
+    assert roomNames[0] == 'ember'
+    assert len(set(roomNames)) == 5
+    assert all(roomName.startswith(('aurora', 'ember')) and roomName[-1].isdigit() for roomName in roomNames[1:])
+
+
+def test_generated_names_satisfy_the_shard_predicate():
+    generator, index, table = makeGenerator([])
+    generator.acceptRoomName = lambda roomName: len(roomName) % 2 == 0
+    roomNames = [generator.generateRoomName() for _ in range(20)]
+    assert all(len(roomName) % 2 == 0 for roomName in roomNames)
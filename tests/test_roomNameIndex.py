@@ -0,0 +1,56 @@
+import asyncio
+from objects.RoomNameIndex import RoomNameIndex
+from util.Dynamo.logTableClient import LogTableClient
+from fakes import MemoryDynamo
+
+
+def makeIndex(roomNames, pageSize=100):
+    dynamo = MemoryDynamo(keyName='roomName')
+    logTable = LogTableClient(dynamo)
+    logTable.table.scanPageSize = pageSize
+    for roomName in roomNames:
+        logTable.table.items[roomName] = {'roomName': roomName}
+    return RoomNameIndex(logTable), logTable.table
+
+
+def test_logged_rooms_are_indexed_by_base_name():
+    index, table = makeIndex(['aurora-1', 'aurora-2', 'ember-1', 'tide-3'], pageSize=2)
+    assert 'aurora' in index
+    assert 'ember-7' in index
+    assert 'lobby' in index
+    assert 'meadow' not in index
+    # Every page of the scan was read, once.
+    assert table.scanCalls == 2
+    assert 'tide' in index
+    assert table.scanCalls == 2
+
+
+def test_refresh_loads_without_blocking_and_keeps_local_names():
+    index, table = makeIndex(['aurora-1'])
+
+    async def main():
+        assert not index.loaded
+        await index.refresh()
+        assert index.loaded and 'aurora' in index
+        index.add('meadow-1')
+        # Another worker logged a performance since.
+        table.items['ember-1'] = {'roomName': 'ember-1'}
+        await index.refresh()
+
+    asyncio.run(main())
+    assert {'aurora', 'ember', 'meadow'} <= index.names
+
+
+def test_failed_refresh_keeps_the_index():
+    index, table = makeIndex(['aurora-1'])
+
+    def failingScan(**kwargs):
+        raise RuntimeError("DynamoDB unavailable")
+
+    async def main():
+        await index.refresh()
+        table.scan = failingScan
+        await index.refresh()
+
+    asyncio.run(main())
+    assert 'aurora' in index
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from objects.Performer import Performer
+from objects.RoomWarmUp import RoomWarmUp
+from objects.TimerScheduler import TimerScheduler
+from fakes import RecordingWebSocket, ScriptedConnector, makeRoom
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(TimerScheduler, '_TimerScheduler__shared', None)
+    monkeypatch.setattr(RoomWarmUp, 'REFINE_DEBOUNCE', 0.02)
+
+
+def test_actor_command_waiting_on_the_theme_does_not_deadlock():
+    room = makeRoom(ScriptedConnector(delay=0.05), performerCount=1)
+
+    async def main():
+        room.warmUp.start()
+        theme = await asyncio.wait_for(room.submit(room.warmUp.theme), 2)
+        await asyncio.sleep(0.05)
+        return theme
+
+    theme = asyncio.run(main())
+    assert theme
+    assert room.currentImprovisation.centralTheme == theme
+
+
+def test_creator_join_does_not_refine():
+    connector = ScriptedConnector(delay=0.01)
+    room = makeRoom(connector, performerCount=1)
+
+    async def main():
+        room.warmUp.start()
+        await room.warmUp.theme()
+        room.warmUp.performerJoined()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert room.warmUp.refinements == 0
+    assert connector.calls.count('getResponseFromLLM') == 1
+
+
+def test_new_performer_refines_once():
+    connector = ScriptedConnector(delay=0.01)
+    room = makeRoom(connector, performerCount=1)
+
+    async def main():
+        room.warmUp.start()
+        await room.warmUp.theme()
+        performer = Performer(websocket=RecordingWebSocket('socket-1'), userId='user-1', screenName='Performer 1', instrument='piano')
+        room.performers.append(performer)
+        room.warmUp.performerJoined()
+        room.warmUp.performerJoined()
+        await asyncio.sleep(0.2)
+
+    asyncio.run(main())
+    assert room.warmUp.refinements == 1
+    assert connector.calls.count('getResponseFromLLM') == 2
@@ -0,0 +1,80 @@
+import threading
+import time
+from util.secretCache import SecretCache
+
+
+class FakeSecretsBackend:
+    """Local secrets backend that counts calls and can be made slow or failing."""
+
+    def __init__(self):
+        self.calls = 0
+        self.version = 0
+        self.failing = False
+        self.delay = 0
+        self.fetched = threading.Event()
+
+    def fetchSecret(self, secretName):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.failing:
+            raise RuntimeError("Secrets Manager unavailable")
+        self.version += 1
+        self.fetched.set()
+        return {'name': secretName, 'version': self.version}
+
+
+def test_repeated_gets_hit_the_cache():
+    backend = FakeSecretsBackend()
+    cache = SecretCache(backend.fetchSecret)
+    for _ in range(100):
+        assert cache.get('origins')['version'] == 1
+    assert backend.calls == 1
+
+
+def test_per_secret_ttl():
+    backend = FakeSecretsBackend()
+    cache = SecretCache(backend.fetchSecret, defaultTtl=900, ttls={'origins': 300})
+    assert cache.ttl('origins') == 300
+    assert cache.ttl('openAI') == 900
+
+
+def test_refreshes_in_background_before_expiry():
+    backend = FakeSecretsBackend()
+    cache = SecretCache(backend.fetchSecret, defaultTtl=0.2, refreshAhead=0.15)
+    assert cache.get('origins')['version'] == 1
+    time.sleep(0.1)
+    backend.fetched.clear()
+    # Inside the refresh window the cached value is served while the refresh runs.
+    assert cache.get('origins')['version'] == 1
+    assert backend.fetched.wait(1)
+    time.sleep(0.01)
+    assert cache.get('origins')['version'] == 2
+
+
+def test_slow_backend_does_not_delay_reads():
+    backend = FakeSecretsBackend()
+    cache = SecretCache(backend.fetchSecret, defaultTtl=0.2, refreshAhead=0.15)
+    cache.get('origins')
+    time.sleep(0.1)
+    backend.delay = 0.5
+    startTime = time.monotonic()
+    cache.get('origins')
+    assert time.monotonic() - startTime < 0.05
+
+
+def test_serves_stale_when_backend_fails():
+    backend = FakeSecretsBackend()
+    cache = SecretCache(backend.fetchSecret, defaultTtl=0.01, refreshAhead=0, maxStale=0)
+    assert cache.get('origins')['version'] == 1
+    backend.failing = True
+    time.sleep(0.02)
+    assert cache.get('origins')['version'] == 1
+
+
+def test_invalidate_forces_a_fetch():
+    backend = FakeSecretsBackend()
+    cache = SecretCache(backend.fetchSecret)
+    cache.get('origins')
+    cache.invalidate('origins')
+    assert cache.get('origins')['version'] == 2
+    assert backend.calls == 2
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import signal
+import websockets
+import objects.ShardGateway as shardGatewayModule
+from objects.ShardGateway import ShardGateway
+from objects.ShardRing import ShardRing
+from improvDirector import serveUntilSignalled
+
+ORIGIN = 'http://localhost:3000'
+
+
+class StubWorker:
+    """A worker that answers profile messages like the lobby does and echoes everything else."""
+
+    def __init__(self, index):
+        self.index = index
+        self.received = []
+        self.disconnections = 0
+        # Answer replayed profile messages with an error, as a worker whose profile read failed would.
+        self.failReplays = False
+
+    async def handleConnection(self, websocket, path=None):
+        try:
+            async for message in websocket:
+                message = json.loads(message)
+                action = message.get('action')
+                self.received.append(action)
+                if action in ShardGateway.PROFILE_ACTIONS:
+                    reply = {'action': 'playerProfileData', 'worker': self.index}
+                    if message.get(ShardGateway.REPLAY_KEY):
+                        if self.failReplays:
+                            reply = {'action': 'error', 'worker': self.index}
+                        reply[ShardGateway.REPLAY_KEY] = True
+                    await websocket.send(json.dumps(reply))
+                else:
+                    await websocket.send(json.dumps({'action': action, 'worker': self.index}))
+        finally:
+            self.disconnections += 1
+
+
+def roomOnShard(shard, shardCount=2):
+    return next(f'room-{i}' for i in range(1000) if ShardRing(shardCount).shardFor(f'room-{i}') == shard)
+
+
+async def startGateway(workers):
+    servers = [await websockets.serve(worker.handleConnection, '127.0.0.1', 0) for worker in workers]
+    workerPorts = [server.sockets[0].getsockname()[1] for server in servers]
+    gateway = ShardGateway(workerPorts, host='127.0.0.1', port=0)
+    gatewayServer = await websockets.serve(gateway.handleConnection, '127.0.0.1', 0)
+    return servers + [gatewayServer], f"ws://127.0.0.1:{gatewayServer.sockets[0].getsockname()[1]}"
+
+
+def test_moving_shard_replays_the_lobby_profile(monkeypatch):
+    monkeypatch.setattr(shardGatewayModule, 'origins', lambda: {ORIGIN})
+    workers = [StubWorker(0), StubWorker(1)]
+
+    async def main():
+        servers, uri = await startGateway(workers)
+        try:
+            async with websockets.connect(uri, origin=ORIGIN) as client:
+                await client.send(json.dumps({'action': 'updateProfile', 'roomName': 'lobby'}))
+                assert json.loads(await client.recv()) == {'action': 'playerProfileData', 'worker': 0}
+                await client.send(json.dumps({'action': 'registration', 'roomName': roomOnShard(1)}))
+                # The reply to the replayed profile is not passed on.
+                assert json.loads(await client.recv()) == {'action': 'registration', 'worker': 1}
+            await asyncio.sleep(0.05)
+        finally:
+            for server in servers:
+                server.close()
+
+    asyncio.run(main())
+    assert workers[0].received == ['updateProfile']
+    assert workers[1].received == ['updateProfile', 'registration']
+    assert workers[0].disconnections == 1
+
+
+def test_messages_for_the_current_shard_are_not_replayed(monkeypatch):
+    monkeypatch.setattr(shardGatewayModule, 'origins', lambda: {ORIGIN})
+    workers = [StubWorker(0), StubWorker(1)]
+
+    async def main():
+        servers, uri = await startGateway(workers)
+        try:
+            async with websockets.connect(uri, origin=ORIGIN) as client:
+                await client.send(json.dumps({'action': 'getCurrentPlayer', 'roomName': 'lobby'}))
+                await client.recv()
+                await client.send(json.dumps({'action': 'registration', 'roomName': roomOnShard(0)}))
+                await client.recv()
+        finally:
+            for server in servers:
+                server.close()
+
+    asyncio.run(main())
+    assert workers[0].received == ['getCurrentPlayer', 'registration']
+    assert workers[1].received == []
+
+
+def test_error_reply_to_a_replay_does_not_hide_the_next_profile(monkeypatch):
+    monkeypatch.setattr(shardGatewayModule, 'origins', lambda: {ORIGIN})
+    workers = [StubWorker(0), StubWorker(1)]
+    workers[1].failReplays = True
+
+    async def main():
+        servers, uri = await startGateway(workers)
+        try:
+            async with websockets.connect(uri, origin=ORIGIN) as client:
+                await client.send(json.dumps({'action': 'updateProfile', 'roomName': 'lobby'}))
+                await client.recv()
+                await client.send(json.dumps({'action': 'registration', 'roomName': roomOnShard(1)}))
+                assert json.loads(await client.recv()) == {'action': 'registration', 'worker': 1}
+                await client.send(json.dumps({'action': 'getCurrentPlayer', 'roomName': roomOnShard(1)}))
+                return json.loads(await asyncio.wait_for(client.recv(), 1))
+        finally:
+            for server in servers:
+                server.close()
+
+    assert asyncio.run(main()) == {'action': 'playerProfileData', 'worker': 1}
+
+
+def test_rejoin_is_routed_to_the_previous_room(monkeypatch):
+    monkeypatch.setattr(shardGatewayModule, 'origins', lambda: {ORIGIN})
+    workers = [StubWorker(0), StubWorker(1)]
+    currentPlayer = {'userId': 'user-1'}
+
+    async def main():
+        servers, uri = await startGateway(workers)
+        try:
+            # The first connection's lobby is on worker 0, as is the room.
+            async with websockets.connect(uri, origin=ORIGIN) as client:
+                await client.send(json.dumps({'action': 'registration', 'roomName': roomOnShard(0),
+                                              'currentPlayer': currentPlayer}))
+                await client.recv()
+            # The reconnection's lobby is on worker 1.
+            async with websockets.connect(uri, origin=ORIGIN) as client:
+                await client.send(json.dumps({'action': 'rejoinRoom', 'currentPlayer': currentPlayer}))
+                return json.loads(await client.recv())
+        finally:
+            for server in servers:
+                server.close()
+
+    assert asyncio.run(main()) == {'action': 'rejoinRoom', 'worker': 0}
+    assert workers[0].received == ['registration', 'rejoinRoom']
+    assert workers[1].received == []
+
+
+def test_signalled_worker_finishes_its_shutdown():
+    class SlowShutdownServer:
+        flushed = False
+
+        async def main(self):
+            try:
+                await asyncio.Future()
+            finally:
+                await asyncio.sleep(0.05)
+                self.flushed = True
+
+    server = SlowShutdownServer()
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, os.kill, os.getpid(), signal.SIGTERM)
+        # A second signal arrives while the server is still flushing.
+        loop.call_later(0.03, os.kill, os.getpid(), signal.SIGTERM)
+        await serveUntilSignalled(server)
+
+    asyncio.run(main())
+    assert server.flushed
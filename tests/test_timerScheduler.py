@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import pytest
+from objects.TimerScheduler import TimerScheduler
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.setattr(TimerScheduler, '_TimerScheduler__shared', None)
+    return TimerScheduler.shared()
+
+
+def test_timers_fire_in_deadline_order(scheduler):
+    fired = []
+
+    def record(name):
+        async def callback():
+            fired.append(name)
+        return callback
+
+    async def main():
+        scheduler.schedule(0.03, record('late'), 'late')
+        scheduler.schedule(0.01, record('early'), 'early')
+        await asyncio.sleep(0.06)
+
+    asyncio.run(main())
+    assert fired == ['early', 'late']
+
+
+def test_rescheduling_a_key_replaces_its_timer(scheduler):
+    fired = []
+
+    async def callback():
+        fired.append(1)
+
+    async def main():
+        for _ in range(10):
+            scheduler.schedule(0.01, callback, 'prompt')
+        await asyncio.sleep(0.03)
+
+    asyncio.run(main())
+    assert fired == [1]
+    assert scheduler.pendingTimers == 0
+
+
+def test_cancel_owner_cancels_timers_and_running_tasks(scheduler):
+    owner = object()
+
+    async def main():
+        running = asyncio.Event()
+
+        async def slow():
+            running.set()
+            await asyncio.sleep(10)
+
+        scheduler.schedule(0, slow, (owner, 'slow'), owner)
+        scheduler.schedule(10, slow, (owner, 'later'), owner)
+        await running.wait()
+        assert scheduler.runningTasks == 1
+        scheduler.cancelOwner(owner)
+        await asyncio.sleep(0.01)
+        assert scheduler.pendingTimers == 0
+        assert scheduler.runningTasks == 0
+
+    asyncio.run(main())
+
+
+def test_driver_stops_when_cancelled_as_it_is_woken(scheduler):
+    async def callback():
+        pass
+
+    async def main():
+        scheduler.schedule(60, callback, 'later')
+        await asyncio.sleep(0)
+        # Wakes the driver, which is cancelled by asyncio.run before it gets to run.
+        scheduler.schedule(30, callback, 'sooner')
+
+    finished = threading.Event()
+    thread = threading.Thread(target=lambda: (asyncio.run(main()), finished.set()), daemon=True)
+    thread.start()
+    assert finished.wait(2)
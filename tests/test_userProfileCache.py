@@ -0,0 +1,63 @@
+import asyncio
+from decimal import Decimal
+from util.Dynamo.baseTable import BaseTable
+from util.Dynamo.userProfileCache import UserProfileCache
+from fakes import MemoryDynamo
+
+
+def makeCache(userIds):
+    dynamo = MemoryDynamo()
+    table = dynamo.Table('users')
+    for userId in userIds:
+        table.items[userId] = {'sub': userId, 'personality': {'attributes': {'humor': Decimal('0.5')}}}
+    return UserProfileCache(BaseTable(dynamo, 'users')), dynamo, table
+
+
+def test_prefetched_room_is_served_from_memory():
+    userIds = [f'user-{i}' for i in range(12)]
+    cache, dynamo, table = makeCache(userIds)
+
+    async def main():
+        await cache.prefetch(userIds)
+        return await asyncio.gather(*(cache.get(userId) for userId in userIds))
+
+    profiles = asyncio.run(main())
+    assert dynamo.batchGets == 1
+    assert table.getCalls == 0
+    assert profiles[0]['personality']['attributes']['humor'] == 0.5
+
+
+def test_concurrent_reads_share_one_fetch():
+    cache, dynamo, table = makeCache(['user-1'])
+
+    async def main():
+        await asyncio.gather(*(cache.get('user-1') for _ in range(10)))
+
+    asyncio.run(main())
+    assert table.getCalls == 1
+
+
+def test_local_write_is_read_back_without_a_fetch():
+    cache, dynamo, table = makeCache([])
+    cache.put({'sub': 'user-1', 'screenName': 'new'})
+
+    async def main():
+        return await cache.get('user-1')
+
+    assert asyncio.run(main())['screenName'] == 'new'
+    assert table.getCalls == 0
+
+
+def test_overlapping_prefetches_share_one_read():
+    userIds = [f'user-{i}' for i in range(12)]
+    cache, dynamo, table = makeCache(userIds)
+
+    async def main():
+        # As in a reconnect storm, where every rejoining client prefetches its room.
+        await asyncio.gather(*(cache.prefetch(userIds[i:]) for i in range(6)))
+        return await asyncio.gather(*(cache.get(userId) for userId in userIds))
+
+    profiles = asyncio.run(main())
+    assert dynamo.batchGets == 1
+    assert table.getCalls == 0
+    assert all(profiles)
@@ -0,0 +1,51 @@
+import asyncio
+import pytest
+from objects.Room import Room
+from objects.TimerScheduler import TimerScheduler
+from objects.WebSocketServer import WebSocketServer
+from fakes import makeRoom
+
+
+@pytest.fixture(autouse=True)
+def scheduler(monkeypatch):
+    monkeypatch.setattr(TimerScheduler, '_TimerScheduler__shared', None)
+    monkeypatch.setattr(Room, 'CLOSE_EMPTY_AFTER', 0.02)
+
+
+def makeServer(performerCount=2):
+    server = WebSocketServer()
+    room = makeRoom(performerCount=performerCount)
+    server.currentRooms[room.roomName] = room
+    return server, room
+
+
+def test_room_is_closed_after_everyone_leaves():
+    server, room = makeServer()
+    audience = room.performers.pop()
+    room.addAudienceToRoom(audience)
+
+    async def main():
+        for client in room.performers + room.audience:
+            server.handleDisconnection(client)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert room.isEmpty
+    assert room.roomName not in server.currentRooms
+    assert server.previousSessions == {}
+
+
+def test_rejoin_within_the_grace_period_keeps_the_room(monkeypatch):
+    monkeypatch.setattr(Room, 'CLOSE_EMPTY_AFTER', 0.05)
+    server, room = makeServer(performerCount=1)
+    performer = room.performers[0]
+
+    async def main():
+        server.handleDisconnection(performer)
+        await asyncio.sleep(0.02)
+        await room.submit(lambda: room.addPlayerToRoom(performer))
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert server.currentRooms[room.roomName] is room
+    assert server.previousSessions == {performer.userId: room.roomName}
@@ -0,0 +1,87 @@
+import asyncio
+from util.Dynamo.baseTable import BaseTable
+from util.Dynamo.writeBehindQueue import WriteBehindQueue
+from fakes import MemoryDynamo
+
+
+def makeQueue(failures=0, **kwargs):
+    dynamo = MemoryDynamo(failures=failures)
+    table = BaseTable(dynamo, 'users')
+    return WriteBehindQueue(table, 'sub', **kwargs), dynamo.Table('users')
+
+
+def test_repeated_writes_collapse_to_latest_item():
+    queue, table = makeQueue(flushInterval=0.01)
+
+    async def main():
+        for version in range(50):
+            queue.put({'sub': 'user-1', 'version': version})
+        queue.put({'sub': 'user-2', 'version': 0})
+        assert queue.pendingCount == 2
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert table.batchWrites == 1
+    assert table.putCalls == 0
+    assert table.items['user-1']['version'] == 49
+    assert table.items['user-2']['version'] == 0
+    assert queue.pendingCount == 0
+
+
+def test_failed_batch_is_retried_with_backoff():
+    queue, table = makeQueue(failures=2, flushInterval=10, backoffFactor=0.01)
+
+    async def main():
+        queue.put({'sub': 'user-1', 'version': 1})
+        await queue.close()
+
+    asyncio.run(main())
+    assert table.items['user-1']['version'] == 1
+    assert table.batchWrites == 1
+
+
+def test_items_are_dropped_after_max_retries():
+    queue, table = makeQueue(failures=5, flushInterval=10, maxRetries=3, backoffFactor=0.01)
+
+    async def main():
+        queue.put({'sub': 'user-1', 'version': 1})
+        await queue.close()
+
+    asyncio.run(main())
+    assert table.items == {}
+    assert queue.pendingCount == 0
+
+
+def test_close_flushes_pending_writes():
+    queue, table = makeQueue(flushInterval=10)
+
+    async def main():
+        queue.put({'sub': 'user-1', 'version': 1})
+        await queue.close()
+
+    asyncio.run(main())
+    assert table.items['user-1']['version'] == 1
+
+
+def test_put_without_event_loop_writes_directly():
+    queue, table = makeQueue()
+    queue.put({'sub': 'user-1', 'version': 1})
+    assert table.putCalls == 1
+    assert queue.pendingCount == 0
+
+
+def test_write_queued_during_retries_outlives_the_dropped_batch():
+    queue, table = makeQueue(failures=3, flushInterval=0.01, maxRetries=3, backoffFactor=0.05)
+
+    async def main():
+        queue.put({'sub': 'user-1', 'version': 1})
+        # Arrives while the first failed batch backs off.
+        await asyncio.sleep(0.03)
+        queue.put({'sub': 'user-2', 'version': 1})
+        await asyncio.sleep(0.2)
+        await queue.close()
+
+    asyncio.run(main())
+    assert 'user-1' not in table.items
+    assert table.items['user-2']['version'] == 1
+    assert queue.pendingCount == 0
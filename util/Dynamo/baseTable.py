@@ -5,6 +5,8 @@ class BaseTable:
         """
         Base class for DynamoDB table interactions.
         """
+        self.dynamoDb = dynamoDb
+        self.tableName = tableName
         self.table = dynamoDb.Table(tableName)
 
     def putItem(self, item):
@@ -13,12 +15,35 @@ class BaseTable:
         """
         return self.table.put_item(Item=item)
 
+    def putItems(self, items, overwriteByPkeys=None):
+        """
+        Inserts several items into the table using a batch writer.
+        """
+        with self.table.batch_writer(overwrite_by_pkeys=overwriteByPkeys) as batch:
+            for item in items:
+                batch.put_item(Item=item)
+
     def getItem(self, key):
         """
         Retrieves an item from the table by the key.
         """
         return self.table.get_item(Key=key)
 
+    def getItems(self, keys, maxAttempts=3):
+        """
+        Retrieves several items from the table by key, 100 keys per batch request.
+        """
+        items = []
+        for start in range(0, len(keys), 100):
+            requestItems = {self.tableName: {'Keys': keys[start:start + 100]}}
+            attempt = 0
+            while requestItems and attempt < maxAttempts:
+                response = self.dynamoDb.batch_get_item(RequestItems=requestItems)
+                items.extend(response.get('Responses', {}).get(self.tableName, []))
+                requestItems = response.get('UnprocessedKeys')
+                attempt += 1
+        return items
+
     def deleteItem(self, key):
         """
         Deletes an item from the table by the key.
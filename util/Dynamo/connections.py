@@ -12,3 +12,14 @@ def getDynamoDbConnection(regionName='us-east-1'):
     except Exception as e:
         print(f"Error in connecting to DynamoDB: {e}")
         raise
+
+_sharedDynamoDb = None
+
+def getSharedDynamoDbConnection(regionName='us-east-1'):
+    """
+    Return the process-wide DynamoDB resource, creating it on first use.
+    """
+    global _sharedDynamoDb
+    if _sharedDynamoDb is None:
+        _sharedDynamoDb = getDynamoDbConnection(regionName)
+    return _sharedDynamoDb
@@ -14,6 +14,30 @@ class LogTableClient(BaseTable):
         return self.table.put_item(Item=log)
 
 
+    def getRoomNames(self):
+        """
+        Retrieves the roomName of every log with a paginated, projection-only scan.
+
+        :return: Generator of room names.
+        """
+        try:
+            scanArgs = {
+                'ProjectionExpression': '#roomName',
+                'ExpressionAttributeNames': {'#roomName': 'roomName'},
+            }
+            while True:
+                response = self.table.scan(**scanArgs)
+                for item in response.get('Items', []):
+                    yield item['roomName']
+                lastKey = response.get('LastEvaluatedKey')
+                if not lastKey:
+                    break
+                scanArgs['ExclusiveStartKey'] = lastKey
+
+        except Exception as e:
+            print(f"Failed to retrieve room names from DynamoDB: {e}")
+            raise
+
     def getLogs(self):
         """
         Retrieves all prompt scripts from the DynamoDB table and organizes them into a dictionary.
@@ -0,0 +1,104 @@
+# dynamo/userProfileCache.py
+import asyncio
+import time
+from collections import OrderedDict
+from copy import deepcopy
+
+class UserProfileCache:
+    def __init__(self, table, keyName='sub', maxSize=1024, ttl=300):
+        """
+        Bounded, TTL'd read-through cache of user profiles in front of a user table.
+
+        Local writes should go through put() so reads never see an older copy from DynamoDB
+        while the write is still queued.
+        """
+        self.__table = table
+        self.__keyName = keyName
+        self.__maxSize = maxSize
+        self.__ttl = ttl
+        self.__entries = OrderedDict()
+        self.__inFlight = {}
+        self.__prefetching = {}
+
+    async def get(self, sub):
+        userData = self.__cached(sub)
+        if userData is not None:
+            return deepcopy(userData)
+        fetch = self.__inFlight.get(sub)
+        if fetch is None:
+            fetch = asyncio.ensure_future(self.__fetch(sub))
+            self.__inFlight[sub] = fetch
+        try:
+            userData = await asyncio.shield(fetch)
+        finally:
+            self.__inFlight.pop(sub, None)
+        return deepcopy(userData)
+
+    def put(self, item):
+        sub = item.get(self.__keyName)
+        if sub is not None:
+            self.__store(sub, self.normalize(deepcopy(item)))
+
+    def invalidate(self, sub):
+        self.__entries.pop(sub, None)
+
+    async def prefetch(self, subs):
+        """
+        Loads every uncached profile in subs with batched reads, sharing any batch already loading one of them.
+        """
+        missing = {sub for sub in subs if sub and self.__cached(sub) is None}
+        batches = {self.__prefetching[sub] for sub in missing if sub in self.__prefetching}
+        missing = [sub for sub in missing if sub not in self.__prefetching]
+        if missing:
+            batch = asyncio.ensure_future(self.__fetchBatch(missing))
+            for sub in missing:
+                self.__prefetching[sub] = batch
+            batches.add(batch)
+        if batches:
+            await asyncio.gather(*(asyncio.shield(batch) for batch in batches))
+
+    @staticmethod
+    def normalize(userData):
+        personality = userData.get('personality')
+        attributes = personality.get('attributes', None) if personality else None
+        if personality and attributes:
+            userData['personality']['attributes'] = {key: float(value) for key, value in attributes.items()}
+        return userData
+
+    async def __fetch(self, sub):
+        response = await asyncio.to_thread(self.__table.getItem, {self.__keyName: sub})
+        userData = response.get('Item')
+        if userData is None:
+            return None
+        userData = self.normalize(userData)
+        self.__store(sub, userData)
+        return userData
+
+    async def __fetchBatch(self, subs):
+        try:
+            keys = [{self.__keyName: sub} for sub in subs]
+            items = await asyncio.to_thread(self.__table.getItems, keys)
+            for item in items:
+                self.__store(item[self.__keyName], self.normalize(item))
+        except Exception as e:
+            print(f"Failed to prefetch user profiles: {e}")
+        finally:
+            for sub in subs:
+                self.__prefetching.pop(sub, None)
+
+    def __cached(self, sub):
+        entry = self.__entries.get(sub)
+        if entry is None:
+            return None
+        userData, expiresAt = entry
+        if time.monotonic() >= expiresAt:
+            del self.__entries[sub]
+            return None
+        self.__entries.move_to_end(sub)
+        return userData
+
+    def __store(self, sub, userData):
+        self.__entries[sub] = (userData, time.monotonic() + self.__ttl)
+        self.__entries.move_to_end(sub)
+        while len(self.__entries) > self.__maxSize:
+            self.__entries.popitem(last=False)
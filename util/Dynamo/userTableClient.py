@@ -1,4 +1,7 @@
 from util.Dynamo.baseTable import BaseTable
+from util.Dynamo.connections import getSharedDynamoDbConnection
+from util.Dynamo.writeBehindQueue import WriteBehindQueue
+from util.Dynamo.userProfileCache import UserProfileCache
 
 class UserTableClient(BaseTable):
     def __init__(self, dynamoDb):
@@ -6,3 +9,25 @@ class UserTableClient(BaseTable):
         Table 1 specific client, inheriting common operations from BaseTable.
         """
         super().__init__(dynamoDb, 'improvisation_director_users')
+
+
+_userWriteQueue = None
+_userProfileCache = None
+
+def getUserWriteQueue():
+    """
+    Return the process-wide write-behind queue for user profiles, keyed by 'sub'.
+    """
+    global _userWriteQueue
+    if _userWriteQueue is None:
+        _userWriteQueue = WriteBehindQueue(UserTableClient(getSharedDynamoDbConnection()), 'sub')
+    return _userWriteQueue
+
+def getUserProfileCache():
+    """
+    Return the process-wide read-through cache of user profiles.
+    """
+    global _userProfileCache
+    if _userProfileCache is None:
+        _userProfileCache = UserProfileCache(UserTableClient(getSharedDynamoDbConnection()), 'sub')
+    return _userProfileCache
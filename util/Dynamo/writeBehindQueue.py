@@ -0,0 +1,93 @@
+# dynamo/writeBehindQueue.py
+import asyncio
+
+class WriteBehindQueue:
+    def __init__(self, table, keyName, flushInterval=1.0, maxRetries=5, backoffFactor=2):
+        """
+        Buffers item writes for a table and flushes them in the background with a batch writer.
+
+        Repeated writes for the same key are collapsed to the latest item before they are sent.
+        """
+        self.__table = table
+        self.__keyName = keyName
+        self.__flushInterval = flushInterval
+        self.__maxRetries = maxRetries
+        self.__backoffFactor = backoffFactor
+        self.__pending = {}
+        self.__dirty = None
+        self.__flushTask = None
+
+    @property
+    def pendingCount(self):
+        return len(self.__pending)
+
+    def put(self, item):
+        """
+        Queues an item for writing. Falls back to a direct write when no event loop is running.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return self.__table.putItem(item)
+        key = item.get(self.__keyName)
+        if key is None:
+            print(f"Skipping write without a {self.__keyName}.")
+            return
+        self.__pending[key] = item
+        if self.__flushTask is None or self.__flushTask.done():
+            self.__dirty = asyncio.Event()
+            self.__flushTask = asyncio.create_task(self.__run())
+        self.__dirty.set()
+
+    async def flush(self):
+        """
+        Writes every pending item, retrying failed batches with exponential backoff.
+
+        An item is dropped after maxRetries failed attempts, leaving writes queued since then to their own retries.
+        """
+        attempts = {}
+        while self.__pending:
+            items, self.__pending = self.__pending, {}
+            try:
+                await asyncio.to_thread(self.__table.putItems, list(items.values()), [self.__keyName])
+                attempts = {}
+            except Exception as e:
+                dropped = 0
+                for key, item in items.items():
+                    if key in self.__pending:
+                        # A newer version arrived in the meantime and is retried in its place.
+                        attempts.pop(key, None)
+                        continue
+                    attempts[key] = attempts.get(key, 0) + 1
+                    if attempts[key] >= self.__maxRetries:
+                        del attempts[key]
+                        dropped += 1
+                    else:
+                        self.__pending[key] = item
+                if dropped:
+                    print(f"Write-behind flush failed after {self.__maxRetries} attempts, dropping {dropped} items: {e}")
+                if not self.__pending:
+                    return
+                sleepTime = self.__backoffFactor ** max(1, max(attempts.get(key, 0) for key in self.__pending))
+                print(f"Write-behind flush failed: {e}. Retrying in {sleepTime} seconds...")
+                await asyncio.sleep(sleepTime)
+
+    async def close(self):
+        """
+        Stops the background flusher and writes anything still pending.
+        """
+        if self.__flushTask and not self.__flushTask.done():
+            self.__flushTask.cancel()
+            try:
+                await self.__flushTask
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def __run(self):
+        while True:
+            await self.__dirty.wait()
+            # Give further writes for the same keys a chance to coalesce.
+            await asyncio.sleep(self.__flushInterval)
+            self.__dirty.clear()
+            await self.flush()
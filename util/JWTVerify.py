@@ -1,27 +1,124 @@
+import asyncio
+import hashlib
 import json
+import time
+from collections import OrderedDict
 import requests
 import jwt
 from util.awsSecretRetrieval import cognitoSecret
 
 REGION = 'us-east-1'
-USER_POOL_ID, CLIENT_ID = cognitoSecret()
-COGNITO_KEYS_URL = f'https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}/.well-known/jwks.json'
 
-# Fetch AWS Cognito public keys
-cognito_keys = requests.get(COGNITO_KEYS_URL).json()
 
-def get_cognito_public_key(token):
+class CognitoKeyStore:
+    """Cognito public keys indexed by kid, fetched lazily and refreshed when an unknown kid shows up."""
+
+    def __init__(self, min_refresh_interval=60, failure_backoff=5):
+        self.__keys = {}
+        self.__last_refresh = None
+        self.__last_failure = None
+        self.__min_refresh_interval = min_refresh_interval
+        self.__failure_backoff = failure_backoff
+        self.__lock = None
+        self.__user_pool_id = None
+
+    @property
+    def user_pool_id(self):
+        if self.__user_pool_id is None:
+            self.__user_pool_id, _ = cognitoSecret()
+        return self.__user_pool_id
+
+    @property
+    def issuer(self):
+        return f'https://cognito-idp.{REGION}.amazonaws.com/{self.user_pool_id}'
+
+    @property
+    def keys_url(self):
+        return f'{self.issuer}/.well-known/jwks.json'
+
+    async def get_key(self, kid):
+        key = self.__keys.get(kid)
+        if key is None:
+            await self.refresh()
+            key = self.__keys.get(kid)
+        return key
+
+    async def refresh(self):
+        if self.__lock is None:
+            self.__lock = asyncio.Lock()
+        async with self.__lock:
+            # Throttle refreshes so a stream of tokens with unknown kids cannot hammer Cognito,
+            # but retry a failed fetch after a short backoff rather than the full interval.
+            now = time.monotonic()
+            if self.__last_refresh and now - self.__last_refresh < self.__min_refresh_interval:
+                return
+            if self.__last_failure and now - self.__last_failure < self.__failure_backoff:
+                return
+            try:
+                response = await asyncio.to_thread(requests.get, self.keys_url, timeout=5)
+                response.raise_for_status()
+                keys = {
+                    key['kid']: jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(key))
+                    for key in response.json().get('keys', [])
+                }
+            except Exception as e:
+                self.__last_failure = time.monotonic()
+                print(f"Failed to refresh Cognito keys: {e}")
+                return
+            self.__keys = keys
+            self.__last_refresh = time.monotonic()
+            self.__last_failure = None
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of decoded tokens keyed by token hash, each valid until its exp claim."""
+
+    def __init__(self, max_size=1024):
+        self.__entries = OrderedDict()
+        self.__max_size = max_size
+
+    @staticmethod
+    def token_hash(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        key = self.token_hash(token)
+        entry = self.__entries.get(key)
+        if entry is None:
+            return None
+        decoded_token, expires_at = entry
+        if time.time() >= expires_at:
+            del self.__entries[key]
+            return None
+        self.__entries.move_to_end(key)
+        return decoded_token
+
+    def put(self, token, decoded_token):
+        expires_at = decoded_token.get('exp')
+        if expires_at is None:
+            return
+        key = self.token_hash(token)
+        self.__entries[key] = (decoded_token, expires_at)
+        self.__entries.move_to_end(key)
+        while len(self.__entries) > self.__max_size:
+            self.__entries.popitem(last=False)
+
+
+cognito_keys = CognitoKeyStore()
+verified_tokens = VerifiedTokenCache()
+
+async def get_cognito_public_key(token):
     """Extract the public key for verifying the token signature."""
     headers = jwt.get_unverified_header(token)
-    for key in cognito_keys.get('keys'):
-        if key['kid'] == headers['kid']:
-            return jwt.algorithms.RSAAlgorithm.from_jwk(json.dumps(key))
-    return None
+    return await cognito_keys.get_key(headers.get('kid'))
 
-def verify_jwt(token):
+async def verify_jwt(token):
     """Verify the JWT signature and claims."""
+    decoded_token = verified_tokens.get(token)
+    if decoded_token is not None:
+        return decoded_token
 
-    publicKey = get_cognito_public_key(token)
+    publicKey = await get_cognito_public_key(token)
     if publicKey is None:
         raise jwt.InvalidTokenError("Public key not found")
     decoded_token = jwt.decode(
@@ -29,9 +126,8 @@ def verify_jwt(token):
         publicKey,
         algorithms=['RS256'],
         # audience=CLIENT_ID,
-        issuer=f'https://cognito-idp.{REGION}.amazonaws.com/{USER_POOL_ID}',
+        issuer=cognito_keys.issuer,
         leeway=10
     )
+    verified_tokens.put(token, decoded_token)
     return decoded_token
-
-
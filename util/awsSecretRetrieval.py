@@ -1,9 +1,10 @@
 import boto3
 import json
 from botocore.exceptions import ClientError
+from util.secretCache import SecretCache
 
 
-def retrieveSecret(secret_name):
+def fetchSecret(secret_name):
     region_name = "us-east-1"
 
     session = boto3.session.Session()
@@ -24,6 +25,12 @@ def retrieveSecret(secret_name):
     secret = get_secret_value_response['SecretString']
     return json.loads(secret)
 
+secretCache = SecretCache(fetchSecret, ttls={"improv_director/origins": 300})
+_originsCache = (None, frozenset())
+
+def retrieveSecret(secret_name):
+    return secretCache.get(secret_name)
+
 def getAISecret():
     secret = retrieveSecret("improv_director/openAI")
     oaKey = secret.get("OA_KEY")
@@ -43,10 +50,12 @@ def cognitoSecret():
     return secret.get('userPoolId'), secret.get('clientId')
 
 def origins():
+    global _originsCache
     secretName = "improv_director/origins"
     secret = retrieveSecret(secretName)
     originString =  secret.get('origins')
-    originList = originString.split(',') if originString else []
-    originList = [origin.strip() for origin in originList]
-    return originList
+    if originString != _originsCache[0]:
+        originList = originString.split(',') if originString else []
+        _originsCache = (originString, frozenset(origin.strip() for origin in originList))
+    return _originsCache[1]
 
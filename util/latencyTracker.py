@@ -0,0 +1,23 @@
+from collections import deque
+
+class LatencyTracker:
+    def __init__(self, windowSize=100, defaultLatency=5.0):
+        """
+        Keeps the most recent latency samples, in seconds, and reports percentiles over them.
+        """
+        self.__samples = deque(maxlen=windowSize)
+        self.__defaultLatency = defaultLatency
+
+    @property
+    def sampleCount(self):
+        return len(self.__samples)
+
+    def record(self, seconds):
+        self.__samples.append(seconds)
+
+    def percentile(self, percent=95):
+        if not self.__samples:
+            return self.__defaultLatency
+        ordered = sorted(self.__samples)
+        index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+        return ordered[index]
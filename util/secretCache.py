@@ -0,0 +1,72 @@
+import threading
+import time
+
+class SecretCache:
+    def __init__(self, fetchSecret, defaultTtl=900, refreshAhead=60, maxStale=3600, ttls=None):
+        """
+        In-memory cache in front of a secret backend.
+
+        Secrets are refreshed on a background thread once they are within refreshAhead seconds
+        of expiring. The cached value keeps being served while the refresh runs, and for up to
+        maxStale seconds after expiry if the backend is slow or failing.
+
+        :param fetchSecret: Callable taking a secret name and returning the parsed secret.
+        :param ttls: Optional dictionary of per-secret TTLs, in seconds.
+        """
+        self.__fetchSecret = fetchSecret
+        self.__defaultTtl = defaultTtl
+        self.__refreshAhead = refreshAhead
+        self.__maxStale = maxStale
+        self.__ttls = ttls or {}
+        self.__entries = {}
+        self.__refreshing = set()
+        self.__lock = threading.Lock()
+
+    def ttl(self, secretName):
+        return self.__ttls.get(secretName, self.__defaultTtl)
+
+    def get(self, secretName):
+        entry = self.__entries.get(secretName)
+        if entry is None:
+            return self.__load(secretName)
+        value, expiresAt = entry
+        now = time.monotonic()
+        if now >= expiresAt + self.__maxStale:
+            try:
+                return self.__load(secretName)
+            except Exception as e:
+                print(f"Serving stale secret {secretName}: {e}")
+                return value
+        if now >= expiresAt - self.__refreshAhead:
+            self.__refreshInBackground(secretName)
+        return value
+
+    def invalidate(self, secretName=None):
+        with self.__lock:
+            if secretName is None:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(secretName, None)
+
+    def __load(self, secretName):
+        value = self.__fetchSecret(secretName)
+        with self.__lock:
+            self.__entries[secretName] = (value, time.monotonic() + self.ttl(secretName))
+        return value
+
+    def __refreshInBackground(self, secretName):
+        with self.__lock:
+            if secretName in self.__refreshing:
+                return
+            self.__refreshing.add(secretName)
+        thread = threading.Thread(target=self.__refresh, args=(secretName,), daemon=True)
+        thread.start()
+
+    def __refresh(self, secretName):
+        try:
+            self.__load(secretName)
+        except Exception as e:
+            print(f"Background refresh of secret {secretName} failed: {e}")
+        finally:
+            with self.__lock:
+                self.__refreshing.discard(secretName)